@@ -1,11 +1,13 @@
 from flask import Flask, render_template, Response, request
 import cv2
-from detection.detection_engine import process_frame
+from detection.detection_engine import DB_PATH, process_frame
+from db_setup import ensure_clip_column
 import sqlite3
 import json
 
 
 app = Flask(__name__, static_folder="static")
+ensure_clip_column(DB_PATH)
 
 
 # Global control
@@ -102,7 +104,7 @@ def home():
 
 @app.route("/logs")
 def logs():
-    conn = sqlite3.connect("alerts.db")
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM alerts ORDER BY id DESC")
@@ -113,7 +115,7 @@ def logs():
 
 @app.route("/dashboard")
 def dashboard():
-    conn = sqlite3.connect("alerts.db")
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
     cursor.execute("SELECT label, COUNT(*) FROM alerts GROUP BY label")
@@ -0,0 +1,155 @@
+import json
+import socket
+import threading
+
+from frame_ring import FrameRing, ring_name
+
+# ============================================================
+# CAMERA MANAGER CLIENT (web tier side)
+# ------------------------------------------------------------
+# Used by newapp.py when FIREGUARD_CAMERA_MANAGER is set. Holds no
+# camera state of its own: control calls go over the manager's
+# socket, frames are read straight out of its shared-memory rings.
+# ============================================================
+
+CONNECT_TIMEOUT = 5
+
+
+class CameraManagerClient:
+    def __init__(self, address):
+        host, _, port = address.rpartition(":")
+        self.address = (host or "127.0.0.1", int(port))
+        # {camera_id: {"ring": FrameRing, "readers": int, "detached": bool}};
+        # shared by every viewer thread, a ring is closed once detached and unread
+        self._rings = {}
+        self._rings_lock = threading.Lock()
+
+    # --------------------------------------------------------
+    # CONTROL SOCKET
+    # --------------------------------------------------------
+    def call(self, cmd, **kwargs):
+        req = dict(kwargs, cmd=cmd)
+        timeout = CONNECT_TIMEOUT + kwargs.get("wait", 0)
+        with socket.create_connection(self.address, timeout=timeout) as sock:
+            sock.sendall(json.dumps(req).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        if not line:
+            return {"ok": False, "error": "camera manager closed the connection"}
+        return json.loads(line)
+
+    def start(self, camera_id, wait=0, tiles=None):
+        resp = self.call("start", camera_id=str(camera_id), wait=wait, tiles=tiles)
+        if resp.get("ok"):
+            # the manager restarted (or re-created the ring) since we attached
+            with self._rings_lock:
+                entry = self._rings.get(str(camera_id))
+                if entry is not None and entry["ring"].ring_id != resp.get("ring_id"):
+                    self._drop(str(camera_id))
+        return resp
+
+    def stop(self, camera_id):
+        self.detach(camera_id)
+        return self.call("stop", camera_id=str(camera_id))
+
+    def list(self):
+        return self.call("list").get("cameras", {})
+
+    def health(self):
+        return self.call("health").get("cameras", {})
+
+    def report_viewers(self, worker, counts):
+        return self.call("viewers", worker=worker, counts=counts)
+
+    def alarm_stop(self):
+        return self.call("alarm_stop")
+
+    def get_roi(self, camera_id):
+        return self.call("get_roi", camera_id=str(camera_id))
+
+    def set_roi(self, camera_id, config):
+        return self.call("set_roi", camera_id=str(camera_id), config=config)
+
+    def profile_start(self, mode, seconds, interval):
+        return self.call("profile_start", mode=mode, seconds=seconds, interval=interval)
+
+    def profile_status(self):
+        return self.call("profile_status")
+
+    def is_running(self, camera_id):
+        cam = self.list().get(str(camera_id))
+        return bool(cam and cam.get("running"))
+
+    # --------------------------------------------------------
+    # FRAME FEED
+    # --------------------------------------------------------
+    def detach(self, camera_id):
+        with self._rings_lock:
+            self._drop(str(camera_id))
+
+    def _drop(self, camera_id):
+        """Forget a camera's ring; closed now, or by its last reader. Lock held."""
+        entry = self._rings.pop(camera_id, None)
+        if entry is None:
+            return
+        entry["detached"] = True
+        if entry["readers"] == 0:
+            entry["ring"].close()
+
+    def _acquire(self, camera_id):
+        with self._rings_lock:
+            entry = self._rings.get(camera_id)
+            if entry is not None and entry["ring"].retired:
+                # the manager stopped the camera; a new run gets a new ring
+                self._drop(camera_id)
+                entry = None
+
+            if entry is None:
+                try:
+                    ring = FrameRing.attach(ring_name(camera_id))
+                except FileNotFoundError:
+                    return None
+                entry = self._rings[camera_id] = {"ring": ring, "readers": 0, "detached": False}
+
+            entry["readers"] += 1
+            return entry
+
+    def _release(self, entry):
+        with self._rings_lock:
+            entry["readers"] -= 1
+            if entry["detached"] and entry["readers"] == 0:
+                entry["ring"].close()
+
+    def read_meta(self, camera_id, newer_than=0):
+        """Latest (seq, meta) for a camera without copying its pixels."""
+        entry = self._acquire(str(camera_id))
+        if entry is None:
+            return None
+        try:
+            item = entry["ring"].read_meta(newer_than)
+        finally:
+            self._release(entry)
+        if item is None:
+            return None
+        return item[0], item[1] or {}
+
+    def read_frame(self, camera_id, newer_than=0):
+        """
+        Latest (seq, frame, meta) for a camera, copied out of shared memory,
+        or None if the manager has not published anything newer yet.
+        meta["ring_id"] names the run the frame belongs to: seqs restart
+        with every ring.
+        """
+        entry = self._acquire(str(camera_id))
+        if entry is None:
+            return None
+        ring = entry["ring"]
+        try:
+            item = ring.read_latest(copy=True, newer_than=newer_than)
+        finally:
+            self._release(entry)
+        if item is None:
+            return None
+
+        seq, frame, meta, _ = item
+        return seq, frame, dict(meta or {}, ring_id=ring.ring_id)
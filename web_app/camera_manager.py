@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+
+import cv2
+
+from camera_streams import (
+    FAILED,
+    camera_health,
+    camera_streams,
+    frame_listeners,
+    list_camera_streams,
+    start_camera_stream,
+    start_cameras_from_config,
+    stop_camera_stream,
+    wait_camera_open,
+)
+from db_setup import ensure_clip_column
+from detection.detection_engine import DB_PATH, stop_alarm_manual
+from detection.roi import get_camera_roi, set_camera_roi
+from detection.temporal_verifier import verifier_stats
+from frame_ring import FrameRing, ring_name
+from profiler import profiler
+
+# ============================================================
+# CAMERA MANAGER DAEMON
+# ------------------------------------------------------------
+# Owns capture, inference and incident state for every camera so
+# the web tier (newapp.py) can run as several stateless workers.
+#
+#   control socket : newline-delimited JSON on 127.0.0.1:5055
+#   frame feed     : one shared-memory FrameRing per camera
+#                    (raw frame + label/severity/detections metadata;
+#                    the web tier draws overlays itself)
+#
+# Run from web_app/:  python camera_manager.py
+# Then start the web tier with FIREGUARD_CAMERA_MANAGER=127.0.0.1:5055
+# ============================================================
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5055
+
+MAX_META_BOXES = 50   # keeps the metadata inside the ring's slot
+VIEWER_REPORT_TTL = 10.0   # seconds before a silent web worker's viewers stop counting
+
+rings = {}   # {camera_id: FrameRing}
+rings_lock = threading.Lock()
+ring_locks = {}   # {camera_id: Lock} serialises a camera's writes against release_ring
+
+# MJPEG viewers live in the web workers; each reports its own counts
+worker_viewers = {}   # {worker: (reported_at, {camera_id: viewers})}
+viewers_lock = threading.Lock()
+
+
+def _ring_lock(camera_id):
+    with rings_lock:
+        return ring_locks.setdefault(camera_id, threading.Lock())
+
+
+# ============================================================
+# FRAME FEED
+# ============================================================
+def publish_frame(camera_id, cam):
+    frame = cam["frame"]
+    if frame is None:
+        return
+
+    detections = cam["detections"]
+    if detections is not None and len(detections["boxes"]) > MAX_META_BOXES:
+        detections = dict(detections, boxes=detections["boxes"][:MAX_META_BOXES])
+    meta = {
+        "label": cam["label"],
+        "severity": cam["severity"],
+        "detections": detections,
+    }
+
+    with _ring_lock(camera_id):
+        # a stopping camera can still finish one last frame after its ring is
+        # gone; checked under the lock so release_ring cannot slip in between
+        if not cam["running"]:
+            return
+
+        with rings_lock:
+            ring = rings.get(camera_id)
+            if ring is None:
+                ring = FrameRing.create(ring_name(camera_id), frame.shape)
+                rings[camera_id] = ring
+
+        max_h, max_w, _ = ring.max_shape
+        if frame.shape[0] > max_h or frame.shape[1] > max_w:
+            frame = cv2.resize(frame, (max_w, max_h))
+
+        ring.write(frame, meta=meta, timestamp=cam["timestamp"])
+
+
+def release_ring(camera_id):
+    with _ring_lock(camera_id):
+        with rings_lock:
+            ring = rings.pop(camera_id, None)
+        if ring is not None:
+            ring.close()
+
+
+# ============================================================
+# CONTROL COMMANDS
+# ============================================================
+def cmd_start(camera_id, wait=0, tiles=None):
+    try:
+        start_camera_stream(camera_id, tiles=tiles)
+    except ValueError as e:
+        return {"ok": False, "invalid": True, "camera_id": camera_id, "error": str(e)}
+    state = wait_camera_open(camera_id, wait) if wait else camera_streams[str(camera_id)]["state"]
+    if state == FAILED:
+        return {"ok": False, "camera_id": camera_id, "state": state,
+                "error": camera_streams[str(camera_id)]["error"]}
+    with rings_lock:
+        ring = rings.get(str(camera_id))
+    # ring_id None: the ring is created with the first frame, so any ring a
+    # client still has mapped under this name belongs to an earlier run
+    return {"ok": True, "camera_id": camera_id, "state": state, "ring": ring_name(camera_id),
+            "ring_id": ring.ring_id if ring else None}
+
+
+def cmd_stop(camera_id):
+    camera_id = str(camera_id)
+    stopped = stop_camera_stream(camera_id)
+    release_ring(camera_id)
+    return {"ok": stopped, "stopped": camera_id if stopped else None}
+
+
+def cmd_list():
+    return {"ok": True, "cameras": list_camera_streams()}
+
+
+def cmd_health():
+    cameras = camera_health()
+    now = time.time()
+    with viewers_lock:
+        reports = [counts for at, counts in worker_viewers.values() if now - at <= VIEWER_REPORT_TTL]
+    for cid, health in cameras.items():
+        # None until some worker has reported: unknown, not zero
+        health["viewers"] = sum(counts.get(cid, 0) for counts in reports) if reports else None
+    return {"ok": True, "cameras": cameras}
+
+
+def cmd_viewers(worker, counts):
+    with viewers_lock:
+        worker_viewers[str(worker)] = (time.time(), {str(k): int(v) for k, v in (counts or {}).items()})
+        # workers that went away
+        now = time.time()
+        for w in [w for w, (at, _) in worker_viewers.items() if now - at > VIEWER_REPORT_TTL]:
+            worker_viewers.pop(w, None)
+    return {"ok": True}
+
+
+def cmd_alarm_stop():
+    stop_alarm_manual()
+    return {"ok": True}
+
+
+def cmd_verifier_stats():
+    return {"ok": True, **verifier_stats()}
+
+
+def cmd_get_roi(camera_id):
+    roi = get_camera_roi(camera_id)
+    return {"ok": True, "roi": roi.to_dict() if roi else {"roi": None, "masks": []}}
+
+
+def cmd_set_roi(camera_id, config):
+    try:
+        return {"ok": True, "roi": set_camera_roi(camera_id, config)}
+    except ValueError as e:
+        return {"ok": False, "invalid": True, "error": str(e)}
+
+
+def cmd_profile_start(mode, seconds, interval):
+    try:
+        return {"ok": True, "profile": profiler.start(mode, seconds, interval)}
+    except ValueError as e:
+        return {"ok": False, "invalid": True, "error": str(e)}
+    except RuntimeError as e:
+        return {"ok": False, "busy": True, "error": str(e)}
+
+
+def cmd_profile_status():
+    return {"ok": True, **profiler.status()}
+
+
+COMMANDS = {
+    "start": lambda req: cmd_start(req["camera_id"], req.get("wait", 0), req.get("tiles")),
+    "stop": lambda req: cmd_stop(req["camera_id"]),
+    "list": lambda req: cmd_list(),
+    "health": lambda req: cmd_health(),
+    "viewers": lambda req: cmd_viewers(req["worker"], req.get("counts")),
+    "alarm_stop": lambda req: cmd_alarm_stop(),
+    "verifier_stats": lambda req: cmd_verifier_stats(),
+    "get_roi": lambda req: cmd_get_roi(req["camera_id"]),
+    "set_roi": lambda req: cmd_set_roi(req["camera_id"], req.get("config")),
+    "profile_start": lambda req: cmd_profile_start(req.get("mode", "cpu"), req.get("seconds", 10),
+                                                   req.get("interval", 0.01)),
+    "profile_status": lambda req: cmd_profile_status(),
+}
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                req = json.loads(line)
+                handler = COMMANDS.get(req.get("cmd"))
+                if handler is None:
+                    resp = {"ok": False, "error": f"unknown command {req.get('cmd')!r}"}
+                else:
+                    resp = handler(req)
+            except Exception as e:
+                resp = {"ok": False, "error": str(e)}
+
+            self.wfile.write(json.dumps(resp).encode() + b"\n")
+            self.wfile.flush()
+
+
+class ControlServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, config=None):
+    ensure_clip_column(DB_PATH)
+    frame_listeners.append(publish_frame)
+
+    server = ControlServer((host, port), ControlHandler)
+    print(f"🎥 Camera manager listening on {host}:{port}")
+    if config:
+        start_cameras_from_config(config)
+
+    try:
+        server.serve_forever()
+    finally:
+        for cid in list(camera_streams):
+            stop_camera_stream(cid)
+        for cid in list(rings):
+            release_ring(cid)
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FireGuard camera manager daemon")
+    parser.add_argument("--host", default=os.environ.get("FIREGUARD_MANAGER_HOST", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("FIREGUARD_MANAGER_PORT", DEFAULT_PORT)))
+    parser.add_argument("--config", default=os.environ.get("FIREGUARD_CAMERAS_CONFIG"),
+                        help="cameras.json to open at boot")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.config)
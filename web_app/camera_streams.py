@@ -0,0 +1,544 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from clip_recorder import BUFFER_MB, ClipRecorder
+from detection.detection_engine import analyze_frame, forget_tracker, incident_listeners, set_camera_tiling
+from virtual_camera import VirtualCapture, is_virtual
+
+# ============================================================
+# MULTI CAMERA SYSTEM
+# ------------------------------------------------------------
+# Shared by newapp.py (in-process mode) and camera_manager.py
+# (daemon mode). Whoever imports this module owns the cameras.
+# ============================================================
+
+# "frame" is always the clean frame; overlays are drawn from "detections"
+# at encode time, and only for cameras someone is watching
+camera_streams = {}   # {camera_id: {"cap":..., "frame":..., "detections":..., "seq":..., "state":..., "running":...}}
+streams_lock = threading.Lock()
+
+# callables(camera_id, cam) run after every analyzed frame
+frame_listeners = []
+
+STATS_ALPHA = 0.1   # EMA weight for fps / inference latency
+
+# -------------------------------------
+# CAMERA STATES
+#   opening -> running -> stopping
+#   opening -> failed
+# streams_lock only guards the dict; opening a camera (which can take
+# tens of seconds for a dead RTSP URL) happens in the camera's own thread.
+# -------------------------------------
+OPENING = "opening"
+RUNNING = "running"
+FAILED = "failed"
+STOPPING = "stopping"
+
+OPEN_TIMEOUT = float(os.environ.get("FIREGUARD_OPEN_TIMEOUT", 10))   # seconds
+READ_TIMEOUT = float(os.environ.get("FIREGUARD_READ_TIMEOUT", 10))   # seconds
+
+# -------------------------------------
+# HEALTH & WATCHDOG
+#   a running camera with no good frame for STALL_SECONDS (a hung read,
+#   or reads that keep failing) gets a fresh capture thread; repeated
+#   restarts back off exponentially up to WATCHDOG_MAX_BACKOFF.
+#   FIREGUARD_STALL_SECONDS=0 turns the watchdog off.
+# -------------------------------------
+STALL_SECONDS = float(os.environ.get("FIREGUARD_STALL_SECONDS", 15))
+WATCHDOG_INTERVAL = 1.0
+WATCHDOG_BACKOFF = 2.0        # seconds before the first restart, doubled each time
+WATCHDOG_MAX_BACKOFF = 120.0
+HANDOVER_SECONDS = 2.0        # a restart waits this long for the stalled thread to let go
+INFER_WINDOW = 200            # inference times kept for percentiles
+OVERLOAD_RATIO = 0.8          # analyzed fps below this share of the source fps
+
+
+def open_capture(camera_id, open_timeout=OPEN_TIMEOUT, read_timeout=READ_TIMEOUT):
+    # load-test camera, see virtual_camera.py
+    if is_virtual(camera_id):
+        return VirtualCapture(camera_id)
+
+    # local device index
+    try:
+        return cv2.VideoCapture(int(camera_id))
+    except ValueError:
+        pass
+
+    # rtsp / http / file: let the backend give up on its own
+    params = [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(open_timeout * 1000),
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(read_timeout * 1000),
+    ]
+    try:
+        return cv2.VideoCapture(camera_id, cv2.CAP_ANY, params)
+    except Exception:
+        return cv2.VideoCapture(camera_id)  # older OpenCV without params
+
+
+# pre/post-event clip buffers, off with FIREGUARD_CLIP_RECORDING=0
+CLIP_RECORDING = os.environ.get("FIREGUARD_CLIP_RECORDING", "1") != "0"
+
+# -------------------------------------
+# FRAME SKIPPING
+#   Frames that will not be analyzed are only grab()bed, never
+#   retrieve()d (no BGR conversion or copy):
+#   - frames a live source queued while the last one was being analyzed:
+#     at most the backend's buffer (CAP_PROP_BUFFERSIZE, else
+#     LIVE_BUFFER_FRAMES), and skipping stops as soon as a grab() blocks
+#     for a fresh frame, i.e. the queue has drained
+#   - with analyze_fps / FIREGUARD_ANALYZE_FPS > 0, frames in between
+#     the analyzed ones
+#   The clip recorder still gets a frame whenever its own fps needs one.
+# -------------------------------------
+ANALYZE_FPS = float(os.environ.get("FIREGUARD_ANALYZE_FPS", 0))   # 0 = every frame
+MAX_FAST_FORWARD = 60
+LIVE_BUFFER_FRAMES = 4   # typical queue of a live / RTSP backend that won't report one
+DRAINED_RATIO = 0.5      # a grab() blocking this share of a frame period got a fresh frame
+
+
+def start_camera_stream(camera_id, open_timeout=OPEN_TIMEOUT, read_timeout=READ_TIMEOUT,
+                        clip_buffer_mb=BUFFER_MB, tiles=None, analyze_fps=ANALYZE_FPS):
+    """
+    Register a camera and open it in the background. Never blocks on the
+    camera itself; use wait_camera_open() to wait for the outcome.
+    `tiles` ("2x2", or a dict, see detection/tiling.py) turns on tiled
+    inference for high-resolution cameras; `analyze_fps` caps how many
+    frames a second go to the model.
+    """
+    camera_id = str(camera_id)
+
+    with streams_lock:
+        # If already opening or running, skip
+        cam = camera_streams.get(camera_id)
+        if cam is not None and cam["state"] in (OPENING, RUNNING):
+            return True
+
+        # raises ValueError on a bad spec, before anything is registered
+        set_camera_tiling(camera_id, tiles)
+        # a new run starts from a clean tracker, whatever the last one left behind
+        forget_tracker(camera_id)
+
+        cam = {
+            "cap": None,
+            "frame": None,
+            "detections": None,
+            "seq": 0,
+            "label": "no_fire",
+            "severity": 0,
+            "timestamp": None,
+            "fps": 0.0,
+            "infer_ms": 0.0,
+            "capture_fps": 0.0,
+            "source_fps": 0.0,
+            "last_read": None,
+            "read_failures": 0,
+            "infer_times": deque(maxlen=INFER_WINDOW),
+            "analyze_fps": float(analyze_fps or 0),
+            "skipped": 0,
+            "generation": 0,
+            "restarts": 0,
+            "backoff": 0,
+            "next_restart": 0.0,
+            "state": OPENING,
+            "error": None,
+            "opened": threading.Event(),
+            "open_timeout": open_timeout,
+            "read_timeout": read_timeout,
+            "recorder": ClipRecorder(camera_id, buffer_mb=clip_buffer_mb) if CLIP_RECORDING else None,
+            "running": True
+        }
+        camera_streams[camera_id] = cam
+
+        _start_capture_thread(camera_id, cam)
+        _ensure_watchdog()
+
+        # backends that ignore CAP_PROP_OPEN_TIMEOUT_MSEC still fail on time
+        deadline = threading.Timer(open_timeout + 1.0, _open_deadline, args=(camera_id, cam))
+        deadline.daemon = True
+        deadline.start()
+
+        return True
+
+
+def _start_capture_thread(camera_id, cam, replaces=None):
+    # named so the profiler can attribute CPU to the camera
+    th = threading.Thread(target=update_camera_frame, args=(camera_id, cam, cam["generation"], replaces),
+                          name=f"camera-{camera_id}", daemon=True)
+    cam["thread"] = th
+    th.start()
+
+
+def _open_deadline(camera_id, cam):
+    if cam["state"] == OPENING:
+        cam["running"] = False
+        _set_state(cam, FAILED, "Timed out opening camera stream")
+        print(f"⏱️ Camera {camera_id} timed out while opening")
+
+
+def wait_camera_open(camera_id, timeout=None):
+    """Wait until a camera leaves the opening state. Returns its state."""
+    cam = camera_streams.get(str(camera_id))
+    if cam is None:
+        return None
+    cam["opened"].wait(timeout)
+    return cam["state"]
+
+
+def _set_state(cam, state, error=None):
+    cam["state"] = state
+    cam["error"] = error
+    if state != OPENING:
+        cam["opened"].set()
+
+
+def update_camera_frame(camera_id, cam, generation=0, replaces=None):
+    """
+    Capture loop. `generation` tells a watchdog restart apart from the
+    thread it replaced: a superseded thread exits as soon as its read
+    returns and leaves the camera's state alone. `replaces` is that
+    thread and its capture, which must let go of the device first.
+    """
+    camera_id = str(camera_id)
+
+    def current():
+        return cam["running"] and cam["generation"] == generation
+
+    if replaces is not None:
+        _take_over(camera_id, *replaces)
+
+    # attempt to open camera (outside streams_lock)
+    cap = open_capture(camera_id, cam["open_timeout"], cam["read_timeout"])
+
+    if not current():
+        # stopped (or replaced) while we were still opening
+        cap.release()
+        return
+    cam["cap"] = cap
+
+    if not cap.isOpened():
+        cap.release()
+        if generation:
+            # a watchdog reopen: stay running, the watchdog retries with backoff
+            cam["error"] = "Failed to reopen camera stream"
+            print(f"❌ Camera {camera_id} failed to reopen")
+            return
+        cam["running"] = False
+        _set_state(cam, FAILED, "Failed to open camera stream")
+        print(f"❌ Camera {camera_id} failed to open")
+        return
+
+    _set_state(cam, RUNNING)
+    cam["source_fps"] = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    # a live source only queues what its buffer holds; older frames are already gone
+    buffered = int(cap.get(cv2.CAP_PROP_BUFFERSIZE))
+    buffered = min(MAX_FAST_FORWARD, buffered if buffered > 0 else LIVE_BUFFER_FRAMES)
+    drained_after = DRAINED_RATIO / cam["source_fps"] if cam["source_fps"] else None
+    # the stall clock starts at open
+    if cam["last_read"] is None:
+        cam["last_read"] = time.time()
+    # capture fps over ~1 s windows (fast-forward grabs come in bursts)
+    window_start, window_grabs = time.time(), 0
+
+    # a file played as a camera is read at its own pace, never fast-forwarded
+    live = not _is_file_source(camera_id)
+    analyze_interval = 1.0 / cam["analyze_fps"] if cam["analyze_fps"] > 0 else 0.0
+    next_analyze = 0.0
+    backlog = 0
+
+    while current():
+        grab_start = time.time()
+        ok = cap.grab()
+
+        if not ok:
+            cam["read_failures"] += 1
+            # small sleep to avoid tight loop on failures
+            time.sleep(0.1)
+            continue
+
+        read_at = cam["last_read"] = time.time()
+        window_grabs += 1
+        if read_at - window_start >= 1.0:
+            cam["capture_fps"] = window_grabs / (read_at - window_start)
+            window_start, window_grabs = read_at, 0
+        cam["read_failures"] = 0
+        cam["backoff"] = 0
+
+        if backlog > 0 and drained_after is not None and read_at - grab_start >= drained_after:
+            # grab() waited for this frame: nothing stale is left to skip
+            backlog = 0
+
+        recorder = cam["recorder"]
+        if backlog > 0 or read_at < next_analyze:
+            # skipped: only decode it if the clip buffer is due a frame
+            backlog -= 1
+            cam["skipped"] += 1
+            if recorder is not None and recorder.wants(read_at):
+                ok, frame = cap.retrieve()
+                if ok:
+                    recorder.add(frame, read_at)
+            continue
+
+        ok, frame = cap.retrieve()
+        if not ok:
+            cam["read_failures"] += 1
+            continue
+        if analyze_interval:
+            next_analyze = max(next_analyze + analyze_interval, read_at)
+
+        if recorder is not None:
+            recorder.add(frame, read_at)
+
+        label, severity = cam["label"], cam["severity"]
+
+        # process frame with YOLO
+        t0 = time.perf_counter()
+        result = None
+        try:
+            result = analyze_frame(frame, camera_id)
+            label, severity = result["final_label"], result["severity"]
+        except Exception:
+            # if processing fails, keep original frame
+            pass
+        infer_ms = (time.perf_counter() - t0) * 1000
+
+        now = time.time()
+        if cam["timestamp"] is not None and now > cam["timestamp"]:
+            fps = 1.0 / (now - cam["timestamp"])
+            cam["fps"] += STATS_ALPHA * (fps - cam["fps"])
+        if cam["infer_ms"]:
+            cam["infer_ms"] += STATS_ALPHA * (infer_ms - cam["infer_ms"])
+        else:
+            cam["infer_ms"] = infer_ms
+        cam["infer_times"].append(infer_ms)
+
+        cam["frame"] = frame
+        cam["detections"] = result
+        cam["label"] = label
+        cam["severity"] = severity
+        cam["timestamp"] = now
+        cam["seq"] += 1
+
+        for listener in frame_listeners:
+            try:
+                listener(camera_id, cam)
+            except Exception as e:
+                print(f"⚠️ Frame listener failed for camera {camera_id}: {e}")
+
+        # frames the source queued while we were busy are stale: fast-forward past them
+        if live and cam["source_fps"]:
+            backlog = min(buffered, int((time.time() - read_at) * cam["source_fps"]))
+
+    # cleanup: only this thread touches cap, so release can't race a read
+    try:
+        cap.release()
+    except Exception:
+        pass
+    if cam["generation"] != generation:
+        # replaced by the watchdog; the new thread owns the camera now
+        return
+    if cam["recorder"] is not None:
+        cam["recorder"].abort()
+    with streams_lock:
+        # after a quick stop/start the tracker belongs to the new run
+        if camera_streams.get(camera_id) in (None, cam):
+            forget_tracker(camera_id)
+
+
+def start_incident_clip(camera_id, label, severity):
+    cam = camera_streams.get(str(camera_id)) if camera_id is not None else None
+    if cam is None or cam["recorder"] is None:
+        return None
+    return cam["recorder"].trigger(label)
+
+
+incident_listeners.append(start_incident_clip)
+
+
+def stop_camera_stream(camera_id):
+    camera_id = str(camera_id)
+    with streams_lock:
+        cam = camera_streams.pop(camera_id, None)
+    if cam is None:
+        return False
+
+    # the capture thread releases cap once its current read returns
+    was_running = cam["state"] in (OPENING, RUNNING)
+    cam["running"] = False
+    _set_state(cam, STOPPING)
+    return was_running
+
+
+# ============================================================
+# HEALTH & WATCHDOG
+# ============================================================
+_watchdog = None
+
+
+def _ensure_watchdog():
+    # called with streams_lock held
+    global _watchdog
+    if STALL_SECONDS > 0 and _watchdog is None:
+        _watchdog = threading.Thread(target=_watchdog_loop, name="camera-watchdog", daemon=True)
+        _watchdog.start()
+
+
+def _is_file_source(camera_id):
+    return os.path.isfile(camera_id)
+
+
+def _frame_age(cam, now):
+    return now - cam["last_read"] if cam["last_read"] is not None else None
+
+
+def _watchdog_loop():
+    while True:
+        time.sleep(WATCHDOG_INTERVAL)
+        now = time.time()
+        for camera_id, cam in list(camera_streams.items()):
+            age = _frame_age(cam, now)
+            if (cam["state"] != RUNNING or not cam["running"] or age is None or age < STALL_SECONDS
+                    or now < cam["next_restart"] or _is_file_source(camera_id)):
+                # files that ended are finished, not stalled
+                continue
+            restart_capture(camera_id, cam, now)
+
+
+def _take_over(camera_id, thread, cap):
+    """
+    Wait for a replaced capture thread to release its device; if its read
+    is still hung after HANDOVER_SECONDS, release the capture under it.
+    USB / V4L2 devices refuse a second open while the first is held.
+    """
+    if thread is not None:
+        thread.join(HANDOVER_SECONDS)
+        if not thread.is_alive():
+            return
+    if cap is not None:
+        print(f"🐕 Camera {camera_id}: stalled capture still busy, releasing it")
+        try:
+            cap.release()
+        except Exception:
+            pass
+
+
+def restart_capture(camera_id, cam, now=None):
+    """Replace a camera's capture thread; the new one opens once the old one lets go."""
+    now = now or time.time()
+    delay = min(WATCHDOG_MAX_BACKOFF, WATCHDOG_BACKOFF * 2 ** cam["backoff"])
+    cam["backoff"] += 1
+    cam["next_restart"] = now + STALL_SECONDS + delay
+    cam["restarts"] += 1
+    cam["generation"] += 1
+    print(f"🐕 Camera {camera_id} stalled for {_frame_age(cam, now):.0f}s, "
+          f"restarting capture (#{cam['restarts']}, next retry in ≥{delay:.0f}s)")
+    _start_capture_thread(camera_id, cam, replaces=(cam.get("thread"), cam["cap"]))
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(np.fromiter(values, float), [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+
+def _health(camera_id, cam, age):
+    if cam["state"] != RUNNING:
+        return cam["state"]
+    if age is not None and age >= STALL_SECONDS > 0:
+        return "ended" if _is_file_source(camera_id) else "stalled"
+    target = cam["source_fps"]
+    if cam["analyze_fps"]:
+        target = min(target, cam["analyze_fps"]) if target else cam["analyze_fps"]
+    if target and cam["fps"] < OVERLOAD_RATIO * target:
+        return "overloaded"
+    return "ok"
+
+
+def camera_health():
+    """
+    Per-camera health, JSON-safe: ok, overloaded (analysis slower than
+    the source), stalled, ended (file sources), or the camera state.
+    """
+    now = time.time()
+    out = {}
+    for cid, cam in list(camera_streams.items()):
+        age = _frame_age(cam, now)
+        out[cid] = {
+            "state": cam["state"],
+            "health": _health(cid, cam, age),
+            "error": cam["error"],
+            "source_fps": round(cam["source_fps"], 2),
+            "capture_fps": round(cam["capture_fps"], 2),
+            "analyzed_fps": round(cam["fps"], 2),
+            "frame_age_s": round(age, 2) if age is not None else None,
+            "read_failures": cam["read_failures"],
+            "infer_ms": _percentiles(list(cam["infer_times"])),
+            "restarts": cam["restarts"],
+            "skipped_frames": cam["skipped"],
+        }
+    return out
+
+
+# ============================================================
+# BOOT-TIME BRING-UP
+# ------------------------------------------------------------
+# cameras.json:
+#   {
+#     "open_timeout": 10,
+#     "read_timeout": 10,
+#     "clip_buffer_mb": 16,
+#     "analyze_fps": 5,
+#     "cameras": ["rtsp://...", {"camera_id": "1", "open_timeout": 3, "clip_buffer_mb": 4},
+#                 {"camera_id": "rtsp://.../4k", "tiles": "3x2"}]
+#   }
+# All cameras are opened in parallel, so bring-up takes about as long
+# as the slowest one.
+# ============================================================
+def start_cameras_from_config(path):
+    with open(path) as f:
+        config = json.load(f)
+
+    open_timeout = config.get("open_timeout", OPEN_TIMEOUT)
+    read_timeout = config.get("read_timeout", READ_TIMEOUT)
+
+    started = []
+    for entry in config.get("cameras", []):
+        if not isinstance(entry, dict):
+            entry = {"camera_id": entry}
+        camera_id = str(entry["camera_id"])
+        start_camera_stream(
+            camera_id,
+            open_timeout=entry.get("open_timeout", open_timeout),
+            read_timeout=entry.get("read_timeout", read_timeout),
+            clip_buffer_mb=entry.get("clip_buffer_mb", config.get("clip_buffer_mb", BUFFER_MB)),
+            tiles=entry.get("tiles"),
+            analyze_fps=entry.get("analyze_fps", config.get("analyze_fps", ANALYZE_FPS)),
+        )
+        started.append(camera_id)
+
+    print(f"🎥 Opening {len(started)} cameras from {path}")
+    return started
+
+
+def list_camera_streams():
+    """Lightweight, JSON-safe view of the running cameras."""
+    return {
+        cid: {
+            "state": cam["state"],
+            "error": cam["error"],
+            "running": cam["running"],
+            "seq": cam["seq"],
+            "label": cam["label"],
+            "severity": cam["severity"],
+            "timestamp": cam["timestamp"],
+            "fps": round(cam["fps"], 2),
+            "infer_ms": round(cam["infer_ms"], 2),
+        }
+        for cid, cam in list(camera_streams.items())
+    }
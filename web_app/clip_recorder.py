@@ -0,0 +1,187 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from stream_encoder import encode_jpeg, resize_to_width
+
+# ============================================================
+# INCIDENT CLIP RECORDING
+# ------------------------------------------------------------
+# Every camera keeps the last few seconds of frames in memory
+# (downscaled and JPEG-compressed, capped at a byte budget). When an
+# incident opens, that pre-event buffer plus the next POST_SECONDS of
+# frames are handed to one background encoder thread that writes a
+# video clip, so the live loop never waits on disk or the codec.
+# A clip takes its encoder slot when it is triggered: with all
+# ENCODE_QUEUE_SIZE slots taken no clip (and no clip path) is made.
+# ============================================================
+
+CLIP_DIR = "static/clips"
+os.makedirs(CLIP_DIR, exist_ok=True)
+
+CLIP_FPS = float(os.environ.get("FIREGUARD_CLIP_FPS", 10))
+CLIP_WIDTH = int(os.environ.get("FIREGUARD_CLIP_WIDTH", 640))
+CLIP_QUALITY = 70
+CLIP_STORE = os.environ.get("FIREGUARD_CLIP_STORE", "jpeg")   # "jpeg" or "raw"
+PRE_SECONDS = float(os.environ.get("FIREGUARD_CLIP_PRE_SECONDS", 10))
+POST_SECONDS = float(os.environ.get("FIREGUARD_CLIP_POST_SECONDS", 10))
+BUFFER_MB = float(os.environ.get("FIREGUARD_CLIP_BUFFER_MB", 16))   # per camera
+CLIP_FOURCC = os.environ.get("FIREGUARD_CLIP_FOURCC", "mp4v")
+
+ENCODE_QUEUE_SIZE = 8
+
+
+def _safe_name(camera_id):
+    return "".join(c if c.isalnum() else "_" for c in str(camera_id))[-40:]
+
+
+class ClipRecorder:
+    """Bounded pre-event buffer for one camera."""
+
+    def __init__(self, camera_id, buffer_mb=BUFFER_MB, pre_seconds=PRE_SECONDS,
+                 post_seconds=POST_SECONDS, fps=CLIP_FPS, width=CLIP_WIDTH, store=CLIP_STORE):
+        self.camera_id = camera_id
+        self.max_bytes = int(buffer_mb * 1024 * 1024)
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.interval = 1.0 / fps
+        self.fps = fps
+        self.width = width
+        self.store = store
+
+        self.buffer = deque()    # (timestamp, jpeg bytes or ndarray, nbytes)
+        self.buffer_bytes = 0
+        self.last_add = 0.0
+
+        self.lock = threading.Lock()
+        self.recording = None    # {"path", "frames", "until"} while collecting post-event frames
+
+    def _compress(self, frame):
+        small = resize_to_width(frame, self.width)
+        if self.store == "raw":
+            # frames are never drawn on after capture, so no copy is needed
+            return small, small.nbytes
+        jpeg = encode_jpeg(small, CLIP_QUALITY)
+        return jpeg, len(jpeg) if jpeg else 0
+
+    def wants(self, timestamp):
+        """Would add() keep a frame taken at `timestamp`? Lets skipped frames go undecoded."""
+        return timestamp - self.last_add >= self.interval
+
+    def add(self, frame, timestamp=None):
+        """Called from the capture thread for every frame; samples at the clip fps."""
+        now = time.time() if timestamp is None else timestamp
+        if not self.wants(now):
+            return
+        self.last_add = now
+
+        item, nbytes = self._compress(frame)
+        if item is None:
+            return
+
+        with self.lock:
+            if self.recording is not None:
+                self.recording["frames"].append((now, item))
+                if now >= self.recording["until"]:
+                    job, self.recording = self.recording, None
+                    submit_clip(job)
+
+            self.buffer.append((now, item, nbytes))
+            self.buffer_bytes += nbytes
+
+            # drop by age and by memory budget
+            while self.buffer and (now - self.buffer[0][0] > self.pre_seconds
+                                   or self.buffer_bytes > self.max_bytes):
+                _, _, old = self.buffer.popleft()
+                self.buffer_bytes -= old
+
+    def trigger(self, label="incident"):
+        """
+        Start a clip of the buffered past plus the next post_seconds. Returns
+        its path, or None if the encoder is too far behind to take the clip.
+        """
+        with self.lock:
+            if self.recording is not None:
+                return self.recording["path"]
+            if not clip_slots.acquire(blocking=False):
+                print(f"⚠️ Clip encoder busy, no clip for camera {self.camera_id}")
+                return None
+
+            now = time.time()
+            name = f"{int(now)}_{_safe_name(self.camera_id)}_{_safe_name(label)}.mp4"
+            path = os.path.join(CLIP_DIR, name)
+            self.recording = {
+                "path": path,
+                "fps": self.fps,
+                "frames": [(ts, item) for ts, item, _ in self.buffer],
+                "until": now + self.post_seconds,
+            }
+            return path
+
+    def abort(self):
+        """Camera stopping: write whatever was collected so far."""
+        with self.lock:
+            job, self.recording = self.recording, None
+        if job is None:
+            return
+        if job["frames"]:
+            submit_clip(job)
+        else:
+            clip_slots.release()
+
+
+# ============================================================
+# BACKGROUND ENCODER
+# ============================================================
+clip_queue = queue.Queue()
+# taken by trigger(), given back once the clip is written: bounds the queue
+clip_slots = threading.BoundedSemaphore(ENCODE_QUEUE_SIZE)
+
+
+def submit_clip(job):
+    # the job already holds a slot, so this never blocks
+    clip_queue.put_nowait(job)
+
+
+def _decode(item):
+    if isinstance(item, np.ndarray):
+        return item
+    return cv2.imdecode(np.frombuffer(item, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def write_clip(job):
+    writer = None
+    size = None
+    for _, item in job["frames"]:
+        frame = _decode(item)
+        if frame is None:
+            continue
+        if writer is None:
+            size = (frame.shape[1], frame.shape[0])
+            writer = cv2.VideoWriter(job["path"], cv2.VideoWriter_fourcc(*CLIP_FOURCC), job["fps"], size)
+        if (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size)
+        writer.write(frame)
+
+    if writer is not None:
+        writer.release()
+        print(f"🎞️ Incident clip saved: {job['path']} ({len(job['frames'])} frames)")
+
+
+def clip_encoder_loop():
+    while True:
+        job = clip_queue.get()
+        try:
+            write_clip(job)
+        except Exception as e:
+            print(f"⚠️ Clip encode failed for {job['path']}: {e}")
+        finally:
+            clip_slots.release()
+
+
+threading.Thread(target=clip_encoder_loop, daemon=True).start()
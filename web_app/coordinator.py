@@ -0,0 +1,370 @@
+import bisect
+import hashlib
+import os
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+from flask import Flask, Response, request, jsonify
+from flask_cors import CORS
+
+# ============================================================
+# CAMERA SHARDING COORDINATOR
+# ------------------------------------------------------------
+# Single API in front of several inference nodes (newapp.py started
+# with FIREGUARD_COORDINATOR pointing here). Cameras are placed with
+# consistent hashing weighted by each node's measured FPS capacity;
+# nodes that are full are skipped. When a node joins or stops sending
+# heartbeats the ring is rebuilt and only the cameras whose owner
+# changed are moved.
+#
+# Run from web_app/:  python coordinator.py   (port 5000 by default)
+# ============================================================
+
+app = Flask(__name__)
+CORS(app)
+
+NODE_TIMEOUT = 6.0          # seconds without heartbeat -> node is dead
+CAMERA_FPS_ESTIMATE = 10.0  # load assumed for a camera until a node reports it
+VNODES_PER_FPS = 4
+MIN_VNODES, MAX_VNODES = 16, 400
+REQUEST_TIMEOUT = 30
+REISSUE_BACKOFF = 4.0       # seconds before re-issuing a camera a node lost, doubled each time
+MAX_REISSUE_BACKOFF = 300.0
+
+nodes = {}        # {node_id: {"url", "capacity_fps", "load_fps", "cameras", "last_seen"}}
+assignments = {}  # {camera_id: node_id}
+camera_tiles = {} # {camera_id: tiles spec}, sent along wherever the camera is started
+reissues = {}     # {camera_id: (next attempt time, attempts)} for cameras a node is not running
+state_lock = threading.RLock()
+
+
+# ============================================================
+# CONSISTENT HASH RING
+# ============================================================
+def _hash(key):
+    return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+
+class HashRing:
+    def __init__(self, weights):
+        """weights: {node_id: capacity_fps}"""
+        self.points = []
+        self.members = set(weights)
+        for node_id, capacity in weights.items():
+            vnodes = int(min(MAX_VNODES, max(MIN_VNODES, capacity * VNODES_PER_FPS)))
+            for i in range(vnodes):
+                self.points.append((_hash(f"{node_id}#{i}"), node_id))
+        self.points.sort()
+        self._keys = [p[0] for p in self.points]
+
+    def walk(self, key):
+        """Distinct nodes in clockwise order starting at key's position."""
+        if not self.points:
+            return
+        seen = set()
+        start = bisect.bisect(self._keys, _hash(key))
+        for i in range(len(self.points)):
+            node_id = self.points[(start + i) % len(self.points)][1]
+            if node_id not in seen:
+                seen.add(node_id)
+                yield node_id
+
+
+ring = HashRing({})
+
+
+def rebuild_ring():
+    global ring
+    ring = HashRing({nid: n["capacity_fps"] for nid, n in nodes.items()})
+
+
+def headroom(node_id, planned):
+    n = nodes[node_id]
+    # cameras we placed but the node has not reported running yet
+    pending = sum(1 for cid in planned.get(node_id, ()) if cid not in n["cameras"])
+    return n["capacity_fps"] - n["load_fps"] - pending * CAMERA_FPS_ESTIMATE
+
+
+def choose_node(camera_id, planned):
+    fallback = None
+    for node_id in ring.walk(camera_id):
+        if fallback is None:
+            fallback = node_id
+        if headroom(node_id, planned) >= CAMERA_FPS_ESTIMATE:
+            return node_id
+    # every node is full: stay on the hash owner rather than refuse
+    return fallback
+
+
+def planned_by_node():
+    planned = {}
+    for cid, nid in assignments.items():
+        planned.setdefault(nid, set()).add(cid)
+    return planned
+
+
+# ============================================================
+# NODE CALLS
+# ============================================================
+def node_post(node_id, path, payload):
+    url = nodes[node_id]["url"] if node_id in nodes else node_id
+    try:
+        r = requests.post(f"{url}{path}", json=payload, timeout=REQUEST_TIMEOUT)
+        return r.json()
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+def start_payload(camera_id):
+    with state_lock:
+        return {"camera_id": camera_id, "tiles": camera_tiles.get(camera_id)}
+
+
+def place_camera(camera_id):
+    """Pick a node for camera_id and start it there. Returns (node_id, response)."""
+    with state_lock:
+        node_id = choose_node(camera_id, planned_by_node())
+        if node_id is None:
+            return None, {"ok": False, "error": "No inference nodes available"}
+        assignments[camera_id] = node_id
+
+    res = node_post(node_id, "/api/cameras/start", start_payload(camera_id))
+    if not res.get("ok"):
+        with state_lock:
+            if assignments.get(camera_id) == node_id:
+                assignments.pop(camera_id, None)
+    return node_id, res
+
+
+def rebalance():
+    """Move cameras whose node died, or whose hash owner is a newly joined node."""
+    with state_lock:
+        joined = set(nodes) - set(ring.members)
+        rebuild_ring()
+
+        # keep everything that can stay, then place the rest around it
+        planned = {}
+        orphans = []
+        for camera_id in sorted(assignments):
+            old = assignments[camera_id]
+            owner = next(ring.walk(camera_id), None)
+            if old in nodes and (owner == old or owner not in joined):
+                planned.setdefault(old, set()).add(camera_id)
+            else:
+                orphans.append(camera_id)
+
+        moves = []
+        for camera_id in orphans:
+            old = assignments[camera_id]
+            new = choose_node(camera_id, planned)
+            planned.setdefault(new, set()).add(camera_id)
+            if new != old:
+                moves.append((camera_id, old, new))
+                assignments[camera_id] = new
+
+    for camera_id, old, new in moves:
+        print(f"🔀 Moving camera {camera_id}: {old} -> {new}")
+        if old in nodes:
+            node_post(old, "/api/cameras/stop", {"camera_id": camera_id})
+        if new is not None:
+            node_post(new, "/api/cameras/start", start_payload(camera_id))
+        else:
+            with state_lock:
+                assignments.pop(camera_id, None)
+
+
+def reap_dead_nodes():
+    while True:
+        time.sleep(NODE_TIMEOUT / 2)
+        now = time.time()
+        with state_lock:
+            dead = [nid for nid, n in nodes.items() if now - n["last_seen"] > NODE_TIMEOUT]
+            for nid in dead:
+                print(f"💀 Node {nid} missed heartbeats, removing")
+                nodes.pop(nid, None)
+        if dead:
+            rebalance()
+
+
+# ============================================================
+# NODE REGISTRATION
+# ============================================================
+@app.route("/api/nodes/heartbeat", methods=["POST"])
+def api_node_heartbeat():
+    data = request.get_json(force=True) or {}
+    node_id = data["node_id"]
+
+    with state_lock:
+        joined = node_id not in nodes
+        nodes[node_id] = {
+            "url": data.get("url", node_id),
+            "capacity_fps": float(data.get("capacity_fps", 0)),
+            "load_fps": float(data.get("load_fps", 0)),
+            "cameras": set(data.get("cameras", [])),
+            "last_seen": time.time(),
+        }
+        # a restarted node comes back empty: re-issue what it should be running,
+        # backing off for cameras that keep failing to open
+        now = time.time()
+        missing = []
+        for cid, nid in assignments.items():
+            if nid != node_id:
+                continue
+            if cid in nodes[node_id]["cameras"]:
+                reissues.pop(cid, None)
+                continue
+            next_try, attempts = reissues.get(cid, (0.0, 0))
+            if now < next_try:
+                continue
+            reissues[cid] = (now + min(MAX_REISSUE_BACKOFF, REISSUE_BACKOFF * 2 ** attempts), attempts + 1)
+            missing.append(cid)
+
+    if joined:
+        print(f"🖥️ Node {node_id} joined ({data.get('capacity_fps')} fps capacity)")
+        threading.Thread(target=rebalance, daemon=True).start()
+    elif missing:
+        for cid in missing:
+            threading.Thread(target=node_post, args=(node_id, "/api/cameras/start", start_payload(cid)),
+                             daemon=True).start()
+
+    return jsonify({"ok": True})
+
+
+@app.route("/api/nodes")
+def api_nodes():
+    with state_lock:
+        planned = planned_by_node()
+        return jsonify({
+            nid: {
+                "url": n["url"],
+                "capacity_fps": n["capacity_fps"],
+                "load_fps": n["load_fps"],
+                "headroom_fps": round(headroom(nid, planned), 2),
+                "cameras": sorted(planned.get(nid, ())),
+                "last_seen": n["last_seen"],
+            }
+            for nid, n in nodes.items()
+        })
+
+
+# ============================================================
+# CAMERA API (same shape as newapp.py)
+# ============================================================
+@app.route("/api/cameras/start", methods=["POST"])
+def api_start_camera():
+    data = request.get_json(force=True) or {}
+    camera_id = str(data.get("camera_id", 0))
+
+    with state_lock:
+        node_id = assignments.get(camera_id)
+        if node_id is not None and node_id in nodes:
+            return jsonify({"ok": True, "camera_id": camera_id, "node": node_id})
+        if data.get("tiles") is not None:
+            camera_tiles[camera_id] = data["tiles"]
+
+    node_id, res = place_camera(camera_id)
+    if not res.get("ok"):
+        with state_lock:
+            camera_tiles.pop(camera_id, None)
+        return jsonify({"ok": False, "error": res.get("error", "Failed to open camera stream")}), 500
+    return jsonify({"ok": True, "camera_id": camera_id, "node": node_id})
+
+
+@app.route("/api/cameras/stop", methods=["POST"])
+def api_stop_camera():
+    data = request.get_json(silent=True) or {}
+    camera_id = str(data.get("camera_id", 0))
+
+    with state_lock:
+        node_id = assignments.pop(camera_id, None)
+        camera_tiles.pop(camera_id, None)
+        reissues.pop(camera_id, None)
+    if node_id is None:
+        return jsonify({"ok": False, "stopped": None})
+
+    res = node_post(node_id, "/api/cameras/stop", {"camera_id": camera_id})
+    return jsonify({"ok": res.get("ok", False), "stopped": camera_id, "node": node_id})
+
+
+@app.route("/video_feed/<camera_id>")
+def video_feed(camera_id):
+    with state_lock:
+        node_id = assignments.get(camera_id)
+        node = nodes.get(node_id)
+    if node is None:
+        node_id, res = place_camera(camera_id)
+        if not res.get("ok"):
+            return "Camera stream not available", 404
+        with state_lock:
+            node = nodes.get(node_id)
+        if node is None:
+            # evicted between placement and now
+            return "Camera node not reachable", 502
+
+    url = f"{node['url']}/video_feed/{quote(camera_id, safe='')}"
+    if request.query_string:
+        # ?fps= / ?profile= are applied by the node that encodes the stream
+        url += "?" + request.query_string.decode()
+    try:
+        upstream = requests.get(url, stream=True, timeout=REQUEST_TIMEOUT)
+    except Exception:
+        return "Camera node not reachable", 502
+
+    def proxy():
+        try:
+            for chunk in upstream.iter_content(chunk_size=64 * 1024):
+                yield chunk
+        finally:
+            upstream.close()
+
+    return Response(proxy(), status=upstream.status_code,
+                    mimetype=upstream.headers.get("Content-Type", "multipart/x-mixed-replace; boundary=frame"))
+
+
+# ============================================================
+# ALERTS (merged from every node)
+# ============================================================
+@app.route("/api/events")
+def api_events():
+    with state_lock:
+        targets = [(nid, n["url"]) for nid, n in nodes.items()]
+
+    events = []
+    seen = set()
+    for node_id, url in targets:
+        try:
+            rows = requests.get(f"{url}/api/events", timeout=REQUEST_TIMEOUT).json()
+        except Exception:
+            continue
+        for row in rows:
+            # local test nodes may share one alerts.db
+            key = (row.get("timestamp"), row.get("label"), row.get("snapshot_path"))
+            if key in seen:
+                continue
+            seen.add(key)
+            row["node"] = node_id
+            events.append(row)
+
+    events.sort(key=lambda r: r.get("timestamp") or "", reverse=True)
+    return jsonify(events)
+
+
+@app.route("/api/alarm/stop", methods=["POST"])
+def api_stop_alarm():
+    with state_lock:
+        targets = list(nodes)
+    results = {nid: node_post(nid, "/api/alarm/stop", {}).get("ok", False) for nid in targets}
+    return jsonify({"ok": all(results.values()), "nodes": results})
+
+
+@app.route("/")
+def home():
+    return "🔥 FireGuard Coordinator Running"
+
+
+threading.Thread(target=reap_dead_nodes, daemon=True).start()
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.environ.get("FIREGUARD_PORT", 5000)), threaded=True)
@@ -1,19 +1,46 @@
+import os
 import sqlite3
 
-conn = sqlite3.connect("alerts.db")
-cursor = conn.cursor()
+DB_PATH = os.environ.get("FIREGUARD_DB_PATH", "alerts.db")
 
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS alerts (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    timestamp TEXT,
-    label TEXT,
-    severity INTEGER,
-    snapshot_path TEXT
-)
-""")
 
-conn.commit()
-conn.close()
+def create_alerts_table(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
 
-print("✔ SQLite Database & alerts table created successfully.")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        label TEXT,
+        severity INTEGER,
+        snapshot_path TEXT,
+        clip_path TEXT
+    )
+    """)
+
+    conn.commit()
+    conn.close()
+
+
+def ensure_clip_column(db_path=DB_PATH):
+    """
+    Databases created before clip recording lack alerts.clip_path. Run by
+    the app and the camera manager at startup, not on import, so tools
+    that import the detection engine never touch a database.
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        cols = [row[1] for row in conn.execute("PRAGMA table_info(alerts)")]
+        if cols and "clip_path" not in cols:
+            conn.execute("ALTER TABLE alerts ADD COLUMN clip_path TEXT")
+            conn.commit()
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not add clip_path column: {e}")
+
+
+if __name__ == "__main__":
+    create_alerts_table()
+    ensure_clip_column()
+    print("✔ SQLite Database & alerts table created successfully.")
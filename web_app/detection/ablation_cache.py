@@ -0,0 +1,256 @@
+import argparse
+import glob
+import json
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+# =========================================
+# CACHED ABLATION
+# -----------------------------------------
+# Phase 1 (slow, once):  run the model over every video of a dataset,
+#   in parallel worker processes, and store each frame's boxes in one
+#   compressed .npz per video.
+# Phase 2 (fast, often): replay any smoothing / threshold / severity
+#   setting against the cache, without touching the model.
+#
+# Run from web_app/:
+#   python -m detection.ablation_cache build <dataset dir> [--workers 4]
+#   python -m detection.ablation_cache replay [--window 7] [--conf 0.4]
+#
+# The dataset is labelled by folder: .../fire/*.avi, .../smoke/*.avi,
+# anything else is a negative (ground truth "no_fire").
+# =========================================
+
+MODEL_PATH = "detection/yolo11-d-fire-dataset.pt"
+CACHE_DIR = "detection/ablation_cache"
+CACHE_CONF = 0.1   # cache low-confidence boxes too, so replay can sweep --conf upwards
+VIDEO_EXTS = ("avi", "mp4", "mkv", "mov")
+
+NO_FIRE, SMOKE, FIRE = 0, 1, 2
+
+# model class id -> label code
+CLASS_CODE = np.zeros(256, dtype=np.int8)
+CLASS_CODE[0], CLASS_CODE[1] = SMOKE, FIRE
+
+
+# =========================================
+# PHASE 1: DETECT ONCE
+# =========================================
+_model = None
+
+
+def _load_model(model_path):
+    global _model
+    from ultralytics import YOLO
+    _model = YOLO(model_path)
+
+
+def cache_path(video_path, dataset_dir, cache_dir):
+    rel = os.path.relpath(video_path, dataset_dir)
+    return os.path.join(cache_dir, os.path.splitext(rel)[0] + ".npz")
+
+
+def detect_video(job):
+    """Worker: one video -> one .npz of per-frame boxes."""
+    video_path, out_path = job
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    offsets, xyxy, cls, conf = [0], [], [], []
+    t0 = time.perf_counter()
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        boxes = _model(frame, conf=CACHE_CONF, verbose=False)[0].boxes
+        if boxes is not None and len(boxes):
+            xyxy.append(boxes.xyxy.cpu().numpy().astype(np.int16))
+            cls.append(boxes.cls.cpu().numpy().astype(np.uint8))
+            conf.append(boxes.conf.cpu().numpy().astype(np.float16))
+        offsets.append(offsets[-1] + (len(boxes) if boxes is not None else 0))
+    cap.release()
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    np.savez_compressed(
+        out_path,
+        offsets=np.array(offsets, dtype=np.int32),
+        xyxy=np.concatenate(xyxy) if xyxy else np.zeros((0, 4), np.int16),
+        cls=np.concatenate(cls) if cls else np.zeros(0, np.uint8),
+        conf=np.concatenate(conf) if conf else np.zeros(0, np.float16),
+        frame_size=np.array([width, height], dtype=np.int32),
+        ground_truth=np.array(ground_truth(video_path)),
+        video=np.array(video_path),
+    )
+    return video_path, len(offsets) - 1, time.perf_counter() - t0
+
+
+# dataset helpers, shared with the other offline benchmarks
+def find_videos(dataset_dir):
+    return sorted(p for ext in VIDEO_EXTS
+                  for p in glob.glob(os.path.join(dataset_dir, "**", f"*.{ext}"), recursive=True))
+
+
+def ground_truth(video_path):
+    folder = os.path.basename(os.path.dirname(video_path)).lower()
+    return folder if folder in ("fire", "smoke") else "no_fire"
+
+
+def summarize(values, digits=3):
+    """{"mean", "p50", "p95"} of a list of numbers, or None if it is empty."""
+    if not values:
+        return None
+    a = np.asarray(values, dtype=np.float64)
+    return {"mean": round(float(a.mean()), digits), "p50": round(float(np.percentile(a, 50)), digits),
+            "p95": round(float(np.percentile(a, 95)), digits)}
+
+
+def build_cache(dataset_dir, cache_dir=CACHE_DIR, model_path=MODEL_PATH, workers=2, force=False):
+    videos = find_videos(dataset_dir)
+    jobs = []
+    for video in videos:
+        out = cache_path(video, dataset_dir, cache_dir)
+        if not force and os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(video):
+            continue
+        jobs.append((video, out))
+
+    print(f"{len(videos)} videos, {len(jobs)} to detect, {workers} workers")
+    with Pool(workers, initializer=_load_model, initargs=(model_path,)) as pool:
+        for video, frames, seconds in pool.imap_unordered(detect_video, jobs):
+            print(f"  cached {video}: {frames} frames in {seconds:.1f}s")
+
+
+# =========================================
+# PHASE 2: REPLAY
+# =========================================
+def load_cache(cache_dir=CACHE_DIR):
+    entries = []
+    for path in sorted(glob.glob(os.path.join(cache_dir, "**", "*.npz"), recursive=True)):
+        with np.load(path) as data:
+            entries.append({k: data[k] for k in data.files})
+    return entries
+
+
+def frame_labels(entry, conf=0.4):
+    """Raw per-frame label codes (NO_FIRE/SMOKE/FIRE) and fire area, vectorised."""
+    offsets = entry["offsets"]
+    n_frames = len(offsets) - 1
+    keep = entry["conf"].astype(np.float32) >= conf
+    frame_of_box = np.repeat(np.arange(n_frames), np.diff(offsets))[keep]
+    codes = CLASS_CODE[entry["cls"][keep]]
+    xyxy = entry["xyxy"][keep].astype(np.int64)
+
+    is_fire = codes == FIRE
+    labels = np.zeros(n_frames, dtype=np.int8)
+    labels[frame_of_box[codes == SMOKE]] = SMOKE
+    labels[frame_of_box[is_fire]] = FIRE      # fire wins over smoke
+
+    fire_area = np.zeros(n_frames, dtype=np.int64)
+    areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+    np.add.at(fire_area, frame_of_box[is_fire], areas[is_fire])
+    return labels, fire_area
+
+
+def smooth(labels, window=7, mode="window"):
+    """
+    Majority vote over the last `window` labels.
+    mode "window": plain sliding window (detection_ablation.run_ablation);
+    mode "engine": the window is cleared on no_fire (detection_engine.analyze_frame).
+    """
+    queue = deque(maxlen=window)
+    out = np.empty_like(labels)
+    for i, label in enumerate(labels.tolist()):
+        if mode == "engine" and label == NO_FIRE:
+            queue.clear()
+        queue.append(label)
+        # ties go to fire, then smoke
+        out[i] = max((FIRE, SMOKE, NO_FIRE), key=queue.count)
+    return out
+
+
+def severity(labels, fire_area, total_area, large_fire_ratio=0.05):
+    """Per-frame severity from smoothed labels, as compute_severity does."""
+    sev = np.zeros(len(labels), dtype=np.int8)
+    sev[labels == SMOKE] = 1
+    ratio = fire_area / total_area if total_area else np.zeros(len(labels))
+    fire = labels == FIRE
+    sev[fire] = np.where(ratio[fire] < large_fire_ratio, 2, 3)
+    return sev
+
+
+def video_metrics(labels, truth, mode_name):
+    n = len(labels)
+    detected = labels != NO_FIRE
+    truth_code = {"fire": FIRE, "smoke": SMOKE}.get(truth, NO_FIRE)
+    tp = int(np.count_nonzero(labels == truth_code)) if truth_code != NO_FIRE else 0
+    fp = int(np.count_nonzero(detected & (labels != truth_code)))
+    first = np.flatnonzero(labels == truth_code) if truth_code != NO_FIRE else np.array([])
+    return {
+        "total_frames": n,
+        "detection_frames": int(np.count_nonzero(detected)),
+        "detection_percentage": round(100.0 * int(np.count_nonzero(detected)) / n, 2) if n else 0.0,
+        "true_positive": tp,
+        "false_positive": fp,
+        "flicker_count": int(np.count_nonzero(labels[1:] != labels[:-1])),
+        "latency_frames": int(first[0]) + 1 if len(first) else None,
+        "ground_truth": truth,
+        "mode": mode_name,
+    }
+
+
+def replay(entries, window=7, conf=0.4, mode="window", large_fire_ratio=0.05):
+    """Results in the ablation_results.json layout, plus a severity summary."""
+    results = {"with_smoothing": [], "without_smoothing": []}
+    for entry in entries:
+        truth = str(entry["ground_truth"])
+        raw, fire_area = frame_labels(entry, conf)
+        smoothed = smooth(raw, window, mode)
+
+        results["without_smoothing"].append(video_metrics(raw, truth, "WITHOUT_SMOOTHING"))
+        m = video_metrics(smoothed, truth, "WITH_SMOOTHING")
+        w, h = entry["frame_size"].tolist()
+        sev = severity(smoothed, fire_area, w * h, large_fire_ratio)
+        m["severity_frames"] = np.bincount(sev, minlength=4).tolist()
+        alert = np.flatnonzero(sev >= 2)
+        m["alert_latency_frames"] = int(alert[0]) + 1 if len(alert) else None
+        results["with_smoothing"].append(m)
+
+    results["config"] = {"window": window, "conf": conf, "mode": mode,
+                         "large_fire_ratio": large_fire_ratio}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Two-phase ablation: cache detections, then replay")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="run the model once per video and cache the boxes")
+    b.add_argument("dataset")
+    b.add_argument("--cache", default=CACHE_DIR)
+    b.add_argument("--model", default=MODEL_PATH)
+    b.add_argument("--workers", type=int, default=2)
+    b.add_argument("--force", action="store_true")
+
+    r = sub.add_parser("replay", help="recompute ablation metrics from the cache")
+    r.add_argument("--cache", default=CACHE_DIR)
+    r.add_argument("--window", type=int, default=7)
+    r.add_argument("--conf", type=float, default=0.4)
+    r.add_argument("--mode", choices=["window", "engine"], default="window")
+    r.add_argument("--large-fire-ratio", type=float, default=0.05)
+    r.add_argument("--out", default="detection/ablation_results.json")
+
+    args = parser.parse_args()
+    if args.cmd == "build":
+        build_cache(args.dataset, args.cache, args.model, args.workers, args.force)
+    else:
+        t0 = time.perf_counter()
+        entries = load_cache(args.cache)
+        results = replay(entries, args.window, args.conf, args.mode, args.large_fire_ratio)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"replayed {len(entries)} videos in {(time.perf_counter() - t0) * 1000:.0f} ms -> {args.out}")
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+import cv2
+
+import detection.detection_engine as engine
+from detection.ablation_cache import find_videos, ground_truth, summarize
+from detection.temporal_verifier import get_verifier
+
+# =========================================
+# END-TO-END ALERT LATENCY BENCHMARK
+# -----------------------------------------
+# Plays labelled videos through the real pipeline
+#   capture -> process_frame -> incident logic -> alert sinks
+# with the alarm, email and DB sinks replaced by recorders (snapshots
+# are still written, to a temp dir). For each video it measures the
+# wall-clock time from fire onset to the alarm, plus per-stage timings
+# and throughput, and writes a JSON report to compare between commits.
+#
+#   --realtime  frames arrive at the video's fps; if the pipeline falls
+#               behind, frames are dropped as from a live camera
+#   (default)   every frame, as fast as possible
+#
+# Labels: the folder name (fire/, smoke/, anything else negative). An
+# optional onsets.json in the dataset dir maps a video's relative path
+# to its onset frame; the default onset is frame 0.
+#
+# From web_app/:
+#   python -m detection.alert_latency <dataset dir> [--realtime] [--out alert_latency.json]
+# =========================================
+
+
+class AlertRecorder:
+    """Stand-ins for the alarm / email / DB sinks."""
+
+    def __init__(self):
+        self.events = []
+        self.seconds = 0.0
+
+    def _record(self, kind, **info):
+        t0 = time.perf_counter()
+        self.events.append({"kind": kind, "t": time.perf_counter(), **info})
+        self.seconds += time.perf_counter() - t0
+
+    def install(self):
+        engine.start_alarm = lambda: self._record("alarm")
+        engine.stop_alarm = lambda: None
+        engine.send_email = lambda status, severity: self._record("email", label=status, severity=severity)
+        engine.save_alert_to_db = lambda ts, label, severity, snapshot, clip=None: \
+            self._record("db", label=label, severity=severity)
+        engine.SNAPSHOT_DIR = tempfile.mkdtemp(prefix="fireguard_bench_")
+
+    def first(self, kind):
+        return next((e for e in self.events if e["kind"] == kind), None)
+
+
+class StageTimer:
+    """Wraps engine.camera_boxes to separate inference from the rest of process_frame."""
+
+    def __init__(self):
+        self.inference = 0.0
+        self._inner = engine.camera_boxes
+
+        def timed(frame, camera_id=None):
+            t0 = time.perf_counter()
+            try:
+                return self._inner(frame, camera_id)
+            finally:
+                self.inference += time.perf_counter() - t0
+
+        engine.camera_boxes = timed
+
+
+def run_video(path, onset_frame, realtime, recorder, timer):
+    engine.reset_incident_state()
+    recorder.events.clear()
+
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    stages = {"capture_ms": [], "inference_ms": [], "logic_ms": [], "sinks_ms": []}
+    processed = dropped = 0
+    onset_time = None
+    index = -1
+
+    start = time.perf_counter()
+    while True:
+        t0 = time.perf_counter()
+        if realtime:
+            # a live camera keeps producing frames while we are busy
+            due = int((t0 - start) * fps)
+            while index + 1 < due:
+                if not cap.grab():
+                    break
+                index += 1
+                dropped += 1
+                if 0 <= onset_frame <= index and onset_time is None:
+                    onset_time = start + index / fps
+            wait = start + (index + 1) / fps - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            t0 = time.perf_counter()
+
+        ok, frame = cap.read()
+        if not ok:
+            break
+        index += 1
+        t1 = time.perf_counter()
+
+        if 0 <= onset_frame <= index and onset_time is None:
+            # real time: when the onset frame was due; max speed: when it was read
+            onset_time = start + index / fps if realtime else t1
+
+        inference0, sinks0 = timer.inference, recorder.seconds
+        engine.process_frame(frame)
+        t2 = time.perf_counter()
+        inference = timer.inference - inference0
+        sinks = recorder.seconds - sinks0
+
+        stages["capture_ms"].append((t1 - t0) * 1000)
+        stages["inference_ms"].append(inference * 1000)
+        stages["sinks_ms"].append(sinks * 1000)
+        stages["logic_ms"].append((t2 - t1 - inference - sinks) * 1000)
+        processed += 1
+    elapsed = time.perf_counter() - start
+    cap.release()
+
+    alarm = recorder.first("alarm")
+    latency = None
+    if alarm is not None and onset_time is not None:
+        latency = round(max(0.0, alarm["t"] - onset_time), 3)
+
+    return {
+        "video": path,
+        "frames": index + 1,
+        "processed": processed,
+        "dropped": dropped,
+        "video_fps": round(fps, 2),
+        "throughput_fps": round(processed / elapsed, 2) if elapsed else 0.0,
+        "onset_frame": onset_frame,
+        "alarm_latency_s": latency,
+        # start_alarm runs on every frame at severity >= 2
+        "alarm_frames": sum(e["kind"] == "alarm" for e in recorder.events),
+        "emails": sum(e["kind"] == "email" for e in recorder.events),
+        "db_rows": sum(e["kind"] == "db" for e in recorder.events),
+        "stages": {k: summarize(v) for k, v in stages.items()},
+    }
+
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(dataset_dir, realtime=False):
+    videos = find_videos(dataset_dir)
+    onsets = {}
+    onsets_path = os.path.join(dataset_dir, "onsets.json")
+    if os.path.exists(onsets_path):
+        with open(onsets_path) as f:
+            onsets = json.load(f)
+
+    recorder, timer = AlertRecorder(), StageTimer()
+    recorder.install()
+
+    results = []
+    # plays the part of a live camera: build the verifier up front if enabled
+    get_verifier()
+    for path in videos:
+        rel = os.path.relpath(path, dataset_dir)
+        truth = ground_truth(path)
+        r = run_video(path, int(onsets.get(rel, 0)) if truth != "no_fire" else -1, realtime, recorder, timer)
+        r["ground_truth"] = truth
+        results.append(r)
+        print(f"  {rel}: latency={r['alarm_latency_s']} alarm_frames={r['alarm_frames']} "
+              f"{r['throughput_fps']} fps")
+
+    fire = [r for r in results if r["ground_truth"] == "fire"]
+    latencies = [r["alarm_latency_s"] for r in fire if r["alarm_latency_s"] is not None]
+    return {
+        "commit": _commit(),
+        "mode": "realtime" if realtime else "max_speed",
+        "config": {
+            "detect_every": engine.DETECT_EVERY,
+            "prefilter": engine.PREFILTER,
+            "cascade": engine.CASCADE_MODEL,
+            "verifier": get_verifier(create=False) is not None,
+        },
+        "summary": {
+            "videos": len(results),
+            "fire_videos": len(fire),
+            "missed_fire_videos": len(fire) - len(latencies),
+            "false_alarm_videos": sum(r["alarm_frames"] > 0 for r in results if r["ground_truth"] == "no_fire"),
+            "alarm_latency_s": summarize(latencies),
+            "throughput_fps": summarize([r["throughput_fps"] for r in results]),
+            "inference_ms": summarize([r["stages"]["inference_ms"]["mean"] for r in results if r["processed"]]),
+            "logic_ms": summarize([r["stages"]["logic_ms"]["mean"] for r in results if r["processed"]]),
+        },
+        "videos": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fire onset to alarm latency through the real pipeline")
+    parser.add_argument("dataset")
+    parser.add_argument("--realtime", action="store_true", help="feed frames at the video's fps")
+    parser.add_argument("--out", default="alert_latency.json")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.dataset, args.realtime)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["summary"], indent=2))
+    print(f"-> {args.out}")
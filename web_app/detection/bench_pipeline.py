@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+# alerts go to a throwaway database; set before the engine reads DB_PATH
+os.environ["FIREGUARD_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="fireguard_bench_"), "alerts.db")
+
+import detection.detection_engine as engine  # noqa: E402
+from db_setup import create_alerts_table  # noqa: E402
+from detection.alert_latency import AlertRecorder, _commit  # noqa: E402
+from detection.overlay import draw_overlay  # noqa: E402
+from stream_encoder import encode_for_profile, encode_jpeg, encode_scaled, shared_jpeg  # noqa: E402
+from stream_pacing import mjpeg_part  # noqa: E402
+
+# =========================================
+# PIPELINE MICRO-BENCHMARKS (no model needed)
+# -----------------------------------------
+# Times each stage of the detection pipeline in isolation, with the
+# YOLO model replaced by a stub that returns synthetic boxes, or the
+# boxes recorded by ablation_cache.py (--boxes <video>.npz):
+#   postprocess      model result -> box lists (to_boxes)
+#   smoothing        smooth_label
+#   severity         compute_severity
+#   analyze_frame    the whole per-frame logic around inference
+#   process_frame    analyze_frame + annotation
+#   annotate         draw_overlay
+#   jpeg_encode      full-size JPEG, and the "preview" stream profile
+#   db_insert        save_alert_to_db into a temporary database
+#   stream_frame     per-frame work of a camera stream: shared encode of
+#                    a new frame + multipart framing (stream_frame_scaled
+#                    for ?scale= viewers)
+# Alarm, email and snapshot sinks are recorders, as in alert_latency.
+#
+# Each benchmark runs for --seconds; the report has per-call stats (ms)
+# like pytest-benchmark's. --save-baseline keeps a report to compare
+# against; --compare flags benchmarks whose median got slower than
+# --threshold and exits 1, so it can gate CI.
+#
+# From web_app/:
+#   python -m detection.bench_pipeline --save-baseline bench_baseline.json
+#   python -m detection.bench_pipeline --compare bench_baseline.json
+# =========================================
+
+FRAME_SIZE = (1280, 720)
+WARMUP_CALLS = 10
+MAX_ROUNDS = 100000
+REGRESSION_THRESHOLD = 0.15
+
+
+# ---------------------------------
+# stub model
+# ---------------------------------
+class _StubBox:
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+        self.cls = np.array([cls], dtype=np.float32)
+        self.conf = np.array([conf], dtype=np.float32)
+
+
+class _StubResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubModel:
+    """Called like a YOLO model; hands out the next recorded box set."""
+
+    def __init__(self, box_sets):
+        self.results = [_StubResult([_StubBox(*b) for b in boxes]) for boxes in box_sets]
+        self.i = 0
+
+    def __call__(self, frames, **kwargs):
+        count = len(frames) if isinstance(frames, list) else 1
+        out = []
+        for _ in range(count):
+            out.append(self.results[self.i % len(self.results)])
+            self.i += 1
+        return out
+
+
+def synthetic_box_sets(count=200, size=FRAME_SIZE, seed=0):
+    """Runs of no_fire, smoke and fire frames, 0-4 boxes each."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    sets = []
+    for i in range(count):
+        phase = (i // 25) % 3   # 0 none, 1 smoke, 2 fire
+        boxes = []
+        for _ in range(rng.integers(1, 5) if phase else 0):
+            x1, y1 = rng.integers(0, w - 200), rng.integers(0, h - 200)
+            bw, bh = rng.integers(20, 200, 2)
+            cls = 1 if phase == 2 and rng.random() < 0.7 else 0
+            boxes.append(([x1, y1, x1 + bw, y1 + bh], cls, rng.uniform(0.4, 0.95)))
+        sets.append(boxes)
+    return sets
+
+
+def recorded_box_sets(npz_path):
+    with np.load(npz_path) as data:
+        offsets, xyxy, cls, conf = data["offsets"], data["xyxy"], data["cls"], data["conf"]
+    return [
+        [(xyxy[j].tolist(), int(cls[j]), float(conf[j])) for j in range(offsets[i], offsets[i + 1])]
+        for i in range(len(offsets) - 1)
+    ] or [[]]
+
+
+def synthetic_frame(size=FRAME_SIZE, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = cv2.GaussianBlur(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8), (15, 15), 0)
+    cv2.circle(frame, (size[0] // 2, size[1] // 2), size[1] // 8, (0, 120, 255), -1)
+    return frame
+
+
+# ---------------------------------
+# runner
+# ---------------------------------
+def run(fn, seconds):
+    for _ in range(WARMUP_CALLS):
+        fn()
+    times = []
+    deadline = time.perf_counter() + seconds
+    while len(times) < MAX_ROUNDS:
+        t0 = time.perf_counter()
+        fn()
+        t1 = time.perf_counter()
+        times.append(t1 - t0)
+        if t1 > deadline:
+            break
+    ms = np.asarray(times) * 1000
+    mean = float(ms.mean())
+    return {
+        "rounds": len(times),
+        "min_ms": round(float(ms.min()), 4),
+        "median_ms": round(float(np.median(ms)), 4),
+        "mean_ms": round(mean, 4),
+        "stddev_ms": round(statistics.pstdev(ms.tolist()), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "ops": round(1000 / mean, 1) if mean else None,
+    }
+
+
+def build_benchmarks(box_sets):
+    frame = synthetic_frame()
+    canvas = frame.copy()
+    results = [_StubResult([_StubBox(*b) for b in boxes]) for boxes in box_sets]
+    boxes = [engine.to_boxes(r) for r in results]
+    labels = ["fire" if any(b[4] == "fire" for b in bs) else "smoke" if bs else "no_fire" for bs in boxes]
+    state = {"i": 0}
+
+    def step():
+        state["i"] += 1
+        return state["i"]
+
+    # sinks and model stubbed; the DB benchmark writes to the throwaway DB_PATH
+    insert = engine.save_alert_to_db
+    AlertRecorder().install()
+    engine.model = StubModel(box_sets)
+    create_alerts_table(engine.DB_PATH)
+
+    # a result with boxes, for the annotation and encode benchmarks
+    sample = dict(engine.analyze_frame(frame), boxes=next((bs for bs in boxes if bs), []))
+    engine.reset_incident_state()
+
+    benchmarks = {
+        "postprocess": lambda: engine.to_boxes(results[step() % len(results)]),
+        "smoothing": lambda: engine.smooth_label(labels[step() % len(labels)]),
+        "severity": lambda: engine.compute_severity(labels[step() % len(labels)], 0.03, True),
+        "analyze_frame": lambda: engine.analyze_frame(frame),
+        "process_frame": lambda: engine.process_frame(np.copyto(canvas, frame) or canvas),
+        "annotate": lambda: draw_overlay(np.copyto(canvas, frame) or canvas, sample),
+        "jpeg_encode": lambda: encode_jpeg(frame, 85),
+        "jpeg_encode_preview": lambda: encode_for_profile(frame, "preview", sample),
+        "db_insert": lambda: insert("2024-01-01 00:00:00", "fire", 2, "static/snapshots/x.jpg"),
+        "stream_frame": lambda: mjpeg_part(shared_jpeg("bench", step(), frame, "preview", sample)),
+        "stream_frame_scaled": lambda: mjpeg_part(encode_scaled(frame, 0.5, sample)),
+    }
+    return benchmarks
+
+
+# ---------------------------------
+# baseline comparison
+# ---------------------------------
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """{name: change} for benchmarks whose median grew by more than threshold."""
+    regressions = {}
+    for name, stats in report["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if not base or not base["median_ms"]:
+            continue
+        change = stats["median_ms"] / base["median_ms"] - 1
+        stats["vs_baseline"] = round(change, 3)
+        if change > threshold:
+            regressions[name] = round(change, 3)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model-free benchmarks of the detection pipeline stages")
+    parser.add_argument("--boxes", help="ablation_cache .npz to replay instead of synthetic boxes")
+    parser.add_argument("--seconds", type=float, default=1.0, help="time per benchmark")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--save-baseline", help="also write the report here")
+    parser.add_argument("--compare", help="baseline report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="allowed median slowdown, 0.15 = 15%%")
+    args = parser.parse_args()
+
+    box_sets = recorded_box_sets(args.boxes) if args.boxes else synthetic_box_sets()
+    benchmarks = build_benchmarks(box_sets)
+    if args.only:
+        benchmarks = {k: v for k, v in benchmarks.items() if k in args.only.split(",")}
+
+    report = {
+        "commit": _commit(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count(), "opencv": cv2.__version__},
+        "boxes": args.boxes or "synthetic",
+        "benchmarks": {},
+    }
+    for name, fn in benchmarks.items():
+        report["benchmarks"][name] = run(fn, args.seconds)
+
+    regressions = {}
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report["regressions"] = regressions
+
+    print(f"{'benchmark':<22} {'median ms':>10} {'p95 ms':>10} {'ops/s':>10} {'vs base':>8}")
+    for name, s in report["benchmarks"].items():
+        change = s.get("vs_baseline")
+        flag = " !" if name in regressions else ""
+        print(f"{name:<22} {s['median_ms']:>10} {s['p95_ms']:>10} {s['ops']!s:>10} "
+              f"{'' if change is None else f'{change:+.1%}':>8}{flag}")
+
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"-> {args.out}")
+
+    if regressions:
+        print(f"⚠️ {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import os
+
+import cv2
+import numpy as np
+
+# =========================================
+# TRACKER-ASSISTED DETECTION
+# -----------------------------------------
+# Fire and smoke move slowly, so the model only has to run every
+# `detect_every` frames. In between, each box is carried forward by the
+# median sparse optical flow (pyramidal Lucas-Kanade) of feature points
+# inside it, on a downscaled grey frame. A fresh detection runs early when:
+#   - the caller forces it (an incident is open),
+#   - too few points survive the forward/backward flow check,
+#   - the scene changed noticeably since the last detection,
+#   - the frame size changed.
+# At each scheduled detection the tracked boxes are matched to the new
+# ones by IoU; if they disagree the interval is halved, and it grows
+# back one frame at a time while they agree.
+# =========================================
+
+DETECT_EVERY = int(os.environ.get("FIREGUARD_DETECT_EVERY", 1))   # 1 = detect every frame
+TRACK_WIDTH = 320
+MIN_TRACK_CONFIDENCE = 0.5
+MIN_POINTS = 4
+MAX_POINTS_PER_BOX = 20
+MAX_FB_ERROR = 1.0          # pixels, at TRACK_WIDTH
+SCENE_CHANGE = 12.0         # mean abs grey difference vs the last detected frame
+MATCH_IOU = 0.3
+
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+def iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def boxes_agree(tracked, detected, min_iou=MATCH_IOU):
+    """Greedy one-to-one IoU association; True if every box found a partner of the same class."""
+    if len(tracked) != len(detected):
+        return False
+    unmatched = list(detected)
+    for t in tracked:
+        best, best_iou = None, min_iou
+        for d in unmatched:
+            if d[4] != t[4]:
+                continue
+            v = iou(t, d)
+            if v >= best_iou:
+                best, best_iou = d, v
+        if best is None:
+            return False
+        unmatched.remove(best)
+    return True
+
+
+class BoxTracker:
+    """
+    Wraps a detector (frame -> [[x1, y1, x2, y2, cls_name, conf], ...]) and
+    returns boxes in the same format for every frame, calling the detector
+    only when needed.
+    """
+
+    def __init__(self, detect, detect_every=DETECT_EVERY, min_confidence=MIN_TRACK_CONFIDENCE,
+                 track_width=TRACK_WIDTH):
+        self.detect = detect
+        self.detect_every = max(1, detect_every)
+        self.interval = self.detect_every
+        self.min_confidence = min_confidence
+        self.track_width = track_width
+
+        self.boxes = []
+        self.points = []         # per box: (N, 1, 2) float32 in tracking coords
+        self.prev_gray = None
+        self.key_gray = None
+        self.scale = 1.0
+        self.frames_since = 0
+
+        self.last_detected = False
+        self.detections = 0
+        self.tracked = 0
+
+    def _gray(self, frame):
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.track_width / w)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if scale < 1.0:
+            gray = cv2.resize(gray, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+        return gray, scale
+
+    def _seed_points(self, gray, box):
+        s = self.scale
+        x1, y1 = max(0, int(box[0] * s)), max(0, int(box[1] * s))
+        x2, y2 = min(gray.shape[1], int(box[2] * s) + 1), min(gray.shape[0], int(box[3] * s) + 1)
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return np.empty((0, 1, 2), np.float32)
+
+        mask = np.zeros_like(gray)
+        mask[y1:y2, x1:x2] = 255
+        pts = cv2.goodFeaturesToTrack(gray, MAX_POINTS_PER_BOX, 0.01, 3, mask=mask)
+        return pts if pts is not None else np.empty((0, 1, 2), np.float32)
+
+    def _track(self, gray, frame_w, frame_h):
+        """Boxes moved by optical flow, or None if tracking is not trustworthy."""
+        if not self.boxes:
+            return []
+        counts = [len(p) for p in self.points]
+        if min(counts) < MIN_POINTS:
+            return None
+
+        # one LK call for all boxes, forward and backward
+        p0 = np.concatenate(self.points)
+        p1, st, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, p0, None, **LK_PARAMS)
+        p0r, st_back, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, p1, None, **LK_PARAMS)
+        fb_error = np.abs(p0 - p0r).reshape(-1, 2).max(axis=1)
+        good = (st.ravel() == 1) & (st_back.ravel() == 1) & (fb_error < MAX_FB_ERROR)
+
+        moved, points = [], []
+        start = 0
+        for box, n in zip(self.boxes, counts):
+            g = good[start:start + n]
+            if g.sum() < max(MIN_POINTS, n * self.min_confidence):
+                return None
+            shift = np.median((p1[start:start + n] - p0[start:start + n])[g].reshape(-1, 2), axis=0) / self.scale
+            dx, dy = int(round(shift[0])), int(round(shift[1]))
+            x1, y1 = min(max(box[0] + dx, 0), frame_w - 1), min(max(box[1] + dy, 0), frame_h - 1)
+            x2, y2 = min(max(box[2] + dx, x1 + 1), frame_w), min(max(box[3] + dy, y1 + 1), frame_h)
+            moved.append([x1, y1, x2, y2, box[4], box[5]])
+            points.append(p1[start:start + n][g].reshape(-1, 1, 2))
+            start += n
+
+        self.points = points
+        return moved
+
+    def _run_detector(self, frame, gray, scale, predicted=None):
+        self.boxes = self.detect(frame)
+        self.scale = scale
+        self.points = [self._seed_points(gray, b) for b in self.boxes]
+        self.prev_gray = self.key_gray = gray
+        self.frames_since = 0
+        self.last_detected = True
+        self.detections += 1
+
+        # scheduled check: shorten the interval if tracking had drifted
+        if predicted is not None:
+            if boxes_agree(predicted, self.boxes):
+                self.interval = min(self.detect_every, self.interval + 1)
+            else:
+                self.interval = max(1, self.interval // 2)
+        return self.boxes
+
+    def update(self, frame, force=False):
+        """Boxes for this frame; runs the detector when due, forced, or tracking is lost."""
+        gray, scale = self._gray(frame)
+        self.frames_since += 1
+
+        if (force or self.detect_every == 1 or self.prev_gray is None
+                or gray.shape != self.prev_gray.shape):
+            return self._run_detector(frame, gray, scale)
+
+        if cv2.absdiff(gray, self.key_gray).mean() > SCENE_CHANGE:
+            return self._run_detector(frame, gray, scale)
+
+        moved = self._track(gray, frame.shape[1], frame.shape[0])
+        if moved is None:
+            return self._run_detector(frame, gray, scale)
+
+        if self.frames_since >= self.interval:
+            return self._run_detector(frame, gray, scale, predicted=moved)
+
+        self.boxes = moved
+        self.prev_gray = gray
+        self.last_detected = False
+        self.tracked += 1
+        return moved
+
+    def stats(self):
+        total = self.detections + self.tracked
+        return {
+            "detections": self.detections,
+            "tracked": self.tracked,
+            "detect_ratio": round(self.detections / total, 3) if total else 0.0,
+            "interval": self.interval,
+        }
@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+# =========================================
+# COLOR PRE-FILTER (first cascade stage)
+# -----------------------------------------
+# Most frames contain nothing fire- or smoke-coloured. On a small
+# downscaled frame we measure:
+#   fire_ratio  - share of pixels that are fire-coloured in HSV (red to
+#                 yellow, saturated, bright) and in YCrCb (Cr > Cb,
+#                 Y > Cb, brighter than the frame average);
+#   smoke_score - share of grey-ish (low saturation, mid brightness)
+#                 pixels that changed since the previous frame, since
+#                 smoke is grey and moves while walls and sky do not.
+# If both are well below their thresholds the detector is skipped. It
+# always runs every FORCE_EVERY frames, and whenever the previous frame
+# had boxes.
+#
+# Offline tuning, run from web_app/ like the other detection tools:
+#   python -m detection.color_prefilter eval <video dir> [--model best.pt]
+# =========================================
+
+PREFILTER = os.environ.get("FIREGUARD_PREFILTER", "0") == "1"
+FIRE_THRESHOLD = float(os.environ.get("FIREGUARD_PREFILTER_FIRE", 0.001))
+SMOKE_THRESHOLD = float(os.environ.get("FIREGUARD_PREFILTER_SMOKE", 0.01))
+FORCE_EVERY = int(os.environ.get("FIREGUARD_PREFILTER_FORCE_EVERY", 30))
+PREFILTER_WIDTH = 160
+
+SMOKE_MOTION = 4    # grey-level change counted as movement
+
+
+def color_scores(small, prev_gray=None):
+    """(fire_ratio, smoke_score, gray) for a small BGR frame."""
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    ycc = cv2.cvtColor(small, cv2.COLOR_BGR2YCrCb)
+    y, cr, cb = (ycc[..., i].astype(np.int16) for i in range(3))
+
+    fire = ((h <= 35) | (h >= 170)) & (s >= 90) & (v >= 150)
+    fire &= (cr > cb) & (y > cb) & (y > y.mean())
+    fire_ratio = float(np.count_nonzero(fire)) / fire.size
+
+    gray = y.astype(np.uint8)
+    smoke_score = 0.0
+    if prev_gray is not None and prev_gray.shape == gray.shape:
+        greyish = (s < 60) & (v >= 80) & (v <= 230)
+        moving = cv2.absdiff(gray, prev_gray) > SMOKE_MOTION
+        smoke_score = float(np.count_nonzero(greyish & moving)) / gray.size
+
+    return fire_ratio, smoke_score, gray
+
+
+def downscale(frame, width=PREFILTER_WIDTH):
+    h, w = frame.shape[:2]
+    if w <= width:
+        return frame
+    return cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+
+
+class ColorPrefilter:
+    """Per-camera gate in front of the detector."""
+
+    def __init__(self, fire_threshold=FIRE_THRESHOLD, smoke_threshold=SMOKE_THRESHOLD,
+                 force_every=FORCE_EVERY):
+        self.fire_threshold = fire_threshold
+        self.smoke_threshold = smoke_threshold
+        self.force_every = force_every
+        self.prev_gray = None
+        self.since_detect = 0
+        self.frames = 0
+        self.skipped = 0
+
+    def should_detect(self, frame, had_boxes=False):
+        """False when the frame can safely skip the detector."""
+        fire_ratio, smoke_score, self.prev_gray = color_scores(downscale(frame), self.prev_gray)
+        self.frames += 1
+        self.since_detect += 1
+
+        if (had_boxes or self.since_detect >= self.force_every
+                or fire_ratio >= self.fire_threshold or smoke_score >= self.smoke_threshold):
+            self.since_detect = 0
+            return True
+
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+        }
+
+
+# =========================================
+# OFFLINE EVALUATION
+# -----------------------------------------
+# Videos are labelled by their folder: .../fire/*.avi, .../smoke/*.avi,
+# anything else is negative. Scores are computed once per frame and
+# every threshold pair in the grid is replayed over them, reporting
+#   recall    - share of positive frames the detector would still see
+#               (with --model: of the frames where the model fires)
+#   saved     - share of all frames where the detector is skipped
+# =========================================
+FIRE_GRID = [0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01]
+SMOKE_GRID = [0.002, 0.005, 0.01, 0.02, 0.05]
+
+
+def score_video(path, detect=None):
+    cap = cv2.VideoCapture(path)
+    rows, prev = [], None
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        fire_ratio, smoke_score, prev = color_scores(downscale(frame), prev)
+        positive = bool(detect(frame)) if detect else None
+        rows.append((fire_ratio, smoke_score, positive))
+    cap.release()
+    return rows
+
+
+def replay(rows, fire_threshold, smoke_threshold, force_every, model_labels=True):
+    """
+    Which frames the gate passes, including the forced ones. With model
+    labels, a frame after a detected (and not skipped) one always passes,
+    as in the live engine.
+    """
+    passed, since = [], 0
+    for i, (fire_ratio, smoke_score, positive) in enumerate(rows):
+        since += 1
+        had_boxes = model_labels and i > 0 and passed[-1] and bool(rows[i - 1][2])
+        ok = (had_boxes or since >= force_every
+              or fire_ratio >= fire_threshold or smoke_score >= smoke_threshold)
+        if ok:
+            since = 0
+        passed.append(ok)
+    return passed
+
+
+def evaluate(videos, detect=None, force_every=FORCE_EVERY):
+    # offline only: the live engine imports this module and must not pull in the cache tooling
+    from detection.ablation_cache import ground_truth
+
+    scored = []
+    t0 = time.perf_counter()
+    for path in videos:
+        truth = ground_truth(path)
+        rows = score_video(path, detect)
+        if detect is None:
+            # no model: every frame of a fire/smoke video counts as positive
+            rows = [(f, s, truth in ("fire", "smoke")) for f, s, _ in rows]
+        scored.append((path, truth, rows))
+        print(f"  scored {path}: {len(rows)} frames ({truth})")
+    score_seconds = time.perf_counter() - t0
+
+    total = sum(len(rows) for _, _, rows in scored)
+    grid = []
+    for ft in FIRE_GRID:
+        for st in SMOKE_GRID:
+            positives = kept = skipped = 0
+            for _, _, rows in scored:
+                passed = replay(rows, ft, st, force_every, detect is not None)
+                skipped += passed.count(False)
+                for (_, _, positive), ok in zip(rows, passed):
+                    if positive:
+                        positives += 1
+                        kept += ok
+            grid.append({
+                "fire_threshold": ft,
+                "smoke_threshold": st,
+                "recall": round(kept / positives, 4) if positives else None,
+                "saved": round(skipped / total, 4) if total else 0.0,
+            })
+
+    return {
+        "videos": len(scored),
+        "frames": total,
+        "force_every": force_every,
+        "prefilter_ms_per_frame": round(score_seconds / total * 1000, 3) if total and detect is None else None,
+        "grid": sorted(grid, key=lambda r: (-(r["recall"] or 0), -r["saved"])),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the color pre-filter on labelled videos")
+    parser.add_argument("mode", choices=["eval"])
+    parser.add_argument("videos", help="directory with fire/, smoke/ and negative sub-folders")
+    parser.add_argument("--model", help="YOLO weights; positives become the frames it detects")
+    parser.add_argument("--force-every", type=int, default=FORCE_EVERY)
+    parser.add_argument("--out", default="prefilter_eval.json")
+    args = parser.parse_args()
+
+    detect = None
+    if args.model:
+        from ultralytics import YOLO
+        model = YOLO(args.model)
+        detect = lambda frame: len(model(frame, conf=0.4, verbose=False)[0].boxes)
+
+    from detection.ablation_cache import find_videos
+
+    videos = find_videos(args.videos)
+    report = evaluate(videos, detect, args.force_every)
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{report['videos']} videos, {report['frames']} frames -> {args.out}")
+    print(f"{'fire':>8} {'smoke':>8} {'recall':>8} {'saved':>8}")
+    for row in report["grid"][:10]:
+        print(f"{row['fire_threshold']:>8} {row['smoke_threshold']:>8} "
+              f"{row['recall'] if row['recall'] is not None else '-':>8} {row['saved']:>8}")
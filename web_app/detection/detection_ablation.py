@@ -1,27 +1,34 @@
 import cv2
 from ultralytics import YOLO
 from collections import deque
+import sys
 import time
 
-MODEL_PATH = "yolo11-d-fire-dataset.pt"
-model = YOLO(MODEL_PATH)
+from detection.box_tracker import BoxTracker
+from detection.detection_engine import to_boxes
 
-CLASS_MAP = {0: "smoke", 1: "fire"}
+# run from web_app/:  python -m detection.detection_ablation [video] [detect_every]
+MODEL_PATH = "detection/yolo11-d-fire-dataset.pt"
+model = YOLO(MODEL_PATH)
 
 # -------------------------------------------------------
 # TEMPORAL SMOOTHING SETTINGS
 # -------------------------------------------------------
 WINDOW = 7
-label_queue = deque(maxlen=WINDOW)
+
+
+def detect_boxes(frame):
+    """Boxes as [x1, y1, x2, y2, cls_name, conf], like detection_engine.detect_boxes"""
+    return to_boxes(model(frame, conf=0.4, verbose=False)[0])
 
 
 def get_label(boxes):
     """Return detected label: fire, smoke, or no_fire"""
-    if boxes is None or len(boxes) == 0:
+    if not boxes:
         return "no_fire"
 
-    fire = any(int(b.cls[0]) == 1 for b in boxes)
-    smoke = any(int(b.cls[0]) == 0 for b in boxes)
+    fire = any(b[4] == "fire" for b in boxes)
+    smoke = any(b[4] == "smoke" for b in boxes)
 
     if fire:
         return "fire"
@@ -33,10 +40,20 @@ def get_label(boxes):
 # -------------------------------------------------------
 # MAIN ABLATION FUNCTION (Fire + Smoke analysis)
 # -------------------------------------------------------
-def run_ablation(video_path):
+def run_ablation(video_path, detect_every=1):
+    """
+    detect_every > 1 runs the model every N frames and tracks boxes in
+    between (see box_tracker), to compare latency against full detection.
+    """
     cap = cv2.VideoCapture(video_path)
+    # like camera_boxes: the baseline calls the model directly, without tracker overhead
+    tracker = BoxTracker(detect_boxes, detect_every) if detect_every > 1 else None
 
     frame_count = 0
+    detect_time = 0.0
+
+    # per video: a shared queue would carry labels over between runs
+    label_queue = deque(maxlen=WINDOW)
 
     # RAW METRICS
     raw = {
@@ -71,8 +88,10 @@ def run_ablation(video_path):
         # -----------------------------
         # RAW DETECTION
         # -----------------------------
-        results = model(frame, conf=0.4, verbose=False)
-        raw_label = get_label(results[0].boxes)
+        t0 = time.perf_counter()
+        boxes = tracker.update(frame) if tracker is not None else detect_boxes(frame)
+        detect_time += time.perf_counter() - t0
+        raw_label = get_label(boxes)
 
         # True fire & smoke frames
         if raw_label == "fire":
@@ -126,6 +145,9 @@ def run_ablation(video_path):
 
     return {
         "total_frames": frame_count,
+        "detect_every": detect_every,
+        "model_calls": tracker.detections if tracker is not None else frame_count,
+        "frames_per_sec": round(frame_count / detect_time, 1) if detect_time else 0.0,
         "WITHOUT_TEMPORAL_SMOOTHING": raw,
         "WITH_TEMPORAL_SMOOTHING": smooth
     }
@@ -135,11 +157,14 @@ def run_ablation(video_path):
 # RUN EXPERIMENT
 # ------------------------------------------------------
 if __name__ == "__main__":
-    VIDEO = "../../data/firesense/fire/posVideo8.877.avi"
-    results = run_ablation(VIDEO)
+    VIDEO = sys.argv[1] if len(sys.argv) > 1 else "../data/firesense/fire/posVideo8.877.avi"
+    DETECT_EVERY = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    results = run_ablation(VIDEO, DETECT_EVERY)
 
     print("\n=========== ABLATION STUDY RESULTS ===========")
     print("Total Frames:", results["total_frames"])
+    print(f"Detect every {results['detect_every']} frames: "
+          f"{results['model_calls']} model calls, {results['frames_per_sec']} frames/s")
 
     print("\nWITHOUT TEMPORAL SMOOTHING:")
     print(results["WITHOUT_TEMPORAL_SMOOTHING"])
@@ -1,13 +1,29 @@
 import cv2
-from ultralytics import YOLO
 from collections import deque
 import threading
-from playsound import playsound
 import subprocess
 import time
 import sqlite3
 import os
-import winsound
+
+# sound backends are optional: winsound is Windows-only, and benchmarks
+# and tests run on boxes without either
+try:
+    import winsound
+except ImportError:
+    winsound = None
+try:
+    from playsound import playsound
+except ImportError:
+    playsound = None
+
+from detection.box_tracker import DETECT_EVERY, BoxTracker
+from detection.color_prefilter import PREFILTER, ColorPrefilter
+from detection.model_cascade import CASCADE_MODEL, SCREEN_CONF, ModelCascade
+from detection.overlay import draw_boxes, draw_overlay
+from detection.roi import get_camera_roi
+from detection.temporal_verifier import get_verifier
+from detection.tiling import detect_tiled, parse_tiling
 
 
 
@@ -17,6 +33,7 @@ import winsound
 MODEL_PATH = "detection/yolo11-d-fire-dataset.pt"
 ALARM_SOUND = "../alarm-301729 (1).wav.crdownload"
 SNAPSHOT_DIR = "static/snapshots"
+DB_PATH = os.environ.get("FIREGUARD_DB_PATH", "alerts.db")
 
 os.makedirs(SNAPSHOT_DIR, exist_ok=True)
 
@@ -39,8 +56,14 @@ INCIDENT_TIMEOUT = 5
 # MANUAL ALARM OVERRIDE
 manual_alarm_override = False
 
-# Load YOLO model
-model = YOLO(MODEL_PATH)
+# INCIDENT HOOKS: callables(camera_id, label, severity) run when an
+# incident opens; a returned path is stored as the incident's clip_path
+incident_listeners = []
+incident_clip_path = None
+
+# YOLO model, loaded on first use (benchmarks assign a stub instead)
+model = None
+model_lock = threading.Lock()
 CLASS_MAP = {0: "smoke", 1: "fire"}
 label_queue = deque(maxlen=7)
 
@@ -48,13 +71,13 @@ label_queue = deque(maxlen=7)
 # =========================================
 # DATABASE
 # =========================================
-def save_alert_to_db(timestamp, label, severity, snapshot_path):
-    conn = sqlite3.connect("alerts.db")
+def save_alert_to_db(timestamp, label, severity, snapshot_path, clip_path=None):
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute("""
-        INSERT INTO alerts (timestamp, label, severity, snapshot_path)
-        VALUES (?, ?, ?, ?)
-    """, (timestamp, label, severity, snapshot_path))
+        INSERT INTO alerts (timestamp, label, severity, snapshot_path, clip_path)
+        VALUES (?, ?, ?, ?, ?)
+    """, (timestamp, label, severity, snapshot_path, clip_path))
     conn.commit()
     conn.close()
 
@@ -64,7 +87,7 @@ def save_alert_to_db(timestamp, label, severity, snapshot_path):
 # =========================================
 def play_alarm():
     global alarm_playing
-    while alarm_playing:
+    while alarm_playing and playsound is not None:
         playsound(ALARM_SOUND)
 
 def start_alarm():
@@ -75,13 +98,15 @@ def start_alarm():
     alarm_playing = True
     print("🔊 Alarm started")
 
-    winsound.PlaySound(ALARM_SOUND, winsound.SND_ASYNC)
+    if winsound is not None:
+        winsound.PlaySound(ALARM_SOUND, winsound.SND_ASYNC)
 
 def stop_alarm():
     global alarm_playing
     print("🔕 Alarm stopped")
 
-    winsound.PlaySound(None, winsound.SND_PURGE)
+    if winsound is not None:
+        winsound.PlaySound(None, winsound.SND_PURGE)
     alarm_playing = False
     
 def stop_alarm_manual():
@@ -128,60 +153,183 @@ def compute_severity(label, fire_ratio, smoke_present):
     return 0
 
 
+# =========================================
+# YOLO DETECTION
+# =========================================
+def to_boxes(result, class_map=CLASS_MAP):
+    """One YOLO result -> [[x1, y1, x2, y2, cls_name, conf]]; shared with the offline tools."""
+    boxes = result.boxes
+
+    detections = []
+    if boxes is not None and len(boxes) > 0:
+        for b in boxes:
+            x1, y1, x2, y2 = map(int, b.xyxy[0].tolist())
+            cls_id = int(b.cls[0].item())
+            cls_name = class_map.get(cls_id, "unknown")
+            conf = round(float(b.conf[0].item()), 3)
+            detections.append([x1, y1, x2, y2, cls_name, conf])
+
+    return detections
+
+
+def get_model():
+    global model
+    if model is None:
+        # cameras opening in parallel and the triage worker can all get here first
+        with model_lock:
+            if model is None:
+                from ultralytics import YOLO
+                model = YOLO(MODEL_PATH)
+    return model
+
+
+def detect_boxes(frame):
+    """Run the model; boxes as [x1, y1, x2, y2, cls_name, conf]."""
+    return to_boxes(get_model()(frame, conf=0.4, verbose=False)[0])
+
+
+def detect_batch(frames):
+    """One model call over several images; a box list per image."""
+    return [to_boxes(r) for r in get_model()(frames, conf=0.4, verbose=False)]
+
+
+# optional small screening model in front of the main one, see
+# detection/model_cascade.py; loaded on first use like the main model
+cascade = None
+
+
+def get_cascade():
+    global cascade
+    if cascade is None and CASCADE_MODEL:
+        with model_lock:
+            if cascade is None:
+                from ultralytics import YOLO
+                screen_model = YOLO(CASCADE_MODEL)
+                screen_classes = {k: v.lower() for k, v in screen_model.names.items()}
+                cascade = ModelCascade(
+                    lambda frames: [to_boxes(r, screen_classes)
+                                    for r in screen_model(frames, conf=SCREEN_CONF, verbose=False)],
+                    detect_batch,
+                )
+    return cascade
+
+
+# per-camera tiled inference, see detection/tiling.py
+camera_tiling = {}
+
+
+def set_camera_tiling(camera_id, spec):
+    tiling = parse_tiling(spec)
+    if tiling is None:
+        camera_tiling.pop(camera_id, None)
+    else:
+        camera_tiling[camera_id] = tiling
+
+
+def camera_detect(frame, camera_id=None):
+    tiling = camera_tiling.get(camera_id)
+    if tiling is None:
+        screen = get_cascade()
+        return screen.detect(frame) if screen is not None else detect_boxes(frame)
+    return detect_tiled(frame, detect_batch, **tiling)
+
+
+# one tracker per camera when FIREGUARD_DETECT_EVERY > 1
+trackers = {}
+
+# one color gate per camera when FIREGUARD_PREFILTER=1
+prefilters = {}
+had_boxes = {}
+
+
+def camera_boxes(frame, camera_id=None):
+    """
+    Boxes for this frame: the model every frame, or tracked between
+    detections; frames the color gate rejects get no boxes at all.
+    """
+    if PREFILTER and not in_incident:
+        gate = prefilters.get(camera_id)
+        if gate is None:
+            gate = prefilters[camera_id] = ColorPrefilter()
+        if not gate.should_detect(frame, had_boxes.get(camera_id, False)):
+            return []
+
+    if DETECT_EVERY <= 1:
+        boxes = camera_detect(frame, camera_id)
+    else:
+        tracker = trackers.get(camera_id)
+        if tracker is None:
+            tracker = trackers[camera_id] = BoxTracker(lambda f: camera_detect(f, camera_id), DETECT_EVERY)
+        # an open incident always gets fresh detections
+        boxes = tracker.update(frame, force=in_incident)
+
+    had_boxes[camera_id] = bool(boxes)
+    return boxes
+
+
+def forget_tracker(camera_id):
+    trackers.pop(camera_id, None)
+    prefilters.pop(camera_id, None)
+    had_boxes.pop(camera_id, None)
+    verifier = get_verifier(create=False)
+    if verifier is not None:
+        verifier.forget(camera_id)
+
+
+# =========================================
+# TEMPORAL SMOOTHING
+# =========================================
+def smooth_label(detected_label):
+    """Majority label over the last frames; a no_fire frame clears the window."""
+    if detected_label == "no_fire":
+        label_queue.clear()
+        label_queue.append("no_fire")
+    else:
+        label_queue.append(detected_label)
+
+    return max(set(label_queue), key=label_queue.count)
+
+
 # =========================================
 # MAIN PROCESSING FUNCTION
 # =========================================
-def process_frame(frame):
+def analyze_frame(frame, camera_id=None):
+    """
+    Detection, smoothing, severity and incident handling for one frame.
+    Does not draw on the frame. Returns a JSON-safe result:
+    {"boxes", "final_label", "severity", "timestamp", "frame_size"}
+    """
     global email_sent, last_email_time
     global in_incident, incident_label, incident_snap_count, incident_last_seen
-    global manual_alarm_override
+    global manual_alarm_override, incident_clip_path
 
     h, w, _ = frame.shape
-    total_area = w * h
 
-    results = model(frame, conf=0.4, verbose=False)
-    boxes = results[0].boxes
+    # per-camera ROI: infer on its bounding box only, measure against its area
+    roi = get_camera_roi(camera_id) if camera_id is not None else None
+    if roi is None:
+        total_area = w * h
+        boxes = camera_boxes(frame, camera_id)
+    else:
+        view, offset = roi.crop(frame)
+        total_area = roi.area(w, h)
+        boxes = roi.filter(camera_boxes(view, camera_id), offset)
 
     fire_area = 0
     smoke_present = False
     detected_label = "no_fire"
 
-    # -------------------------------------
-    # YOLO DETECTION
-    # -------------------------------------
-    if boxes is not None and len(boxes) > 0:
-        for b in boxes:
-            x1, y1, x2, y2 = map(int, b.xyxy[0].tolist())
-            cls_id = int(b.cls[0].item())
-            cls_name = CLASS_MAP.get(cls_id, "unknown")
-            conf = float(b.conf[0].item()) * 100
-
-            color = (0, 0, 255) if cls_name == "fire" else (0, 255, 255)
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(frame, f"{cls_name} {conf:.1f}%",
-                        (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6,
-                        color, 2)
-
-            area = (x2 - x1) * (y2 - y1)
-
-            if cls_name == "fire":
-                fire_area += area
-                detected_label = "fire"
-            elif cls_name == "smoke" and detected_label != "fire":
-                smoke_present = True
-                detected_label = "smoke"
-
-    # -------------------------------------
-    # TEMPORAL SMOOTHING
-    # -------------------------------------
-    if detected_label == "no_fire":
-        label_queue.clear()
-        label_queue.append("no_fire")
-    else:
-        label_queue.append(detected_label)
+    for x1, y1, x2, y2, cls_name, conf in boxes:
+        area = (x2 - x1) * (y2 - y1)
+
+        if cls_name == "fire":
+            fire_area += area
+            detected_label = "fire"
+        elif cls_name == "smoke" and detected_label != "fire":
+            smoke_present = True
+            detected_label = "smoke"
 
-    final_label = max(set(label_queue), key=label_queue.count)
+    final_label = smooth_label(detected_label)
     fire_ratio = fire_area / total_area if total_area > 0 else 0
 
     severity = compute_severity(final_label, fire_ratio, smoke_present)
@@ -189,6 +337,28 @@ def process_frame(frame):
     now = time.time()
     timestamp_str = time.strftime("%Y-%m-%d %H:%M:%S")
 
+    result = {
+        "boxes": boxes,
+        "final_label": final_label,
+        "severity": severity,
+        "timestamp": now,
+        "frame_size": [w, h],
+    }
+
+    # second stage: a new incident waits for the ConvLSTM verdict; only
+    # live cameras (camera_id set) start it, uploads use it if it runs
+    verifier = get_verifier(create=camera_id is not None)
+    if verifier is not None:
+        verifier.observe(camera_id, frame)
+        if severity >= 2 and not in_incident:
+            state, downgraded = verifier.verify(camera_id)
+            result["verification"] = state
+            if state == "pending":
+                return result
+            if state == "rejected":
+                severity = result["severity"] = downgraded
+                final_label = result["final_label"] = "smoke" if downgraded == 1 else "no_fire"
+
     # ======================================================
     # 🔥 INCIDENT CONTROL
     # ======================================================
@@ -204,15 +374,25 @@ def process_frame(frame):
             manual_alarm_override = False   # ← RESET HERE
             print("🔥 New Incident Started:", final_label)
 
+            incident_clip_path = None
+            for listener in incident_listeners:
+                try:
+                    incident_clip_path = listener(camera_id, final_label, severity) or incident_clip_path
+                except Exception as e:
+                    print(f"⚠️ Incident listener failed: {e}")
+
         incident_last_seen = now
 
         # Save only 2–5 snapshots per incident
         if incident_snap_count < MAX_SNAPS:
             snapshot_name = f"{int(now)}_{final_label}_sev{severity}.jpg"
             snapshot_path = os.path.join(SNAPSHOT_DIR, snapshot_name)
-            cv2.imwrite(snapshot_path, frame)
+            # snapshots keep the boxes; the caller's frame stays clean
+            snapshot = frame.copy()
+            draw_boxes(snapshot, boxes)
+            cv2.imwrite(snapshot_path, snapshot)
 
-            save_alert_to_db(timestamp_str, final_label, severity, snapshot_path)
+            save_alert_to_db(timestamp_str, final_label, severity, snapshot_path, incident_clip_path)
 
             incident_snap_count += 1
             print(f"📸 Snapshot saved ({incident_snap_count}/{MAX_SNAPS})")
@@ -234,31 +414,28 @@ def process_frame(frame):
             in_incident = False
             incident_label = None
             incident_snap_count = 0
+            incident_clip_path = None
             manual_alarm_override = False  # Reset override when safe
 
-    # -------------------------------------
-    # DRAW SEVERITY TEXT
-    # -------------------------------------
-    severity_colors = [
-        (0, 255, 0),
-        (0, 255, 255),
-        (0, 165, 255),
-        (0, 0, 255)
-    ]
-
-    severity_text = [
-        "SAFE",
-        "SMOKE WARNING",
-        "SMALL FIRE",
-        "LARGE FIRE"
-    ]
-
-    cv2.putText(frame, f"FINAL: {final_label}",
-                (10, 35), cv2.FONT_HERSHEY_SIMPLEX,
-                1, severity_colors[severity], 2)
-
-    cv2.putText(frame, f"SEVERITY: {severity_text[severity]}",
-                (10, 70), cv2.FONT_HERSHEY_SIMPLEX,
-                0.8, severity_colors[severity], 2)
-
-    return frame, final_label, severity
+    return result
+
+
+def reset_incident_state():
+    """Forget smoothing, incident and per-camera state (offline tools, between videos)."""
+    global email_sent, last_email_time, alarm_playing
+    global in_incident, incident_label, incident_snap_count, incident_last_seen
+    global manual_alarm_override, incident_clip_path
+
+    label_queue.clear()
+    email_sent, last_email_time, alarm_playing = False, 0, False
+    in_incident, incident_label, incident_snap_count, incident_last_seen = False, None, 0, 0
+    manual_alarm_override, incident_clip_path = False, None
+    for camera_id in list(trackers) + list(prefilters):
+        forget_tracker(camera_id)
+
+
+def process_frame(frame):
+    """Analyze and annotate a frame in place: (frame, final_label, severity)."""
+    result = analyze_frame(frame)
+    draw_overlay(frame, result)
+    return frame, result["final_label"], result["severity"]
@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import time
+
+import cv2
+
+from detection.tiling import merge_boxes
+
+# =========================================
+# TWO-MODEL CASCADE
+# -----------------------------------------
+# A small model (e.g. best_nano_111.pt) screens every frame at a low
+# confidence. Only when it reports fire or smoke is the large D-Fire
+# model run, on padded crops around the candidates (or on the whole
+# frame when the candidates cover most of it). The large model's boxes
+# are the result: it confirms or rejects, and severity is computed from
+# what it returns. Frames the small model finds empty cost one nano
+# inference.
+#
+# Enabled with FIREGUARD_CASCADE_MODEL=<small weights>.
+#
+# Benchmark against the large model alone (from web_app/):
+#   python -m detection.model_cascade <video> --small detection/best_nano_111.pt
+# =========================================
+
+CASCADE_MODEL = os.environ.get("FIREGUARD_CASCADE_MODEL")
+SCREEN_CONF = float(os.environ.get("FIREGUARD_CASCADE_SCREEN_CONF", 0.15))
+CROP_MARGIN = 0.5          # padding around a candidate, relative to its size
+MIN_CROP = 160             # pixels
+FULL_FRAME_SHARE = 0.5     # crops covering more than this -> one full-frame pass
+
+
+def _merge_overlapping(rects):
+    """Union rectangles that overlap until none do."""
+    rects = [list(r) for r in rects]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+
+def candidate_regions(boxes, width, height):
+    """Padded, merged crop rectangles around the small model's boxes."""
+    rects = []
+    for x1, y1, x2, y2, _, _ in boxes:
+        pad_x = max((x2 - x1) * CROP_MARGIN, (MIN_CROP - (x2 - x1)) / 2, 0)
+        pad_y = max((y2 - y1) * CROP_MARGIN, (MIN_CROP - (y2 - y1)) / 2, 0)
+        rects.append([max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y)),
+                      min(width, int(x2 + pad_x)), min(height, int(y2 + pad_y))])
+    return _merge_overlapping(rects)
+
+
+class ModelCascade:
+    """
+    screen(images) and confirm(images) each return one box list per image
+    ([x1, y1, x2, y2, cls_name, conf]); screen should use a low threshold.
+    """
+
+    def __init__(self, screen, confirm):
+        self.screen = screen
+        self.confirm = confirm
+        self.frames = 0
+        self.escalated = 0
+
+    def detect(self, frame):
+        self.frames += 1
+        candidates = self.screen([frame])[0]
+        if not candidates:
+            return []
+        self.escalated += 1
+
+        h, w = frame.shape[:2]
+        regions = candidate_regions(candidates, w, h)
+        covered = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if covered > FULL_FRAME_SHARE * w * h:
+            return self.confirm([frame])[0]
+
+        boxes = []
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        for (ox, oy, _, _), crop_boxes in zip(regions, self.confirm(crops)):
+            for x1, y1, x2, y2, cls_name, conf in crop_boxes:
+                boxes.append([x1 + ox, y1 + oy, x2 + ox, y2 + oy, cls_name, conf])
+        return merge_boxes(boxes)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "escalated": self.escalated,
+            "escalation_ratio": round(self.escalated / self.frames, 3) if self.frames else 0.0,
+        }
+
+
+# =========================================
+# BENCHMARK
+# =========================================
+def _frame_label(boxes):
+    classes = {b[4] for b in boxes}
+    return "fire" if "fire" in classes else "smoke" if "smoke" in classes else "no_fire"
+
+
+if __name__ == "__main__":
+    from ultralytics import YOLO
+
+    # the engine's conversion, so benchmark boxes match live detection
+    from detection.detection_engine import CLASS_MAP, to_boxes
+
+    parser = argparse.ArgumentParser(description="Cascade vs large-model-only throughput and agreement")
+    parser.add_argument("video")
+    parser.add_argument("--small", default="detection/best_nano_111.pt")
+    parser.add_argument("--large", default="detection/yolo11-d-fire-dataset.pt")
+    parser.add_argument("--screen-conf", type=float, default=SCREEN_CONF)
+    parser.add_argument("--truth", choices=["fire", "smoke", "none"],
+                        help="ground truth of the whole video, to score both pipelines")
+    parser.add_argument("--max-frames", type=int, default=0, help="0 = the whole video")
+    parser.add_argument("--chunk", type=int, default=32, help="frames decoded at a time")
+    parser.add_argument("--out", default="cascade_benchmark.json")
+    args = parser.parse_args()
+
+    small, large = YOLO(args.small), YOLO(args.large)
+
+    def batch(model, conf, class_map):
+        def run(images):
+            return [to_boxes(r, class_map) for r in model(images, conf=conf, verbose=False)]
+        return run
+
+    # class names as get_cascade() / detect_batch() use them
+    large_only = batch(large, 0.4, CLASS_MAP)
+    cascade = ModelCascade(batch(small, args.screen_conf, {k: v.lower() for k, v in small.names.items()}),
+                           large_only)
+
+    # frames are streamed through both pipelines in chunks; only labels are kept
+    cap = cv2.VideoCapture(args.video)
+    reference, predicted = [], []
+    large_seconds = cascade_seconds = 0.0
+    warm = False
+    while True:
+        want = args.chunk if not args.max_frames else min(args.chunk, args.max_frames - len(reference))
+        chunk = []
+        while len(chunk) < want:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            chunk.append(frame)
+        if not chunk:
+            break
+
+        if not warm:
+            # warm both models up before timing
+            large_only([chunk[0]])
+            cascade.detect(chunk[0])
+            cascade.frames = cascade.escalated = 0
+            warm = True
+
+        t0 = time.perf_counter()
+        reference += [_frame_label(large_only([f])[0]) for f in chunk]
+        large_seconds += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        predicted += [_frame_label(cascade.detect(f)) for f in chunk]
+        cascade_seconds += time.perf_counter() - t0
+    cap.release()
+    if not reference:
+        raise SystemExit(f"no frames read from {args.video}")
+
+    # frame-level agreement, taking the large model alone as reference
+    tp = sum(p != "no_fire" and p == r for p, r in zip(predicted, reference))
+    pred_pos = sum(p != "no_fire" for p in predicted)
+    ref_pos = sum(r != "no_fire" for r in reference)
+
+    report = {
+        "video": args.video,
+        "frames": len(reference),
+        "large_only_fps": round(len(reference) / large_seconds, 2),
+        "cascade_fps": round(len(reference) / cascade_seconds, 2),
+        "speedup": round(large_seconds / cascade_seconds, 2),
+        "cascade_precision": round(tp / pred_pos, 4) if pred_pos else None,
+        "cascade_recall": round(tp / ref_pos, 4) if ref_pos else None,
+        **cascade.stats(),
+    }
+
+    if args.truth:
+        truth = "no_fire" if args.truth == "none" else args.truth
+        for name, labels in (("large_only", reference), ("cascade", predicted)):
+            positives = [label for label in labels if label != "no_fire"]
+            report[f"{name}_precision_vs_truth"] = (
+                round(sum(label == truth for label in positives) / len(positives), 4) if positives else None)
+            report[f"{name}_accuracy_vs_truth"] = round(sum(label == truth for label in labels) / len(labels), 4)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
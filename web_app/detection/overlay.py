@@ -0,0 +1,75 @@
+import cv2
+
+# =========================================
+# OVERLAY RENDERING
+# -----------------------------------------
+# Draws a detection result (see detection_engine.analyze_frame) onto
+# a frame. Kept apart from the engine so the web tier can draw
+# without loading the model.
+# =========================================
+
+SEVERITY_COLORS = [
+    (0, 255, 0),
+    (0, 255, 255),
+    (0, 165, 255),
+    (0, 0, 255)
+]
+
+SEVERITY_TEXT = [
+    "SAFE",
+    "SMOKE WARNING",
+    "SMALL FIRE",
+    "LARGE FIRE"
+]
+
+
+def draw_boxes(frame, boxes, scale=1.0, scale_y=None):
+    """`scale_y` for frames resized to another aspect ratio (default: `scale`)."""
+    if scale_y is None:
+        scale_y = scale
+    # text stays readable on thumbnails
+    font = max(min(scale, scale_y), 0.5)
+    thick = 2 if min(scale, scale_y) > 0.5 else 1
+
+    for x1, y1, x2, y2, cls_name, conf in boxes:
+        if scale != 1.0 or scale_y != 1.0:
+            x1, x2 = int(x1 * scale), int(x2 * scale)
+            y1, y2 = int(y1 * scale_y), int(y2 * scale_y)
+        color = (0, 0, 255) if cls_name == "fire" else (0, 255, 255)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, thick)
+        cv2.putText(frame, f"{cls_name} {conf * 100:.1f}%",
+                    (x1, y1 - int(10 * font)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6 * font,
+                    color, thick)
+
+
+def draw_severity(frame, final_label, severity, scale=1.0):
+    font = max(scale, 0.5)
+    thick = 2 if scale > 0.5 else 1
+
+    cv2.putText(frame, f"FINAL: {final_label}",
+                (10, int(35 * font)), cv2.FONT_HERSHEY_SIMPLEX,
+                1 * font, SEVERITY_COLORS[severity], thick)
+
+    cv2.putText(frame, f"SEVERITY: {SEVERITY_TEXT[severity]}",
+                (10, int(70 * font)), cv2.FONT_HERSHEY_SIMPLEX,
+                0.8 * font, SEVERITY_COLORS[severity], thick)
+
+
+def draw_overlay(frame, result, scale=None):
+    """
+    Draw boxes and severity banners in place. Returns the frame.
+
+    `frame` may be a resized copy of the analyzed frame; by default the
+    scale is derived from result["frame_size"], per axis, so a frame
+    squeezed to another aspect ratio (mosaic tiles) still lines up.
+    """
+    scale_y = scale
+    if scale is None:
+        analyzed_w, analyzed_h = result.get("frame_size") or [frame.shape[1], frame.shape[0]]
+        scale = frame.shape[1] / analyzed_w if analyzed_w else 1.0
+        scale_y = frame.shape[0] / analyzed_h if analyzed_h else scale
+
+    draw_boxes(frame, result["boxes"], scale, scale_y)
+    draw_severity(frame, result["final_label"], result["severity"], min(scale, scale_y))
+    return frame
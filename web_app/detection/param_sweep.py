@@ -0,0 +1,211 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from detection.ablation_cache import CACHE_DIR, CLASS_CODE, FIRE, NO_FIRE, SMOKE, load_cache
+
+# =========================================
+# PARAMETER SWEEP
+# -----------------------------------------
+# Evaluates every combination of
+#   smoothing window  (label_queue maxlen, 7 today)
+#   confidence        (conf=0.4 today)
+#   large-fire ratio  (0.05 boundary in compute_severity)
+# against the detections cached by ablation_cache.py, without Python
+# loops over frames: confidence filtering is a mask over per-frame max
+# confidences, the sliding-window majority comes from cumulative label
+# counts. Metrics use run_ablation's names (fire_tp, smoke_tp,
+# false_positives, stability_flips, latency_fire, latency_smoke).
+#
+# Run from web_app/:
+#   python -m detection.ablation_cache build <dataset>
+#   python -m detection.param_sweep [--windows 1:15] [--confs 0.2:0.8:0.05] [--out sweep_results.json]
+# =========================================
+
+
+def per_frame(entry, confs):
+    """
+    Raw labels (C, n) for each confidence threshold, and the fire area
+    (C, n) of the boxes that survive it.
+    """
+    offsets = entry["offsets"]
+    n = len(offsets) - 1
+    frame_of_box = np.repeat(np.arange(n), np.diff(offsets))
+    codes = CLASS_CODE[entry["cls"]]
+    conf = entry["conf"].astype(np.float32)
+    xyxy = entry["xyxy"].astype(np.int64)
+    area = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+
+    max_fire = np.zeros(n, np.float32)
+    max_smoke = np.zeros(n, np.float32)
+    np.maximum.at(max_fire, frame_of_box[codes == FIRE], conf[codes == FIRE])
+    np.maximum.at(max_smoke, frame_of_box[codes == SMOKE], conf[codes == SMOKE])
+
+    c = np.asarray(confs, np.float32)[:, None]
+    fire = max_fire >= c
+    smoke = ~fire & (max_smoke >= c)
+    labels = np.where(fire, FIRE, np.where(smoke, SMOKE, NO_FIRE)).astype(np.int8)
+
+    is_fire = codes == FIRE
+    fire_area = np.stack([
+        np.bincount(frame_of_box[is_fire & (conf >= t)], weights=area[is_fire & (conf >= t)], minlength=n)
+        for t in confs
+    ]) if n else np.zeros((len(confs), 0))
+    return labels, fire_area
+
+
+def smooth_all(labels, window, mode="window"):
+    """
+    Majority label over the window for every row of labels (C, n) at once.
+    mode "engine" also restarts the window at each no_fire, as
+    detection_engine.analyze_frame clears its queue. Ties go to fire,
+    then smoke.
+    """
+    rows, n = labels.shape
+    onehot = np.zeros((rows, n + 1, 3), np.int32)
+    onehot[:, 1:, :] = labels[..., None] == np.arange(3)
+    counts_cs = np.cumsum(onehot, axis=1)
+
+    idx = np.arange(n)
+    start = np.maximum(idx - window + 1, 0)[None, :].repeat(rows, 0)
+    if mode == "engine":
+        last_clear = np.where(labels == NO_FIRE, idx, 0)
+        start = np.maximum(start, np.maximum.accumulate(last_clear, axis=1))
+
+    end_counts = counts_cs[:, 1:, :]
+    start_counts = np.take_along_axis(counts_cs, start[..., None].repeat(3, 2), axis=1)
+    counts = end_counts - start_counts
+
+    # argmax picks the first maximum: order the columns fire, smoke, no_fire
+    priority = np.array([FIRE, SMOKE, NO_FIRE])
+    return priority[counts[..., priority].argmax(axis=2)].astype(np.int8)
+
+
+def _first(mask):
+    """1-based index of the first True per row, or 0 when there is none."""
+    hit = mask.any(axis=1)
+    return np.where(hit, mask.argmax(axis=1) + 1, 0)
+
+
+def label_metrics(labels):
+    prev = np.concatenate([np.full((labels.shape[0], 1), NO_FIRE, np.int8), labels[:, :-1]], axis=1)
+    return {
+        "fire_tp": (labels == FIRE).sum(axis=1),
+        "smoke_tp": (labels == SMOKE).sum(axis=1),
+        "false_positives": ((labels == NO_FIRE) & (prev != NO_FIRE)).sum(axis=1),
+        "stability_flips": (labels != prev).sum(axis=1),
+        "latency_fire": _first(labels == FIRE),
+        "latency_smoke": _first(labels == SMOKE),
+        "detection_frames": (labels != NO_FIRE).sum(axis=1),
+    }
+
+
+def sweep(entries, windows, confs, ratios, mode="window"):
+    W, C, R = len(windows), len(confs), len(ratios)
+    totals = {k: np.zeros((W, C), np.int64) for k in
+              ("fire_tp", "smoke_tp", "false_positives", "stability_flips", "false_alarm_frames")}
+    latency = {k: np.zeros((W, C), np.float64) for k in ("latency_fire", "latency_smoke")}
+    detected = {k: np.zeros((W, C), np.int64) for k in ("latency_fire", "latency_smoke")}
+    videos = {"fire": 0, "smoke": 0, "no_fire": 0}
+    large_fire = np.zeros((W, C, R), np.int64)
+    latency_large = np.zeros((W, C, R), np.float64)
+    detected_large = np.zeros((W, C, R), np.int64)
+
+    for entry in entries:
+        truth = str(entry["ground_truth"])
+        videos[truth] = videos.get(truth, 0) + 1
+        raw, fire_area = per_frame(entry, confs)
+        w, h = entry["frame_size"].tolist()
+        ratio = fire_area / (w * h) if w * h else np.zeros_like(fire_area)
+
+        for wi, window in enumerate(windows):
+            smoothed = smooth_all(raw, window, mode)
+            m = label_metrics(smoothed)
+
+            totals["false_positives"][wi] += m["false_positives"]
+            totals["stability_flips"][wi] += m["stability_flips"]
+            if truth == "fire":
+                totals["fire_tp"][wi] += m["fire_tp"]
+            elif truth == "smoke":
+                totals["smoke_tp"][wi] += m["smoke_tp"]
+            else:
+                totals["false_alarm_frames"][wi] += m["detection_frames"]
+
+            key = {"fire": "latency_fire", "smoke": "latency_smoke"}.get(truth)
+            if key:
+                hit = m[key] > 0
+                latency[key][wi] += np.where(hit, m[key], 0)
+                detected[key][wi] += hit
+
+            if truth == "fire":
+                # severity 3 frames per large-fire ratio
+                big = (smoothed[:, None, :] == FIRE) & (ratio[:, None, :] >= np.asarray(ratios)[None, :, None])
+                large_fire[wi] += big.sum(axis=2)
+                first = _first(big.reshape(C * R, -1)).reshape(C, R)
+                latency_large[wi] += first
+                detected_large[wi] += first > 0
+
+    rows = []
+    for wi, window in enumerate(windows):
+        for ci, conf in enumerate(confs):
+            base = {
+                "window": int(window),
+                "conf": round(float(conf), 3),
+                **{k: int(v[wi, ci]) for k, v in totals.items()},
+                "latency_fire": _mean(latency["latency_fire"][wi, ci], detected["latency_fire"][wi, ci]),
+                "latency_smoke": _mean(latency["latency_smoke"][wi, ci], detected["latency_smoke"][wi, ci]),
+                "missed_fire_videos": videos["fire"] - int(detected["latency_fire"][wi, ci]),
+                "missed_smoke_videos": videos["smoke"] - int(detected["latency_smoke"][wi, ci]),
+            }
+            for ri, r in enumerate(ratios):
+                rows.append(dict(
+                    base,
+                    large_fire_ratio=float(r),
+                    large_fire_frames=int(large_fire[wi, ci, ri]),
+                    latency_large_fire=_mean(latency_large[wi, ci, ri], detected_large[wi, ci, ri]),
+                ))
+    return {"mode": mode, "videos": videos, "configs": len(rows), "results": rows}
+
+
+def _mean(total, count):
+    return round(float(total) / int(count), 2) if count else None
+
+
+def _grid(spec, cast=float):
+    """'a:b[:step]' range (inclusive) or 'a,b,c' list."""
+    if ":" in spec:
+        parts = [float(p) for p in spec.split(":")]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else 1
+        return [cast(v) for v in np.arange(start, stop + step / 2, step)]
+    return [cast(v) for v in spec.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorised sweep over smoothing/conf/severity settings")
+    parser.add_argument("--cache", default=CACHE_DIR)
+    parser.add_argument("--windows", default="1:15")
+    parser.add_argument("--confs", default="0.2:0.8:0.05")
+    parser.add_argument("--ratios", default="0.01,0.02,0.05,0.1,0.2")
+    parser.add_argument("--mode", choices=["window", "engine"], default="window")
+    parser.add_argument("--out", default="sweep_results.json")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    entries = load_cache(args.cache)
+    report = sweep(entries, _grid(args.windows, int), _grid(args.confs), _grid(args.ratios), args.mode)
+    seconds = time.perf_counter() - t0
+    report["seconds"] = round(seconds, 3)
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{report['configs']} configs over {len(entries)} videos in {seconds:.2f}s -> {args.out}")
+    best = sorted(report["results"], key=lambda r: (r["missed_fire_videos"], r["false_positives"],
+                                                     r["latency_fire"] or 1e9))[:10]
+    print(f"{'window':>6} {'conf':>5} {'ratio':>5} {'FP':>6} {'flips':>6} {'lat_fire':>8} {'lat_smoke':>9}")
+    for r in best:
+        print(f"{r['window']:>6} {r['conf']:>5} {r['large_fire_ratio']:>5} {r['false_positives']:>6} "
+              f"{r['stability_flips']:>6} {r['latency_fire']!s:>8} {r['latency_smoke']!s:>9}")
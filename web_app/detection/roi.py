@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# =========================================
+# PER-CAMERA REGION OF INTEREST
+# -----------------------------------------
+# {"roi": [[x, y], ...] or null, "masks": [[[x, y], ...], ...]}
+# Points are fractions of the frame size (0..1), so a setting survives
+# a resolution change. The engine runs the model on the ROI's bounding
+# box only, drops boxes whose centre is outside the ROI polygon or
+# inside an exclusion mask, and measures fire_ratio against the ROI
+# area left after masking.
+#
+# Settings are kept in ROI_FILE so they survive restarts.
+# =========================================
+
+ROI_FILE = os.environ.get("FIREGUARD_ROI_FILE", "camera_roi.json")
+
+
+def _polygon(points):
+    pts = np.asarray(points, dtype=np.float64)
+    if pts.ndim != 2 or pts.shape[1] != 2 or len(pts) < 3:
+        raise ValueError("a polygon needs at least 3 [x, y] points")
+    if pts.min() < 0 or pts.max() > 1:
+        raise ValueError("polygon points must be fractions of the frame size (0..1)")
+    return pts
+
+
+class CameraROI:
+    def __init__(self, roi=None, masks=()):
+        self.roi = _polygon(roi) if roi else None
+        self.masks = [_polygon(m) for m in masks]
+        self._size = None
+
+    def to_dict(self):
+        return {
+            "roi": self.roi.tolist() if self.roi is not None else None,
+            "masks": [m.tolist() for m in self.masks],
+        }
+
+    def _prepare(self, w, h):
+        """Pixel polygons, crop rectangle and usable area for one frame size."""
+        if self._size == (w, h):
+            return
+        scale = np.array([w, h], dtype=np.float32)
+        roi = (self.roi.astype(np.float32) * scale if self.roi is not None
+               else np.array([[0, 0], [w, 0], [w, h], [0, h]], dtype=np.float32))
+        self._roi_px = roi.reshape(-1, 1, 2)
+        self._masks_px = [(m.astype(np.float32) * scale).reshape(-1, 1, 2) for m in self.masks]
+
+        x, y, bw, bh = cv2.boundingRect(roi.astype(np.int32))
+        self._crop = (max(0, x), max(0, y), min(w, x + bw), min(h, y + bh))
+
+        area = np.zeros((h, w), dtype=np.uint8)
+        cv2.fillPoly(area, [roi.astype(np.int32)], 1)
+        if self._masks_px:
+            cv2.fillPoly(area, [m.astype(np.int32) for m in self._masks_px], 0)
+        self._area = int(cv2.countNonZero(area))
+        self._size = (w, h)
+
+    def crop(self, frame):
+        """(view of the ROI bounding box, (x_offset, y_offset)); no copy."""
+        h, w = frame.shape[:2]
+        self._prepare(w, h)
+        x1, y1, x2, y2 = self._crop
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def area(self, frame_w, frame_h):
+        self._prepare(frame_w, frame_h)
+        return self._area
+
+    def filter(self, boxes, offset=(0, 0)):
+        """Shift crop-relative boxes back to frame coordinates and drop masked ones."""
+        ox, oy = offset
+        kept = []
+        for x1, y1, x2, y2, cls_name, conf in boxes:
+            x1, y1, x2, y2 = x1 + ox, y1 + oy, x2 + ox, y2 + oy
+            centre = ((x1 + x2) / 2, (y1 + y2) / 2)
+            if cv2.pointPolygonTest(self._roi_px, centre, False) < 0:
+                continue
+            if any(cv2.pointPolygonTest(m, centre, False) >= 0 for m in self._masks_px):
+                continue
+            kept.append([x1, y1, x2, y2, cls_name, conf])
+        return kept
+
+
+# =========================================
+# STORE
+# =========================================
+camera_rois = {}   # {camera_id: CameraROI}
+rois_lock = threading.Lock()
+
+
+def load_rois(path=ROI_FILE):
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+        for camera_id, config in saved.items():
+            camera_rois[camera_id] = CameraROI(config.get("roi"), config.get("masks", []))
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not load ROI settings from {path}: {e}")
+
+
+def _save_rois(path=ROI_FILE):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({cid: r.to_dict() for cid, r in camera_rois.items()}, f, indent=2)
+    os.replace(tmp, path)
+
+
+def get_camera_roi(camera_id):
+    return camera_rois.get(str(camera_id))
+
+
+def set_camera_roi(camera_id, config):
+    """Validate, apply and persist; config None or empty clears it. Raises ValueError."""
+    camera_id = str(camera_id)
+    if config is not None and not isinstance(config, dict):
+        raise ValueError("ROI settings must be a JSON object")
+    roi = None
+    if config and (config.get("roi") or config.get("masks")):
+        try:
+            roi = CameraROI(config.get("roi"), config.get("masks") or [])
+        except TypeError:
+            raise ValueError("masks must be a list of polygons")
+
+    with rois_lock:
+        if roi is None:
+            camera_rois.pop(camera_id, None)
+        else:
+            camera_rois[camera_id] = roi
+        _save_rois()
+    return roi.to_dict() if roi is not None else {"roi": None, "masks": []}
+
+
+load_rois()
@@ -0,0 +1,189 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# =========================================
+# TEMPORAL VERIFIER (second stage)
+# -----------------------------------------
+# The ConvLSTM trained by src/train_model.py classifies 16-frame clips
+# as fire / smoke / no_fire. When YOLO raises severity to >= 2 and no
+# incident is open, the camera's last 16 frames go to a background
+# worker; the incident (alarm, clip, snapshots, email) is held until
+# the verdict arrives:
+#   fire      -> incident goes ahead
+#   smoke     -> downgraded to severity 1
+#   no_fire   -> downgraded to severity 0
+# The live path never waits: a full queue or a verdict slower than
+# VERIFY_TIMEOUT lets the alert through unverified (fail open).
+#
+# Enabled with FIREGUARD_VERIFIER_MODEL=<saved Keras model>; needs
+# tensorflow, which is only imported by the worker. The verifier (and
+# its worker) is built by the first live camera frame, so processes
+# that never run cameras, like stateless web workers in camera manager
+# mode and offline tools, never load tensorflow.
+# =========================================
+
+VERIFIER_MODEL = os.environ.get("FIREGUARD_VERIFIER_MODEL")
+VERIFY_TIMEOUT = float(os.environ.get("FIREGUARD_VERIFY_TIMEOUT", 3.0))
+VERIFY_QUEUE_SIZE = 4
+
+# must match src/train_model.py
+SEQ_LEN = 16
+IMG_SIZE = (128, 128)
+CLASSES = ["fire", "smoke", "no_fire"]
+VERDICT_SEVERITY = {"fire": None, "smoke": 1, "no_fire": 0}   # None = keep
+
+STATS_ALPHA = 0.2
+
+
+class TemporalVerifier:
+    def __init__(self, model_path, timeout=VERIFY_TIMEOUT, queue_size=VERIFY_QUEUE_SIZE):
+        self.model_path = model_path
+        self.timeout = timeout
+        self.jobs = queue.Queue(maxsize=queue_size)
+
+        self.clips = {}       # {camera_id: deque of SEQ_LEN small frames}
+        self.pending = {}     # {camera_id: job}
+        self.rejected = {}    # {camera_id: (label, frames seen since)}
+        self.lock = threading.Lock()
+
+        self.metrics = {
+            "submitted": 0, "confirmed": 0, "suppressed": 0,
+            "timeouts": 0, "dropped": 0,
+            "latency_ms": 0.0, "last_latency_ms": 0.0,
+        }
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    # ---------------------------------
+    # live path (capture threads)
+    # ---------------------------------
+    def observe(self, camera_id, frame):
+        small = cv2.resize(frame, IMG_SIZE, interpolation=cv2.INTER_AREA)
+        with self.lock:
+            clip = self.clips.get(camera_id)
+            if clip is None:
+                clip = self.clips[camera_id] = deque(maxlen=SEQ_LEN)
+            clip.append(small)
+            if camera_id in self.rejected:
+                label, seen = self.rejected[camera_id]
+                self.rejected[camera_id] = (label, seen + 1)
+
+    def verify(self, camera_id):
+        """
+        Non-blocking; (state, severity). state is pending, confirmed,
+        rejected or unverified; severity replaces the detector's when
+        rejected and is None otherwise.
+        """
+        with self.lock:
+            job = self.pending.get(camera_id)
+            if job is not None:
+                if job["done"].is_set():
+                    del self.pending[camera_id]
+                    return self._apply(camera_id, job["label"])
+                if time.time() - job["submitted"] > self.timeout:
+                    del self.pending[camera_id]
+                    self.metrics["timeouts"] += 1
+                    return "unverified", None
+                return "pending", None
+
+            # after a rejection, keep suppressing until a whole new clip exists
+            if camera_id in self.rejected:
+                label, seen = self.rejected[camera_id]
+                if seen < SEQ_LEN:
+                    return "rejected", VERDICT_SEVERITY[label]
+                del self.rejected[camera_id]
+
+            clip = list(self.clips.get(camera_id, ()))
+            if not clip:
+                return "unverified", None
+            clip += [clip[-1]] * (SEQ_LEN - len(clip))
+
+            job = {"camera_id": camera_id, "clip": clip, "submitted": time.time(),
+                   "done": threading.Event(), "label": None}
+            try:
+                self.jobs.put_nowait(job)
+            except queue.Full:
+                self.metrics["dropped"] += 1
+                return "unverified", None
+            self.pending[camera_id] = job
+            self.metrics["submitted"] += 1
+            return "pending", None
+
+    def _apply(self, camera_id, label):
+        # called with the lock held
+        severity = VERDICT_SEVERITY.get(label)
+        if label is None:
+            return "unverified", None
+        if severity is None:
+            self.metrics["confirmed"] += 1
+            return "confirmed", None
+        self.metrics["suppressed"] += 1
+        self.rejected[camera_id] = (label, 0)
+        return "rejected", severity
+
+    def forget(self, camera_id):
+        with self.lock:
+            self.clips.pop(camera_id, None)
+            self.pending.pop(camera_id, None)
+            self.rejected.pop(camera_id, None)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.metrics, queued=self.jobs.qsize(), pending=len(self.pending))
+
+    # ---------------------------------
+    # background worker
+    # ---------------------------------
+    def _worker(self):
+        try:
+            from tensorflow.keras.models import load_model
+            model = load_model(self.model_path)
+        except Exception as e:
+            print(f"⚠️ Temporal verifier disabled, could not load {self.model_path}: {e}")
+            model = None
+
+        while True:
+            job = self.jobs.get()
+            try:
+                if model is not None:
+                    x = np.stack(job["clip"]).astype(np.float32) / 255.0
+                    probs = model.predict(x[None], verbose=0)[0]
+                    job["label"] = CLASSES[int(np.argmax(probs))]
+            except Exception as e:
+                print(f"⚠️ Temporal verifier failed: {e}")
+            finally:
+                # submit -> verdict, queueing included
+                ms = (time.time() - job["submitted"]) * 1000
+                with self.lock:
+                    m = self.metrics
+                    m["last_latency_ms"] = round(ms, 1)
+                    m["latency_ms"] = round(ms if not m["latency_ms"]
+                                            else (1 - STATS_ALPHA) * m["latency_ms"] + STATS_ALPHA * ms, 1)
+                job["done"].set()
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier(create=True):
+    """This process's verifier; None when disabled, or not built yet and create=False."""
+    global _verifier
+    if _verifier is None and create and VERIFIER_MODEL:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = TemporalVerifier(VERIFIER_MODEL)
+    return _verifier
+
+
+def verifier_stats():
+    """{"enabled", ...metrics} without building the verifier."""
+    if not VERIFIER_MODEL:
+        return {"enabled": False}
+    v = get_verifier(create=False)
+    return {"enabled": True, "started": v is not None, **(v.stats() if v else {})}
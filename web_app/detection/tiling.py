@@ -0,0 +1,136 @@
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# =========================================
+# TILED INFERENCE
+# -----------------------------------------
+# The model letterboxes every input to 640 px, so on a 4K frame a small
+# distant flame shrinks to a few pixels and is missed. Tiling cuts the
+# frame into overlapping cols x rows crops, runs them (plus, by default,
+# the whole frame for large fires) through the model as one batch, maps
+# the boxes back to frame coordinates and merges duplicates from the
+# overlaps with per-class NMS.
+#
+# Cost grows with the tile count, so it is enabled per camera
+# ("tiles": "2x2" in cameras.json or the start request).
+# =========================================
+
+DEFAULT_OVERLAP = 0.2
+MAX_TILES_PER_SIDE = 6
+NMS_IOU = 0.5
+
+
+def parse_tiling(spec):
+    """
+    None/"off" -> None; "3x2" -> {"cols": 3, "rows": 2, ...};
+    dicts may also set "overlap" and "full_frame".
+    """
+    if not spec or spec in ("off", "1x1"):
+        return None
+
+    if isinstance(spec, str):
+        cols, rows = (int(v) for v in spec.lower().split("x"))
+        spec = {"cols": cols, "rows": rows}
+    elif not isinstance(spec, dict):
+        raise ValueError(f"tiles must be a \"<cols>x<rows>\" string or an object, not {type(spec).__name__}")
+
+    try:
+        cols = min(max(int(spec.get("cols", 1)), 1), MAX_TILES_PER_SIDE)
+        rows = min(max(int(spec.get("rows", 1)), 1), MAX_TILES_PER_SIDE)
+        overlap = float(spec.get("overlap", DEFAULT_OVERLAP))
+    except (TypeError, ValueError):
+        raise ValueError("tiles \"cols\" and \"rows\" must be integers and \"overlap\" a number") from None
+    if not np.isfinite(overlap):
+        raise ValueError("tiles \"overlap\" must be a finite number")
+    if cols == rows == 1:
+        return None
+    return {
+        "cols": cols,
+        "rows": rows,
+        "overlap": min(max(overlap, 0.0), 0.5),
+        "full_frame": bool(spec.get("full_frame", True)),
+    }
+
+
+def make_tiles(width, height, cols, rows, overlap=DEFAULT_OVERLAP):
+    """Overlapping tile rectangles (x1, y1, x2, y2) covering the frame."""
+    tile_w = int(np.ceil(width / (cols - (cols - 1) * overlap)))
+    tile_h = int(np.ceil(height / (rows - (rows - 1) * overlap)))
+    xs = np.linspace(0, width - tile_w, cols).astype(int) if cols > 1 else [0]
+    ys = np.linspace(0, height - tile_h, rows).astype(int) if rows > 1 else [0]
+    # plain ints: boxes end up in JSON
+    return [(int(x), int(y), int(min(x + tile_w, width)), int(min(y + tile_h, height)))
+            for y in ys for x in xs]
+
+
+def merge_boxes(boxes, iou=NMS_IOU):
+    """Per-class NMS over [x1, y1, x2, y2, cls_name, conf] boxes."""
+    merged = []
+    for cls_name in {b[4] for b in boxes}:
+        same = [b for b in boxes if b[4] == cls_name]
+        rects = [[b[0], b[1], b[2] - b[0], b[3] - b[1]] for b in same]
+        keep = cv2.dnn.NMSBoxes(rects, [b[5] for b in same], 0.0, iou)
+        merged.extend(same[i] for i in np.array(keep).ravel())
+    return merged
+
+
+def detect_tiled(frame, detect_batch, cols, rows, overlap=DEFAULT_OVERLAP, full_frame=True):
+    """
+    Boxes for `frame` from one batched model call over its tiles.
+    `detect_batch(images)` returns one box list per image.
+    """
+    h, w = frame.shape[:2]
+    tiles = make_tiles(w, h, cols, rows, overlap)
+    images = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+    if full_frame:
+        tiles.append((0, 0, w, h))
+        images.append(frame)
+
+    boxes = []
+    for (ox, oy, _, _), tile_boxes in zip(tiles, detect_batch(images)):
+        for x1, y1, x2, y2, cls_name, conf in tile_boxes:
+            boxes.append([x1 + ox, y1 + oy, x2 + ox, y2 + oy, cls_name, conf])
+    return merge_boxes(boxes)
+
+
+# =========================================
+# BENCHMARK: latency vs tile count
+#   python -m detection.tiling [image_or_video] [model.pt]   (from web_app/)
+# =========================================
+if __name__ == "__main__":
+    from ultralytics import YOLO
+
+    # the engine's conversion, so benchmark boxes match live detection
+    from detection.detection_engine import to_boxes
+
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    model = YOLO(sys.argv[2] if len(sys.argv) > 2 else "detection/yolo11-d-fire-dataset.pt")
+
+    frame = None
+    if source:
+        frame = cv2.imread(source)
+        if frame is None:
+            ok, frame = cv2.VideoCapture(source).read()
+    if frame is None:
+        frame = np.random.randint(0, 255, (2160, 3840, 3), dtype=np.uint8)
+
+    def detect_batch(images):
+        return [to_boxes(r) for r in model(images, conf=0.4, verbose=False)]
+
+    runs = 10
+    print(f"frame {frame.shape[1]}x{frame.shape[0]}, {runs} runs per layout")
+    print(f"{'layout':>8} {'images':>7} {'ms/frame':>9} {'boxes':>6}")
+    for layout in ["1x1", "2x1", "2x2", "3x2", "4x3"]:
+        tiling = parse_tiling(layout)
+        detect = (lambda f: detect_batch([f])[0]) if tiling is None else \
+            (lambda f: detect_tiled(f, detect_batch, **tiling))
+        detect(frame)   # warm-up
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            boxes = detect(frame)
+        ms = (time.perf_counter() - t0) / runs * 1000
+        images = 1 if tiling is None else tiling["cols"] * tiling["rows"] + tiling["full_frame"]
+        print(f"{layout:>8} {images:>7} {ms:>9.1f} {len(boxes):>6}")
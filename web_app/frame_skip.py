@@ -0,0 +1,36 @@
+import os
+
+import cv2
+
+# ============================================================
+# SKIPPING FRAMES WITHOUT DECODING THEM
+# ------------------------------------------------------------
+# grab() only demuxes/decodes the next frame; the BGR conversion and
+# copy happen in retrieve(), so frames nobody analyzes should only be
+# grabbed. For files, a long stride is cheaper as a seek (the backend
+# jumps to the nearest keyframe instead of decoding every frame in
+# between); short strides stay on grab(), since a seek into the same
+# GOP decodes the same frames anyway.
+# ============================================================
+
+SEEK_MIN_FRAMES = int(os.environ.get("FIREGUARD_SEEK_MIN_FRAMES", 30))
+
+
+def advance(cap, count, seekable=False):
+    """Skip `count` frames of cap. Returns False at the end of the stream."""
+    if count <= 0:
+        return True
+
+    if seekable and count >= SEEK_MIN_FRAMES:
+        pos = cap.get(cv2.CAP_PROP_POS_FRAMES)
+        total = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        if total and pos + count >= total:
+            return False
+        if cap.set(cv2.CAP_PROP_POS_FRAMES, pos + count):
+            return True
+        # backends that cannot seek fall through to grabbing
+
+    for _ in range(count):
+        if not cap.grab():
+            return False
+    return True
@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+import psutil
+import requests
+
+from detection.ablation_cache import summarize
+
+# ============================================================
+# CAPACITY TEST
+# ------------------------------------------------------------
+# Puts N virtual cameras (virtual_camera.py) on a node, attaches M
+# MJPEG viewers to each, and records for every (N, M) step:
+#   analyzed fps     per camera, from the seq counters in /api/cameras
+#   drop rate        1 - analyzed / offered frames (N x --fps)
+#   viewer fps       frames actually received by the viewers
+#   stream latency   receive time - X-Timestamp (analysis time)
+#   cpu / rss        of the node process and its children
+# and writes the curve to a JSON report.
+#
+# Spawns its own node (FIREGUARD_VIRTUAL_SOURCE picks a looping video;
+# otherwise frames are generated):
+#   python load_test.py --cameras 1,2,4,8 --viewers 0,1,4 --duration 20
+# or measures one that is already running:
+#   python load_test.py --url http://127.0.0.1:5000 --pid 12345
+# ============================================================
+
+STEP_WARMUP = 5.0
+
+
+# ---------------------------------
+# node process usage (psutil)
+# ---------------------------------
+def _process_tree(pid):
+    children = {}
+    for p in psutil.process_iter(["pid", "ppid"]):
+        children.setdefault(p.info["ppid"], []).append(p.info["pid"])
+
+    tree, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        tree.append(p)
+        todo.extend(children.get(p, []))
+    return tree
+
+
+def process_usage(pid):
+    """(cpu seconds, rss bytes) summed over pid and its descendants."""
+    cpu = rss = 0
+    for p in _process_tree(pid):
+        try:
+            proc = psutil.Process(p)
+            with proc.oneshot():
+                times = proc.cpu_times()
+                cpu += times.user + times.system
+                rss += proc.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return cpu, rss
+
+
+# ---------------------------------
+# simulated viewers
+# ---------------------------------
+class Viewer:
+    """Reads one /video_feed stream in a thread and times each part."""
+
+    def __init__(self, url):
+        self.url = url
+        self.frames = 0
+        self.latencies = []
+        self.gaps = []
+        self.error = None
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def reset(self):
+        self.frames = 0
+        self.latencies = []
+        self.gaps = []
+
+    def _run(self):
+        last = None
+        try:
+            with requests.get(self.url, stream=True, timeout=10) as r:
+                r.raise_for_status()
+                for line in r.iter_lines(chunk_size=64 * 1024):
+                    if not self.running:
+                        break
+                    if not line.startswith(b"X-Timestamp:"):
+                        continue
+                    now = time.time()
+                    self.frames += 1
+                    self.latencies.append(now - float(line.split(b":", 1)[1]))
+                    if last is not None:
+                        self.gaps.append(now - last)
+                    last = now
+        except Exception as e:
+            self.error = str(e)
+
+    def stop(self):
+        self.running = False
+
+
+# ---------------------------------
+# one (N, M) step
+# ---------------------------------
+def list_cameras(url):
+    return requests.get(f"{url}/api/cameras", timeout=5).json().get("cameras", {})
+
+
+def run_step(url, pid, n_cameras, n_viewers, fps, duration, viewer_fps, profile):
+    ids = [f"virtual:load{i}@{fps:g}" for i in range(n_cameras)]
+    for cid in ids:
+        requests.post(f"{url}/api/cameras/start", json={"camera_id": cid}, timeout=30)
+
+    viewers = [
+        Viewer(f"{url}/video_feed/{quote(cid, safe=':@')}?fps={viewer_fps:g}&profile={profile}")
+        for cid in ids for _ in range(n_viewers)
+    ]
+
+    time.sleep(STEP_WARMUP)
+    for v in viewers:
+        v.reset()
+    before = list_cameras(url)
+    cpu0, _ = process_usage(pid) if pid else (0.0, 0)
+    t0 = time.time()
+
+    time.sleep(duration)
+
+    elapsed = time.time() - t0
+    after = list_cameras(url)
+    cpu1, rss = process_usage(pid) if pid else (0.0, 0)
+
+    for v in viewers:
+        v.stop()
+    for cid in ids:
+        requests.post(f"{url}/api/cameras/stop", json={"camera_id": cid}, timeout=30)
+
+    analyzed = [
+        (after.get(cid, {}).get("seq", 0) - before.get(cid, {}).get("seq", 0)) / elapsed
+        for cid in ids
+    ]
+    offered = fps * n_cameras
+    latencies = [x for v in viewers for x in v.latencies]
+    gaps = [x for v in viewers for x in v.gaps]
+    return {
+        "cameras": n_cameras,
+        "viewers_per_camera": n_viewers,
+        "seconds": round(elapsed, 2),
+        "offered_fps": offered,
+        "analyzed_fps": round(sum(analyzed), 2),
+        "analyzed_fps_per_camera": summarize(analyzed, 2),
+        "drop_rate": round(max(0.0, 1 - sum(analyzed) / offered), 4) if offered else 0.0,
+        "infer_ms": summarize([after[cid]["infer_ms"] for cid in ids if cid in after], 2),
+        "viewer_fps": summarize([v.frames / elapsed for v in viewers], 2),
+        "stream_latency_ms": summarize([x * 1000 for x in latencies], 2),
+        "frame_gap_ms": summarize([x * 1000 for x in gaps], 2),
+        "viewer_errors": sum(v.error is not None for v in viewers),
+        "cpu_percent": round(100 * (cpu1 - cpu0) / elapsed, 1) if pid else None,
+        "rss_mb": round(rss / 2**20, 1) if pid else None,
+    }
+
+
+def spawn_node(port):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, FIREGUARD_PORT=str(port))
+    proc = subprocess.Popen([sys.executable, "newapp.py"], cwd=here, env=env)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(120):
+        try:
+            requests.get(f"{url}/api/cameras", timeout=1)
+            return proc, url
+        except requests.RequestException:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"node on port {port} did not come up")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capacity test with virtual cameras and MJPEG viewers")
+    parser.add_argument("--url", help="node to test; default: spawn one")
+    parser.add_argument("--pid", type=int, help="node pid for CPU/RSS when --url is given")
+    parser.add_argument("--port", type=int, default=5099, help="port for the spawned node")
+    parser.add_argument("--cameras", default="1,2,4,8")
+    parser.add_argument("--viewers", default="0,1,4", help="viewers per camera")
+    parser.add_argument("--fps", type=float, default=15.0, help="frame rate of each virtual camera")
+    parser.add_argument("--viewer-fps", type=float, default=15.0)
+    parser.add_argument("--profile", default="preview")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds measured per step")
+    parser.add_argument("--out", default="load_test.json")
+    args = parser.parse_args()
+
+    proc = None
+    url, pid = args.url, args.pid
+    if url is None:
+        proc, url = spawn_node(args.port)
+        pid = proc.pid
+
+    steps = []
+    try:
+        for n in [int(x) for x in args.cameras.split(",")]:
+            for m in [int(x) for x in args.viewers.split(",")]:
+                r = run_step(url, pid, n, m, args.fps, args.duration, args.viewer_fps, args.profile)
+                steps.append(r)
+                print(f"N={n:<3} M={m:<3} analyzed={r['analyzed_fps']:>7}/{r['offered_fps']:g} fps "
+                      f"drop={r['drop_rate']:.1%} latency={r['stream_latency_ms']} "
+                      f"cpu={r['cpu_percent']}% rss={r['rss_mb']} MB")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    with open(args.out, "w") as f:
+        json.dump({"url": url, "camera_fps": args.fps, "viewer_fps": args.viewer_fps,
+                   "profile": args.profile, "steps": steps}, f, indent=2)
+    print(f"-> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# ============================================================
+# LOCAL MULTI-NODE CLUSTER
+# ------------------------------------------------------------
+# Starts coordinator.py plus N newapp.py inference nodes as local
+# processes so placement, rebalancing and proxying can be tried on one
+# machine. Kill a node process to watch its cameras move.
+#
+#   python local_cluster.py --nodes 3
+#   curl -X POST localhost:5000/api/cameras/start -d '{"camera_id": "video.mp4"}'
+#   curl localhost:5000/api/nodes
+# ============================================================
+
+
+def spawn(script, port, extra_env=None):
+    env = dict(os.environ, FIREGUARD_PORT=str(port), **(extra_env or {}))
+    return subprocess.Popen([sys.executable, script], env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a coordinator and several inference nodes locally")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--port", type=int, default=5000, help="coordinator port; nodes use the next ones")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(here)
+
+    coordinator_url = f"http://127.0.0.1:{args.port}"
+    procs = [spawn("coordinator.py", args.port)]
+    time.sleep(1)
+
+    for i in range(1, args.nodes + 1):
+        port = args.port + i
+        procs.append(spawn("newapp.py", port, {
+            "FIREGUARD_COORDINATOR": coordinator_url,
+            "FIREGUARD_NODE_URL": f"http://127.0.0.1:{port}",
+        }))
+        print(f"🖥️ Node {i} on port {port}")
+
+    print(f"🧭 Coordinator on {coordinator_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from detection.overlay import draw_overlay
+from stream_encoder import encode_jpeg
+
+# ============================================================
+# MULTI-CAMERA MOSAIC
+# ------------------------------------------------------------
+# One renderer thread per layout (camera list + grid + tile size)
+# copies the latest frame of each camera into a preallocated canvas,
+# encodes the canvas once per tick and hands the same JPEG to every
+# wall client watching that layout. The renderer exits when the last
+# client leaves.
+# ============================================================
+
+MOSAIC_FPS = 10
+MOSAIC_QUALITY = 75
+DEFAULT_TILE = (320, 180)
+MAX_TILES = 64
+LABEL_STRIP = 18   # px; the camera label sits bottom-left, clear of the overlay banner
+
+
+class Mosaic:
+    def __init__(self, camera_ids, cols, tile_size, get_frame, fps=MOSAIC_FPS):
+        self.camera_ids = list(camera_ids)
+        self.cols = cols
+        self.rows = (len(self.camera_ids) + cols - 1) // cols
+        self.tile_w, self.tile_h = tile_size
+        self.get_frame = get_frame
+        self.interval = 1.0 / fps
+
+        self.canvas = np.zeros((self.rows * self.tile_h, self.cols * self.tile_w, 3), dtype=np.uint8)
+        self.tiles = []
+        for i in range(len(self.camera_ids)):
+            r, c = divmod(i, cols)
+            y, x = r * self.tile_h, c * self.tile_w
+            self.tiles.append(self.canvas[y:y + self.tile_h, x:x + self.tile_w])
+        self.tile_seqs = [0] * len(self.camera_ids)
+
+        self.tick = 0
+        self.jpeg = None
+        self.cond = threading.Condition()
+        self.viewers = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._render_loop, daemon=True)
+
+    def _render_tile(self, i):
+        camera_id = self.camera_ids[i]
+        latest = self.get_frame(camera_id, self.tile_seqs[i])
+        if latest is None:
+            return False
+
+        seq, frame, meta = latest
+        tile = self.tiles[i]
+        # resize straight into the canvas slice, no per-frame allocation
+        cv2.resize(frame, (self.tile_w, self.tile_h), dst=tile, interpolation=cv2.INTER_AREA)
+        if meta.get("detections"):
+            draw_overlay(tile, meta["detections"])
+        label = str(camera_id)[-24:]
+        (text_w, _), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        cv2.rectangle(tile, (0, self.tile_h - LABEL_STRIP), (text_w + 12, self.tile_h), (0, 0, 0), cv2.FILLED)
+        cv2.putText(tile, label, (6, self.tile_h - 5), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5, (255, 255, 255), 1)
+        self.tile_seqs[i] = seq
+        return True
+
+    def _render_loop(self):
+        next_tick = time.monotonic()
+        while self.running:
+            changed = False
+            for i in range(len(self.camera_ids)):
+                try:
+                    changed |= self._render_tile(i)
+                except Exception as e:
+                    print(f"⚠️ Mosaic tile {self.camera_ids[i]} failed: {e}")
+
+            # nothing moved: keep serving the previous JPEG
+            if changed or self.jpeg is None:
+                jpeg = encode_jpeg(self.canvas, MOSAIC_QUALITY)
+                with self.cond:
+                    self.jpeg = jpeg
+                    self.tick += 1
+                    self.cond.notify_all()
+
+            next_tick = max(next_tick + self.interval, time.monotonic())
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+    def wait_next(self, last_tick, timeout=2.0):
+        """(tick, jpeg) once a tick newer than last_tick exists, else (last_tick, None)."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.tick > last_tick or not self.running, timeout)
+            if self.tick > last_tick:
+                return self.tick, self.jpeg
+            return last_tick, None
+
+
+mosaics = {}   # {layout_key: Mosaic}
+mosaics_lock = threading.Lock()
+
+
+def acquire_mosaic(camera_ids, cols, tile_size, get_frame):
+    key = (tuple(camera_ids), cols, tuple(tile_size))
+    with mosaics_lock:
+        m = mosaics.get(key)
+        if m is None:
+            m = mosaics[key] = Mosaic(camera_ids, cols, tile_size, get_frame)
+            m.thread.start()
+        m.viewers += 1
+        return m
+
+
+def release_mosaic(m):
+    key = (tuple(m.camera_ids), m.cols, (m.tile_w, m.tile_h))
+    with mosaics_lock:
+        m.viewers -= 1
+        if m.viewers > 0:
+            return
+        mosaics.pop(key, None)
+    m.running = False
+    with m.cond:
+        m.cond.notify_all()
+
+
+def parse_layout(args, default_cameras):
+    """(camera_ids, cols, (tile_w, tile_h)) from ?cameras=1,2,3&cols=&tile=320x180"""
+    raw = args.get("cameras")
+    camera_ids = [c for c in raw.split(",") if c] if raw else sorted(default_cameras)
+    camera_ids = camera_ids[:MAX_TILES]
+
+    try:
+        tile_w, tile_h = (int(v) for v in args.get("tile", "").lower().split("x"))
+    except ValueError:
+        tile_w, tile_h = DEFAULT_TILE
+    tile_w = min(max(tile_w, 32), 1920)
+    tile_h = min(max(tile_h, 18), 1080)
+
+    try:
+        cols = int(args.get("cols", 0))
+    except ValueError:
+        cols = 0
+    if cols <= 0:
+        cols = max(1, int(np.ceil(np.sqrt(len(camera_ids)))))
+
+    return camera_ids, cols, (tile_w, tile_h)
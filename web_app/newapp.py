@@ -1,19 +1,43 @@
-from flask import Flask, Response, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory
 import cv2
+import hmac
 import sqlite3
 import os
+import json
+import socket
 import threading
+import time
 from flask_cors import CORS
 
 # import functions from detection module
-from detection.detection_engine import process_frame, stop_alarm_manual
+from detection.detection_engine import DB_PATH, analyze_frame, detect_batch, stop_alarm_manual
+from detection.roi import get_camera_roi, set_camera_roi
+from detection.temporal_verifier import verifier_stats
+from camera_streams import (
+    FAILED, OPENING, camera_health, camera_streams, list_camera_streams, start_camera_stream,
+    start_cameras_from_config, stop_camera_stream, wait_camera_open,
+)
+from camera_client import CameraManagerClient
+from node_agent import start_heartbeat
+from stream_pacing import (
+    MJPEG_MIMETYPE, ClientPacer, LimitedStream, acquire_client_slot, add_viewer, bandwidth,
+    mjpeg_part, parse_stream_args, release_client_slot, viewer_counts, viewer_snapshot,
+)
+from stream_encoder import encode_for_profile, encode_scaled, forget_camera, shared_jpeg
+from mosaic import acquire_mosaic, parse_layout, release_mosaic
+from clip_recorder import CLIP_DIR
+from profiler import profiler
+from frame_skip import advance
+from triage import TRIAGE_DIR, TriageJobs
+from db_setup import ensure_clip_column
 
 # ============================================================
 # FLASK SETUP
 # ============================================================
 
 app = Flask(__name__)
-CORS(app)
+# every route is cross-origin except the admin endpoints
+CORS(app, resources={r"^/(?!api/admin/).*": {"origins": "*"}})
 
 UPLOAD_DIR = "uploaded_videos"
 OUTPUT_DIR = "processed_videos"
@@ -23,6 +47,9 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(SNAPSHOT_DIR, exist_ok=True)
 
+# alerts written before clip recording need the clip_path column
+ensure_clip_column(DB_PATH)
+
 # ============================================================
 # GLOBAL CAMERA STREAMING (Single Camera)
 # ============================================================
@@ -33,113 +60,158 @@ camera_lock = threading.Lock()
 
 # ============================================================
 # MULTI CAMERA SYSTEM
+# ------------------------------------------------------------
+# In-process by default. With FIREGUARD_CAMERA_MANAGER=host:port the
+# cameras live in camera_manager.py and this process stays stateless,
+# so it can run under a multi-worker WSGI server.
 # ============================================================
 
-camera_streams = {}   # {camera_id: {"cap":..., "frame":..., "running":...}}
-streams_lock = threading.Lock()
+CAMERA_MANAGER = os.environ.get("FIREGUARD_CAMERA_MANAGER")
+manager = CameraManagerClient(CAMERA_MANAGER) if CAMERA_MANAGER else None
 
+# how long /api/cameras/start waits for a camera before answering "opening"
+START_WAIT = float(os.environ.get("FIREGUARD_START_WAIT", 2.0))
 
-def start_camera_stream(camera_id):
-    camera_id = str(camera_id)
+# cameras to bring up at boot (in parallel); see camera_streams.start_cameras_from_config
+CAMERAS_CONFIG = os.environ.get("FIREGUARD_CAMERAS_CONFIG")
+if CAMERAS_CONFIG and manager is None:
+    start_cameras_from_config(CAMERAS_CONFIG)
+
+# each web worker only sees its own viewers: report them so the manager can add them up
+VIEWER_REPORT_INTERVAL = 2.0
 
-    with streams_lock:
-        # If already running, skip
-        if camera_id in camera_streams and camera_streams[camera_id]["running"]:
-            return True
 
-        # attempt to open camera
+def viewer_report_loop():
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
         try:
-            cap = cv2.VideoCapture(int(camera_id))
-        except Exception:
-            cap = cv2.VideoCapture(camera_id)  # try string (rtsp etc)
+            manager.report_viewers(worker, viewer_snapshot())
+        except Exception as e:
+            print(f"⚠️ Viewer report to camera manager failed: {e}")
+        time.sleep(VIEWER_REPORT_INTERVAL)
 
-        if not cap.isOpened():
-            return False
 
-        camera_streams[camera_id] = {
-            "cap": cap,
-            "frame": None,
-            "running": True
-        }
+if manager is not None:
+    threading.Thread(target=viewer_report_loop, daemon=True).start()
 
-        th = threading.Thread(target=update_camera_frame, args=(camera_id,), daemon=True)
-        camera_streams[camera_id]["thread"] = th
-        th.start()
 
-        return True
+# ============================================================
+# INFERENCE NODE MODE
+# ------------------------------------------------------------
+# With FIREGUARD_COORDINATOR=http://host:port this instance reports its
+# capacity to coordinator.py, which places cameras across nodes.
+# ============================================================
 
+PORT = int(os.environ.get("FIREGUARD_PORT", 5000))
+COORDINATOR = os.environ.get("FIREGUARD_COORDINATOR")
+NODE_URL = os.environ.get("FIREGUARD_NODE_URL", f"http://127.0.0.1:{PORT}")
 
-def update_camera_frame(camera_id):
-    camera_id = str(camera_id)
 
-    while camera_streams.get(camera_id, {}).get("running", False):
-        cap = camera_streams[camera_id]["cap"]
-        ok, frame = cap.read()
+def list_cameras():
+    return manager.list() if manager is not None else list_camera_streams()
 
-        if not ok:
-            # small sleep to avoid tight loop on failures
-            import time
-            time.sleep(0.1)
-            continue
 
-        # process frame with YOLO
-        try:
-            frame, _, _ = process_frame(frame)
-        except Exception:
-            # if processing fails, keep original frame
-            pass
+if COORDINATOR:
+    start_heartbeat(COORDINATOR, NODE_URL, list_cameras)
 
-        camera_streams[camera_id]["frame"] = frame
 
-    # cleanup
-    try:
-        camera_streams[camera_id]["cap"].release()
-    except Exception:
-        pass
-    camera_streams[camera_id]["running"] = False
+def camera_running(camera_id):
+    camera_id = str(camera_id)
+    if manager is not None:
+        return manager.is_running(camera_id)
+    cam = camera_streams.get(camera_id)
+    return bool(cam and cam["running"])
 
 
-def stop_camera_stream(camera_id):
+def latest_camera_frame(camera_id, newer_than=0):
+    """
+    (seq, frame, meta) of the newest analyzed frame, or None. The frame is
+    clean and shared: draw meta["detections"] on a copy, never on it.
+    A seq below newer_than means the camera was restarted (seqs begin
+    again at 1), so that frame counts as new.
+    """
     camera_id = str(camera_id)
-    with streams_lock:
-        if camera_id in camera_streams:
-            camera_streams[camera_id]["running"] = False
-            try:
-                camera_streams[camera_id]["cap"].release()
-            except Exception:
-                pass
-            # optionally remove the dict entry
-            camera_streams.pop(camera_id, None)
-            return True
-    return False
+    if manager is not None:
+        return manager.read_frame(camera_id, newer_than)
+
+    cam = camera_streams.get(camera_id)
+    if not cam or cam["frame"] is None or cam["seq"] == newer_than:
+        return None
+    return cam["seq"], cam["frame"], {
+        "label": cam["label"],
+        "severity": cam["severity"],
+        "detections": cam["detections"],
+    }
+
+
+def latest_camera_meta(camera_id, newer_than=0):
+    """(seq, meta) of the newest analyzed frame without touching pixels, or None (seqs as above)."""
+    camera_id = str(camera_id)
+    if manager is not None:
+        return manager.read_meta(camera_id, newer_than)
+
+    cam = camera_streams.get(camera_id)
+    if not cam or cam["seq"] in (0, newer_than):
+        return None
+    return cam["seq"], {
+        "label": cam["label"],
+        "severity": cam["severity"],
+        "detections": cam["detections"],
+    }
+
 
+def encode_for_client(frame, scale, profile, detections=None):
+    # an explicit ?scale= is per-client; profiles are the shareable path
+    if scale < 1.0:
+        return encode_scaled(frame, scale, detections)
+    return encode_for_profile(frame, profile, detections)
 
-def generate_camera_stream(camera_id):
+
+def generate_camera_stream(camera_id, fps, scale, profile, overlay):
     camera_id = str(camera_id)
+    pacer = ClientPacer(fps)
+
+    add_viewer(camera_id, 1)
+    try:
+        yield from _camera_stream_loop(camera_id, pacer, scale, profile, overlay)
+    finally:
+        add_viewer(camera_id, -1)
+
+
+def _camera_stream_loop(camera_id, pacer, scale, profile, overlay):
+    last_seq = 0
+    last_check = time.time()
 
     # keep serving frames while running
     while True:
-        cam = camera_streams.get(camera_id)
-        if not cam or not cam.get("running"):
-            break
-
-        frame = cam.get("frame")
-        if frame is None:
+        pacer.wait()
+
+        # always the newest frame: whatever arrived while we were blocked is skipped
+        latest = latest_camera_frame(camera_id, last_seq)
+        if latest is None:
+            # only ask "still running?" once a second; in manager mode it is a socket call
+            if time.time() - last_check > 1.0:
+                if not camera_running(camera_id):
+                    break
+                last_check = time.time()
             # small sleep to avoid busy loop
-            import time
             time.sleep(0.02)
             continue
 
-        ok, buffer = cv2.imencode(".jpg", frame)
-        if not ok:
+        last_seq, frame, meta = latest
+        pacer.sent()
+
+        # overlay is drawn here, only because someone is watching
+        detections = meta.get("detections") if overlay else None
+        if scale < 1.0:
+            jpeg = encode_scaled(frame, scale, detections)
+        else:
+            # encoded once per frame and profile, shared by all viewers
+            jpeg = shared_jpeg(camera_id, last_seq, frame, profile, detections, meta.get("ring_id"))
+        if jpeg is None or not bandwidth.try_consume(len(jpeg)):
             continue
 
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" +
-            buffer.tobytes() +
-            b"\r\n"
-        )
+        yield mjpeg_part(jpeg, (meta.get("detections") or {}).get("timestamp"))
 
 # ============================================================
 # API: START CAMERA (improved: supports single camera id 0 and multi-camera id >=1)
@@ -148,7 +220,7 @@ def generate_camera_stream(camera_id):
 @app.route("/api/cameras/start", methods=["POST"])
 def api_start_camera():
     """
-    Expect JSON: { "camera_id": <int_or_string> }
+    Expect JSON: { "camera_id": <int_or_string>, "tiles": "2x2" (optional) }
     If camera_id == 0 -> start single global webcam (existing behavior)
     Else -> start per-camera stream using start_camera_stream(camera_id)
     """
@@ -157,6 +229,16 @@ def api_start_camera():
     data = request.get_json(force=True) or {}
     cam_id_raw = data.get("camera_id", 0)
 
+    # camera manager owns every camera, including the local webcam
+    if manager is not None:
+        res = manager.start(cam_id_raw, wait=START_WAIT, tiles=data.get("tiles"))
+        if res.get("invalid"):
+            return jsonify({"ok": False, "error": "Invalid tiles, expected e.g. \"2x2\""}), 400
+        if not res.get("ok"):
+            return jsonify({"ok": False, "error": res.get("error", "Failed to open camera stream")}), 500
+        return jsonify({"ok": True, "camera_id": cam_id_raw, "state": res.get("state")}), \
+            202 if res.get("state") == OPENING else 200
+
     # try to parse integer camera id if possible
     try:
         cam_int = int(cam_id_raw)
@@ -183,10 +265,19 @@ def api_start_camera():
 
     # Otherwise use multi-camera system (works for numeric other indexes or RTSP strings)
     else:
-        success = start_camera_stream(cam_id_raw)
-        if not success:
-            return jsonify({"ok": False, "error": "Failed to open camera stream"}), 500
-        return jsonify({"ok": True, "camera_id": cam_id_raw})
+        try:
+            start_camera_stream(cam_id_raw, tiles=data.get("tiles"))
+        except ValueError:
+            return jsonify({"ok": False, "error": "Invalid tiles, expected e.g. \"2x2\""}), 400
+
+        # wait briefly without holding streams_lock; slow cameras answer 202
+        state = wait_camera_open(cam_id_raw, START_WAIT)
+        if state == FAILED:
+            error = camera_streams.get(str(cam_id_raw), {}).get("error")
+            return jsonify({"ok": False, "error": error or "Failed to open camera stream"}), 500
+        if state == OPENING:
+            return jsonify({"ok": True, "camera_id": cam_id_raw, "state": OPENING}), 202
+        return jsonify({"ok": True, "camera_id": cam_id_raw, "state": state})
 
 
 # ============================================================
@@ -204,6 +295,11 @@ def api_stop_camera():
     data = request.get_json(silent=True) or {}
     cam_id_raw = data.get("camera_id", None)
 
+    if manager is not None:
+        res = manager.stop(0 if cam_id_raw is None else cam_id_raw)
+        forget_camera(str(0 if cam_id_raw is None else cam_id_raw))
+        return jsonify({"ok": res.get("ok", False), "stopped": res.get("stopped")})
+
     # if camera_id not provided -> stop single global camera
     if cam_id_raw is None:
         # stop global camera
@@ -234,37 +330,45 @@ def api_stop_camera():
         return jsonify({"ok": True, "stopped": "global"})
     else:
         stopped = stop_camera_stream(cam_id_raw)
+        forget_camera(str(cam_id_raw))
         return jsonify({"ok": stopped, "stopped": cam_id_raw if stopped else None})
 
 
 # ============================================================
 # SINGLE CAMERA STREAM generator (existing behavior)
 # ============================================================
-def generate_frames():
+def generate_frames(fps, scale, profile, overlay):
     global streaming, camera
+    pacer = ClientPacer(fps)
 
     while streaming:
         if camera is None:
             break
 
+        # not this client's turn yet: drop the frame without decoding or analyzing it
+        if not pacer.due():
+            if not camera.grab():
+                time.sleep(0.05)
+            continue
+
         ok, frame = camera.read()
         if not ok:
             # small sleep to avoid busy loop on errors
-            import time
             time.sleep(0.05)
             continue
+        pacer.sent()
 
+        result = None
         try:
-            frame, _, _ = process_frame(frame)
+            result = analyze_frame(frame)
         except Exception:
             pass
 
-        ok, buffer = cv2.imencode(".jpg", frame)
-        if not ok:
+        jpeg = encode_for_client(frame, scale, profile, result if overlay else None)
+        if jpeg is None or not bandwidth.try_consume(len(jpeg)):
             continue
 
-        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' +
-               buffer.tobytes() + b'\r\n')
+        yield mjpeg_part(jpeg)
 
     if camera:
         try:
@@ -273,6 +377,40 @@ def generate_frames():
             pass
 
 
+def stream_response(gen):
+    return Response(LimitedStream(gen), mimetype=MJPEG_MIMETYPE)
+
+
+# ============================================================
+# Route: /video_feed/mosaic - all selected cameras in one stream
+# ?cameras=1,2,3&cols=3&tile=320x180 (defaults: every running camera)
+# ============================================================
+@app.route("/video_feed/mosaic")
+def video_feed_mosaic():
+    running = [cid for cid, cam in list_cameras().items() if cam.get("running")]
+    camera_ids, cols, tile = parse_layout(request.args, running)
+    if not camera_ids:
+        return "No cameras for mosaic", 404
+
+    if not acquire_client_slot():
+        return "Too many stream viewers", 503
+
+    def generate():
+        # every wall client of this layout shares one renderer and one encode per tick
+        m = acquire_mosaic(camera_ids, cols, tile, latest_camera_frame)
+        try:
+            tick = 0
+            while m.running:
+                tick, jpeg = m.wait_next(tick)
+                if jpeg is None or not bandwidth.try_consume(len(jpeg)):
+                    continue
+                yield mjpeg_part(jpeg)
+        finally:
+            release_mosaic(m)
+
+    return stream_response(generate())
+
+
 # ============================================================
 # Route: /video_feed/<camera_id> - serves single or multi-camera generator
 # ============================================================
@@ -283,23 +421,147 @@ def video_feed(camera_id):
     If camera_id matches a running multi-camera stream -> return that stream
     Otherwise return 404
     """
+    if not acquire_client_slot():
+        return "Too many stream viewers", 503
+
+    # the slot belongs to the response; give it back if no stream comes of it
+    try:
+        gen = _open_camera_feed(camera_id, *parse_stream_args(request.args))
+        if gen is not None:
+            return stream_response(gen)
+    except Exception:
+        release_client_slot()
+        raise
+
+    release_client_slot()
+    return "Camera stream not available", 404
+
+
+def _open_camera_feed(camera_id, fps, scale, profile, overlay):
+    """Stream generator for a camera, starting it on demand; None if it cannot open."""
     # if numeric and equals 0 -> single camera
     try:
-        if int(camera_id) == 0:
-            return Response(generate_frames(), mimetype="multipart/x-mixed-replace; boundary=frame")
+        if int(camera_id) == 0 and manager is None:
+            return generate_frames(fps, scale, profile, overlay)
     except Exception:
         pass
 
     # if multi-camera stream exists, return generator
-    if camera_id in camera_streams and camera_streams[camera_id]["running"]:
-        return Response(generate_camera_stream(camera_id), mimetype="multipart/x-mixed-replace; boundary=frame")
+    if camera_running(camera_id):
+        return generate_camera_stream(camera_id, fps, scale, profile, overlay)
 
-    # If not running, try to start it on demand
-    started = start_camera_stream(camera_id)
+    # If not running, try to start it on demand; a camera that is still
+    # opening after START_WAIT gets the stream, one that failed a 404
+    if manager is not None:
+        started = manager.start(camera_id, wait=START_WAIT).get("ok", False)
+    else:
+        start_camera_stream(camera_id)
+        started = wait_camera_open(camera_id, START_WAIT) != FAILED
     if started:
-        return Response(generate_camera_stream(camera_id), mimetype="multipart/x-mixed-replace; boundary=frame")
+        return generate_camera_stream(camera_id, fps, scale, profile, overlay)
+    return None
 
-    return "Camera stream not available", 404
+
+# ============================================================
+# SINGLE SNAPSHOT (clean by default, ?overlay=1 to annotate)
+# ============================================================
+@app.route("/api/cameras/<camera_id>/snapshot")
+def camera_snapshot(camera_id):
+    latest = latest_camera_frame(camera_id)
+    if latest is None:
+        return jsonify({"ok": False, "error": "No frame available"}), 404
+
+    _, frame, meta = latest
+    _, scale, profile, _ = parse_stream_args(request.args)
+    overlay = request.args.get("overlay", "0").lower() in ("1", "true", "yes")
+
+    jpeg = encode_for_client(frame, scale, profile, meta.get("detections") if overlay else None)
+    if jpeg is None:
+        return jsonify({"ok": False, "error": "Encode failed"}), 500
+    return Response(jpeg, mimetype="image/jpeg")
+
+
+# ============================================================
+# REGION OF INTEREST / EXCLUSION MASKS
+# ------------------------------------------------------------
+# PUT {"roi": [[x, y], ...], "masks": [[[x, y], ...], ...]} with points
+# as fractions of the frame (0..1); DELETE clears. Persisted.
+# ============================================================
+@app.route("/api/cameras/<camera_id>/roi", methods=["GET", "PUT", "DELETE"])
+def camera_roi(camera_id):
+    config = request.get_json(force=True, silent=True) if request.method == "PUT" else None
+
+    if manager is not None:
+        if request.method == "GET":
+            res = manager.get_roi(camera_id)
+        else:
+            res = manager.set_roi(camera_id, config)
+        if not res.get("ok"):
+            return jsonify(res), 400 if res.get("invalid") else 500
+        return jsonify({"ok": True, "camera_id": camera_id, **res["roi"]})
+
+    if request.method == "GET":
+        roi = get_camera_roi(camera_id)
+        return jsonify({"ok": True, "camera_id": camera_id,
+                        **(roi.to_dict() if roi else {"roi": None, "masks": []})})
+
+    try:
+        saved = set_camera_roi(camera_id, config)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, "camera_id": camera_id, **saved})
+
+
+# ============================================================
+# DETECTIONS-ONLY METADATA STREAM (Server-Sent Events)
+# ------------------------------------------------------------
+# Boxes, classes, confidences, final_label, severity and timestamp as
+# compact JSON per analyzed frame, for clients that draw their own
+# overlays and for headless PLC/BMS bridges. No pixels are touched.
+# ============================================================
+@app.route("/api/cameras/<camera_id>/detections")
+def camera_detections_stream(camera_id):
+    if not camera_running(camera_id):
+        return jsonify({"ok": False, "error": "Camera not running"}), 404
+
+    if not acquire_client_slot():
+        return "Too many stream viewers", 503
+    fps, _, _, _ = parse_stream_args(request.args)
+
+    def generate():
+        pacer = ClientPacer(fps)
+        last_seq = 0
+        last_check = time.time()
+
+        while True:
+            pacer.wait()
+
+            latest = latest_camera_meta(camera_id, last_seq)
+            if latest is None:
+                if time.time() - last_check > 1.0:
+                    if not camera_running(camera_id):
+                        break
+                    last_check = time.time()
+                time.sleep(0.02)
+                continue
+
+            last_seq, meta = latest
+            pacer.sent()
+
+            det = meta.get("detections") or {}
+            payload = {
+                "camera_id": camera_id,
+                "seq": last_seq,
+                "timestamp": det.get("timestamp"),
+                "final_label": meta.get("label"),
+                "severity": meta.get("severity"),
+                "frame_size": det.get("frame_size"),
+                "boxes": det.get("boxes", []),   # [x1, y1, x2, y2, class, conf]
+            }
+            yield f"data: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+    return Response(LimitedStream(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache"})
 
 
 # ============================================================
@@ -312,33 +574,45 @@ def video_stream(filename):
     if not os.path.exists(video_path):
         return "Video not found", 404
 
+    if not acquire_client_slot():
+        return "Too many stream viewers", 503
+    fps, scale, profile, overlay = parse_stream_args(request.args)
+
     def generate():
         cap = cv2.VideoCapture(video_path)
+        pacer = ClientPacer(fps)
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        # play at the source's speed, analyzing only the frames this client gets;
+        # the rest are skipped undecoded (long strides by seeking)
+        src_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        stride = max(1, round(src_fps / fps))
 
-            try:
-                frame, _, _ = process_frame(frame)
-            except Exception:
-                pass
+        try:
+            while True:
+                if not advance(cap, stride - 1, seekable=True):
+                    return
 
-            ok, buffer = cv2.imencode(".jpg", frame)
-            if not ok:
-                continue
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                result = None
+                try:
+                    result = analyze_frame(frame)
+                except Exception:
+                    pass
 
-            yield (
-                b"--frame\r\n"
-                b"Content-Type: image/jpeg\r\n\r\n" +
-                buffer.tobytes() +
-                b"\r\n"
-            )
+                jpeg = encode_for_client(frame, scale, profile, result if overlay else None)
+                pacer.wait()
+                pacer.sent()
+                if jpeg is None or not bandwidth.try_consume(len(jpeg)):
+                    continue
 
-        cap.release()
+                yield mjpeg_part(jpeg)
+        finally:
+            cap.release()
 
-    return Response(generate(), mimetype="multipart/x-mixed-replace; boundary=frame")
+    return stream_response(generate())
 
 
 # ============================================================
@@ -346,18 +620,61 @@ def video_stream(filename):
 # ============================================================
 @app.route("/process_video", methods=["POST"])
 def process_video():
+    """
+    Form field "video". With mode=triage the upload is also scanned in
+    the background (optional sample_seconds / refine_seconds); poll
+    triage_url for the timeline of suspect segments.
+    """
     file = request.files.get("video")
     if not file:
         return jsonify({"ok": False, "error": "No file uploaded"}), 400
 
+    triage = request.form.get("mode") == "triage"
+    options = {}
+    try:
+        for key in ("sample_seconds", "refine_seconds"):
+            if triage and request.form.get(key):
+                options[key] = float(request.form[key])
+    except ValueError:
+        return jsonify({"ok": False, "error": "sample_seconds / refine_seconds must be numbers"}), 400
+    if any(v <= 0 for v in options.values()):
+        return jsonify({"ok": False, "error": "sample_seconds / refine_seconds must be positive"}), 400
+
     filename = file.filename
     save_path = os.path.join(UPLOAD_DIR, filename)
     file.save(save_path)
 
-    return jsonify({
+    response = {
         "ok": True,
         "stream_url": f"/video_stream/{filename}"
-    })
+    }
+    if triage:
+        job_id = triage_jobs.submit(save_path, **options)
+        response["triage_url"] = f"/api/triage/{job_id}"
+
+    return jsonify(response)
+
+
+# ============================================================
+# TRIAGE RESULTS (see triage.py)
+# ============================================================
+triage_jobs = TriageJobs(detect_batch)
+
+
+@app.route("/api/triage/<job_id>")
+def api_triage(job_id):
+    job = triage_jobs.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Unknown triage job"}), 404
+
+    # job is a shallow copy: build the URLs on copies, not the stored timeline
+    timeline = job["timeline"]
+    if timeline:
+        job["timeline"] = dict(timeline, segments=[
+            dict(seg, thumbnail_url=f"/static/triage/{job_id}/{seg['thumbnail']}") if seg["thumbnail"] else seg
+            for seg in timeline["segments"]
+        ])
+    return jsonify({"ok": True, "job_id": job_id, **job})
 
 
 # ============================================================
@@ -365,7 +682,7 @@ def process_video():
 # ============================================================
 @app.route("/api/events")
 def api_events():
-    conn = sqlite3.connect("alerts.db")
+    conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     rows = conn.cursor().execute("SELECT * FROM alerts ORDER BY id DESC").fetchall()
     conn.close()
@@ -384,7 +701,7 @@ def api_delete_logs():
     if not ids:
         return jsonify({"ok": False, "error": "No IDs provided"}), 400
 
-    conn = sqlite3.connect("alerts.db")
+    conn = sqlite3.connect(DB_PATH)
     conn.executemany("DELETE FROM alerts WHERE id = ?", [(i,) for i in ids])
     conn.commit()
     conn.close()
@@ -397,7 +714,7 @@ def api_delete_logs():
 # ============================================================
 @app.route("/api/events/delete_all", methods=["POST"])
 def api_delete_all_logs():
-    conn = sqlite3.connect("alerts.db")
+    conn = sqlite3.connect(DB_PATH)
     conn.execute("DELETE FROM alerts")
     conn.commit()
     conn.close()
@@ -411,7 +728,7 @@ def api_delete_all_logs():
 @app.route("/api/dashboard")
 def api_dashboard():
     try:
-        conn = sqlite3.connect("alerts.db")
+        conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
 
         # Label counts
@@ -461,12 +778,110 @@ def api_dashboard():
 @app.route("/api/alarm/stop", methods=["POST"])
 def api_stop_alarm():
     try:
-        stop_alarm_manual()
+        if manager is not None:
+            manager.alarm_stop()
+        else:
+            stop_alarm_manual()
         return jsonify({"ok": True, "message": "Alarm stopped manually"})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+# ============================================================
+# TEMPORAL VERIFIER METRICS (latency, confirmed / suppressed alerts)
+# ============================================================
+@app.route("/api/verifier")
+def api_verifier():
+    if manager is not None:
+        return jsonify(manager.call("verifier_stats"))
+    return jsonify({"ok": True, **verifier_stats()})
+
+
+# ============================================================
+# ADMIN: ON-DEMAND PROFILER (see profiler.py)
+# ------------------------------------------------------------
+# POST {"mode": "cpu"|"memory", "seconds": 10, "interval": 0.01}
+# starts a bounded run where the cameras live (this process, or the
+# camera manager); GET shows progress and result files, which are
+# downloaded from /api/admin/profile/<file>. With FIREGUARD_ADMIN_TOKEN
+# set, requests need a matching X-Admin-Token header; without it only
+# loopback clients get in (a local reverse proxy counts as loopback, so
+# set a token when serving through one).
+# ============================================================
+ADMIN_TOKEN = os.environ.get("FIREGUARD_ADMIN_TOKEN")
+LOOPBACK_ADDRS = ("127.0.0.1", "::1")
+
+
+def admin_allowed():
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+    return request.remote_addr in LOOPBACK_ADDRS
+
+
+@app.route("/api/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    if not admin_allowed():
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+
+    if request.method == "GET":
+        return jsonify(manager.profile_status() if manager is not None
+                       else {"ok": True, **profiler.status()})
+
+    data = request.get_json(silent=True) or {}
+    mode, seconds, interval = data.get("mode", "cpu"), data.get("seconds", 10), data.get("interval", 0.01)
+    if manager is not None:
+        res = manager.profile_start(mode, seconds, interval)
+    else:
+        try:
+            res = {"ok": True, "profile": profiler.start(mode, seconds, interval)}
+        except ValueError as e:
+            res = {"ok": False, "invalid": True, "error": str(e)}
+        except RuntimeError as e:
+            res = {"ok": False, "busy": True, "error": str(e)}
+
+    if not res.get("ok"):
+        return jsonify(res), 400 if res.get("invalid") else 409 if res.get("busy") else 500
+    return jsonify(res), 202
+
+
+@app.route("/api/admin/profile/<path:filename>")
+def admin_profile_file(filename):
+    if not admin_allowed():
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+    path = profiler.path(filename)
+    if path is None:
+        return jsonify({"ok": False, "error": "Unknown profile file"}), 404
+    return send_file(path, as_attachment=True)
+
+
+# ============================================================
+# API: LIST CAMERAS (state, seq, analyzed fps, inference time)
+# ============================================================
+@app.route("/api/cameras")
+def api_list_cameras():
+    return jsonify({"ok": True, "cameras": list_cameras()})
+
+
+# ============================================================
+# API: CAMERA HEALTH
+# ------------------------------------------------------------
+# capture / analyzed fps, frame age, read failures, inference latency
+# percentiles, watchdog restarts (camera_streams.camera_health) and
+# MJPEG viewers. In manager mode viewers are spread over the web
+# workers; each reports its counts every VIEWER_REPORT_INTERVAL and the
+# manager adds them up ("viewers": null until a worker has reported).
+# ============================================================
+@app.route("/api/cameras/status")
+def api_cameras_status():
+    if manager is not None:
+        return jsonify({"ok": True, "cameras": manager.health()})
+
+    cameras = camera_health()
+    for cid, health in cameras.items():
+        health["viewers"] = viewer_counts.get(cid, 0)
+    return jsonify({"ok": True, "cameras": cameras})
+
+
 # ============================================================
 # SERVE FILES
 # ============================================================
@@ -485,6 +900,16 @@ def serve_snapshots(filename):
     return send_from_directory(SNAPSHOT_DIR, filename)
 
 
+@app.route("/static/clips/<path:filename>")
+def serve_clips(filename):
+    return send_from_directory(CLIP_DIR, filename)
+
+
+@app.route("/static/triage/<path:filename>")
+def serve_triage(filename):
+    return send_from_directory(os.path.abspath(TRIAGE_DIR), filename)
+
+
 # ============================================================
 # ROOT
 # ============================================================
@@ -497,4 +922,5 @@ def home():
 # RUN
 # ============================================================
 if __name__ == "__main__":
-    app.run(debug=True)
+    # the reloader's watcher process would send a second, empty heartbeat
+    app.run(debug=True, port=PORT, threaded=True, use_reloader=not COORDINATOR)
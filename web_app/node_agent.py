@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+
+import requests
+
+# ============================================================
+# INFERENCE NODE AGENT
+# ------------------------------------------------------------
+# Runs inside newapp.py when FIREGUARD_COORDINATOR is set and reports
+# this node's measured capacity to coordinator.py every few seconds.
+# ============================================================
+
+HEARTBEAT_INTERVAL = 2.0
+# used until the node has analyzed frames and can measure itself
+DEFAULT_CAPACITY_FPS = float(os.environ.get("FIREGUARD_NODE_CAPACITY_FPS", 30))
+
+
+def measure_capacity(cameras):
+    """
+    Estimate (capacity_fps, load_fps) from per-camera stats.
+
+    Capacity is how many frames/s this node could analyze back to back at
+    the current mean inference latency; load is what it analyzes now.
+    """
+    load = sum(c.get("fps", 0.0) for c in cameras.values())
+    latencies = [c["infer_ms"] for c in cameras.values() if c.get("infer_ms")]
+
+    if not latencies:
+        return DEFAULT_CAPACITY_FPS, load
+
+    mean_ms = sum(latencies) / len(latencies)
+    return 1000.0 / mean_ms, load
+
+
+def heartbeat_loop(coordinator_url, node_url, list_cameras):
+    node_id = node_url
+    while True:
+        try:
+            cameras = list_cameras()
+            capacity, load = measure_capacity(cameras)
+            requests.post(f"{coordinator_url}/api/nodes/heartbeat", json={
+                "node_id": node_id,
+                "url": node_url,
+                "capacity_fps": round(capacity, 2),
+                "load_fps": round(load, 2),
+                "cameras": sorted(cid for cid, c in cameras.items() if c.get("running")),
+            }, timeout=HEARTBEAT_INTERVAL)
+        except Exception as e:
+            print(f"⚠️ Heartbeat to coordinator failed: {e}")
+
+        time.sleep(HEARTBEAT_INTERVAL)
+
+
+def start_heartbeat(coordinator_url, node_url, list_cameras):
+    th = threading.Thread(
+        target=heartbeat_loop,
+        args=(coordinator_url.rstrip("/"), node_url.rstrip("/"), list_cameras),
+        daemon=True
+    )
+    th.start()
+    return th
@@ -0,0 +1,205 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+import psutil
+
+# ============================================================
+# ON-DEMAND PROFILER
+# ------------------------------------------------------------
+# Attaches to a running node for a bounded time, then detaches; while
+# no run is active nothing is hooked and no thread exists.
+#
+#   cpu     samples every thread's stack (sys._current_frames) every
+#           `interval` seconds -> <run>.folded, one "thread;frame;...
+#           count" line per stack (flamegraph.pl / speedscope), plus
+#           <run>.json with per-thread CPU time (psutil), keyed by
+#           camera id for capture threads ("camera-<id>")
+#   memory  tracemalloc for the duration -> <run>.tracemalloc
+#           (tracemalloc.Snapshot.load) and the top allocation sites
+#           in <run>.json
+#
+# Only the newest FIREGUARD_PROFILE_KEEP runs (default 20) are kept;
+# older runs' files are deleted when a run finishes.
+#
+# Driven by /api/admin/profile in newapp.py, or by the camera manager's
+# profile_* commands when the cameras live there.
+# ============================================================
+
+PROFILE_DIR = os.environ.get("FIREGUARD_PROFILE_DIR", "profiles")
+MAX_PROFILE_SECONDS = 300
+MAX_PROFILE_RUNS = max(1, int(os.environ.get("FIREGUARD_PROFILE_KEEP", "20")))
+DEFAULT_INTERVAL = 0.01
+MAX_STACK_DEPTH = 64
+TOP_ALLOCATIONS = 50
+
+CAMERA_THREAD_PREFIX = "camera-"
+
+os.makedirs(PROFILE_DIR, exist_ok=True)
+
+
+def thread_cpu_seconds():
+    """{thread name: user+system CPU seconds} for this process's Python threads."""
+    names = {th.native_id: th.name for th in threading.enumerate()}
+    return {
+        names[t.id]: t.user_time + t.system_time
+        for t in psutil.Process().threads()
+        if t.id in names
+    }
+
+
+def _stack(frame):
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """One run at a time; start() returns at once and the run stops itself."""
+
+    def __init__(self, out_dir=PROFILE_DIR):
+        self.out_dir = out_dir
+        self.lock = threading.Lock()
+        self.run = None
+        self.last = None
+
+    def start(self, mode="cpu", seconds=10.0, interval=DEFAULT_INTERVAL):
+        """Raises ValueError on bad arguments and RuntimeError if a run is active."""
+        if mode not in ("cpu", "memory"):
+            raise ValueError("mode must be 'cpu' or 'memory'")
+        seconds, interval = float(seconds), float(interval)
+        if not 0 < seconds <= MAX_PROFILE_SECONDS:
+            raise ValueError(f"seconds must be in (0, {MAX_PROFILE_SECONDS}]")
+        if not 0.001 <= interval <= 1.0:
+            raise ValueError("interval must be in [0.001, 1]")
+
+        with self.lock:
+            if self.run is not None:
+                raise RuntimeError("a profile is already running")
+            name = time.strftime("%Y%m%d-%H%M%S") + f"-{mode}"
+            self.run = {"name": name, "mode": mode, "started": time.time(),
+                        "ends": time.time() + seconds, "interval": interval}
+
+        threading.Thread(target=self._execute, args=(self.run,), name="profiler", daemon=True).start()
+        return dict(self.run)
+
+    def status(self):
+        with self.lock:
+            return {"running": self.run is not None, "current": dict(self.run) if self.run else None,
+                    "last": self.last, "files": self.files()}
+
+    def files(self):
+        return sorted(os.listdir(self.out_dir), reverse=True)
+
+    def path(self, filename):
+        """Absolute path of a result file, or None (also for anything outside out_dir)."""
+        path = os.path.abspath(os.path.join(self.out_dir, filename))
+        if os.path.dirname(path) != os.path.abspath(self.out_dir) or not os.path.isfile(path):
+            return None
+        return path
+
+    # ---------------------------------
+    # runs
+    # ---------------------------------
+    def _execute(self, run):
+        try:
+            summary = self._sample(run) if run["mode"] == "cpu" else self._trace_memory(run)
+            with open(os.path.join(self.out_dir, run["name"] + ".json"), "w") as f:
+                json.dump(summary, f, indent=2)
+            print(f"🩺 Profile {run['name']} written to {self.out_dir}")
+        except Exception as e:
+            summary = {"mode": run["mode"], "error": str(e)}
+            print(f"⚠️ Profile {run['name']} failed: {e}")
+        with self.lock:
+            self.last = dict(summary, name=run["name"])
+            self.run = None
+        self._prune()
+
+    def _prune(self):
+        # run names start with a timestamp, so they sort oldest first
+        runs = {}
+        for filename in os.listdir(self.out_dir):
+            runs.setdefault(filename.split(".", 1)[0], []).append(filename)
+        for name in sorted(runs)[:-MAX_PROFILE_RUNS]:
+            for filename in runs[name]:
+                try:
+                    os.remove(os.path.join(self.out_dir, filename))
+                except OSError:
+                    pass
+
+    def _sample(self, run):
+        me = threading.get_ident()
+        names = {}
+        stacks = Counter()
+        per_thread = Counter()
+        cpu0, t0 = thread_cpu_seconds(), time.time()
+        samples = 0
+
+        while time.time() < run["ends"]:
+            for th in threading.enumerate():
+                names[th.ident] = th.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                name = names.get(ident, str(ident))
+                stacks[f"{name};{_stack(frame)}"] += 1
+                per_thread[name] += 1
+            samples += 1
+            time.sleep(run["interval"])
+
+        elapsed = time.time() - t0
+        cpu1 = thread_cpu_seconds()
+        threads = {}
+        for name in set(cpu1) | set(per_thread):
+            cpu = cpu1.get(name, 0.0) - cpu0.get(name, 0.0)
+            threads[name] = {
+                "camera_id": name[len(CAMERA_THREAD_PREFIX):] if name.startswith(CAMERA_THREAD_PREFIX) else None,
+                "cpu_seconds": round(cpu, 3),
+                "cpu_percent": round(100 * cpu / elapsed, 1) if elapsed else 0.0,
+                "samples": per_thread.get(name, 0),
+            }
+
+        with open(os.path.join(self.out_dir, run["name"] + ".folded"), "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return {
+            "mode": "cpu", "seconds": round(elapsed, 2), "samples": samples,
+            "interval": run["interval"],
+            "threads": dict(sorted(threads.items(), key=lambda kv: -kv[1]["cpu_seconds"])),
+            "files": [run["name"] + ".folded", run["name"] + ".json"],
+        }
+
+    def _trace_memory(self, run):
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(25)
+        t0 = time.time()
+        try:
+            time.sleep(max(0.0, run["ends"] - time.time()))
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+
+        snapshot.dump(os.path.join(self.out_dir, run["name"] + ".tracemalloc"))
+        top = [
+            {"where": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+        ]
+        return {
+            "mode": "memory", "seconds": round(time.time() - t0, 2),
+            "traced_kb": round(current / 1024, 1), "peak_kb": round(peak / 1024, 1),
+            "top": top,
+            "files": [run["name"] + ".tracemalloc", run["name"] + ".json"],
+        }
+
+
+profiler = Profiler()
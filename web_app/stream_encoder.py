@@ -0,0 +1,128 @@
+import threading
+
+import cv2
+
+from detection.overlay import draw_overlay
+
+# optional faster JPEG encoders (libjpeg-turbo bindings)
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+try:
+    from turbojpeg import TurboJPEG
+    turbo = TurboJPEG()
+except Exception:
+    turbo = None
+
+# ============================================================
+# STREAM PROFILES
+# ------------------------------------------------------------
+# Named output sizes for live streams (?profile=). A camera frame is
+# encoded at most once per profile and the JPEG is shared by every
+# viewer of that camera/profile, so a 30-tile wall of thumbnails costs
+# 30 small encodes instead of 30 full-resolution ones per viewer.
+#
+# Overlays are drawn here, at encode time, on the resized output, so a
+# camera nobody watches never pays for drawing and the stored frame
+# stays clean.
+# ============================================================
+
+STREAM_PROFILES = {
+    "thumbnail": {"width": 320, "quality": 60},
+    "preview": {"width": 640, "quality": 75},
+    "full": {"width": None, "quality": 85},
+}
+DEFAULT_PROFILE = "full"
+
+
+def encode_jpeg(frame, quality=85):
+    """BGR frame -> JPEG bytes using the fastest encoder installed."""
+    if simplejpeg is not None:
+        return simplejpeg.encode_jpeg(frame, quality=quality, colorspace="BGR")
+    if turbo is not None:
+        return turbo.encode(frame, quality=quality)
+
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes() if ok else None
+
+
+def resize_to_width(frame, width):
+    h, w = frame.shape[:2]
+    if not width or w <= width:
+        return frame
+    height = max(1, round(h * width / w))
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def _with_overlay(out, src, detections):
+    if not detections:
+        return out
+    if out is src:
+        # full size: never draw on the shared frame
+        out = src.copy()
+    return draw_overlay(out, detections)
+
+
+def encode_for_profile(frame, profile, detections=None):
+    p = STREAM_PROFILES[profile]
+    out = resize_to_width(frame, p["width"])
+    return encode_jpeg(_with_overlay(out, frame, detections), p["quality"])
+
+
+def encode_scaled(frame, scale, detections=None, quality=85):
+    out = frame
+    if scale < 1.0:
+        out = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return encode_jpeg(_with_overlay(out, frame, detections), quality)
+
+
+# ============================================================
+# SHARED ENCODE CACHE
+# ============================================================
+_cache = {}          # {(camera_id, profile, overlay): ((run, seq), jpeg_bytes)}
+_key_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _key_lock(key):
+    with _locks_guard:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def shared_jpeg(camera_id, seq, frame, profile, detections=None, run=None):
+    """
+    JPEG of `frame` (frame number `seq` of `camera_id`) for `profile`,
+    annotated with `detections` if given. The first viewer to ask encodes
+    it; everyone else gets the same bytes. `run` identifies the camera run
+    (the ring_id in manager mode), since seqs start over with each one.
+    """
+    key = (camera_id, profile, detections is not None)
+    frame_id = (run, seq)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == frame_id:
+        return cached[1]
+
+    with _key_lock(key):
+        # another viewer may have encoded it while we waited
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == frame_id:
+            return cached[1]
+
+        jpeg = encode_for_profile(frame, profile, detections)
+        if jpeg is not None:
+            _cache[key] = (frame_id, jpeg)
+        return jpeg
+
+
+def forget_camera(camera_id):
+    # viewer threads insert while we look: iterate over snapshots of the keys
+    with _locks_guard:
+        for key in [k for k in list(_key_locks) if k[0] == camera_id]:
+            _key_locks.pop(key, None)
+    for key in [k for k in list(_cache) if k[0] == camera_id]:
+        _cache.pop(key, None)
@@ -0,0 +1,179 @@
+import math
+import os
+import threading
+import time
+
+from stream_encoder import DEFAULT_PROFILE, STREAM_PROFILES
+
+# ============================================================
+# MJPEG CLIENT PACING
+# ------------------------------------------------------------
+# Every viewer gets at most one frame in flight: the generator only
+# picks the next frame after the previous write returned, and always
+# takes the newest one, so a slow client skips frames instead of
+# queueing them. On top of that each client can ask for a lower rate
+# (?fps=) and size (?profile= or ?scale=), and the whole server is held under
+# MAX_STREAM_BYTES_PER_SEC.
+#
+# The byte and client caps are counted inside each process. Behind a
+# multi-worker WSGI server (camera manager mode) set FIREGUARD_WEB_WORKERS
+# to the worker count: every worker then enforces its share of the
+# server-wide setting, so the workers together stay under it.
+# ============================================================
+
+DEFAULT_STREAM_FPS = float(os.environ.get("FIREGUARD_STREAM_FPS", 15))
+MAX_STREAM_FPS = 30.0
+MIN_STREAM_SCALE = 0.1
+
+WEB_WORKERS = max(1, int(os.environ.get("FIREGUARD_WEB_WORKERS", 1)))
+
+# server-wide settings; 0 = unlimited bandwidth
+MAX_STREAM_BYTES_PER_SEC = int(os.environ.get("FIREGUARD_MAX_STREAM_BPS", 0))
+MAX_STREAM_CLIENTS = int(os.environ.get("FIREGUARD_MAX_STREAM_CLIENTS", 64))
+
+# this worker's share of them
+WORKER_STREAM_BYTES_PER_SEC = max(1, MAX_STREAM_BYTES_PER_SEC // WEB_WORKERS) if MAX_STREAM_BYTES_PER_SEC > 0 else 0
+WORKER_STREAM_CLIENTS = max(1, MAX_STREAM_CLIENTS // WEB_WORKERS)
+
+MJPEG_MIMETYPE = "multipart/x-mixed-replace; boundary=frame"
+
+
+def parse_stream_args(args):
+    """(fps, scale, profile, overlay) from a request's query string, clamped to sane values."""
+    try:
+        fps = float(args.get("fps", DEFAULT_STREAM_FPS))
+    except ValueError:
+        fps = DEFAULT_STREAM_FPS
+    try:
+        scale = float(args.get("scale", 1.0))
+    except ValueError:
+        scale = 1.0
+    # nan would slip through the clamps below (every comparison is false)
+    if not math.isfinite(fps):
+        fps = DEFAULT_STREAM_FPS
+    if not math.isfinite(scale):
+        scale = 1.0
+
+    fps = min(max(fps, 0.1), MAX_STREAM_FPS)
+    scale = min(max(scale, MIN_STREAM_SCALE), 1.0)
+
+    profile = args.get("profile", DEFAULT_PROFILE)
+    if profile not in STREAM_PROFILES:
+        profile = DEFAULT_PROFILE
+
+    # ?overlay=0 -> clean frames, no boxes or severity banners
+    overlay = args.get("overlay", "1").lower() not in ("0", "false", "no")
+    return fps, scale, profile, overlay
+
+
+def mjpeg_part(jpeg_bytes, timestamp=None):
+    # X-Timestamp: when the frame was analyzed, so clients can measure latency
+    stamp = b"X-Timestamp: %.3f\r\n" % timestamp if timestamp else b""
+    return (
+        b"--frame\r\n"
+        b"Content-Type: image/jpeg\r\n" + stamp + b"\r\n" +
+        jpeg_bytes +
+        b"\r\n"
+    )
+
+
+class ClientPacer:
+    """Hands out send slots at a fixed rate without ever bursting to catch up."""
+
+    def __init__(self, fps):
+        self.interval = 1.0 / fps
+        self.next_send = 0.0
+
+    def due(self):
+        return time.monotonic() >= self.next_send
+
+    def wait(self):
+        delay = self.next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def sent(self):
+        # a late client restarts its schedule from now rather than bursting
+        self.next_send = max(self.next_send + self.interval, time.monotonic())
+
+
+class BandwidthLimiter:
+    """Token bucket over this process's outbound stream bytes."""
+
+    def __init__(self, bytes_per_sec, burst_seconds=1.0):
+        self.rate = bytes_per_sec
+        self.capacity = bytes_per_sec * burst_seconds
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_consume(self, n):
+        """True if n bytes may go out now; otherwise the caller drops the frame."""
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < n:
+                return False
+            self.tokens -= n
+            return True
+
+
+bandwidth = BandwidthLimiter(WORKER_STREAM_BYTES_PER_SEC)
+
+active_clients = 0
+clients_lock = threading.Lock()
+
+viewer_counts = {}   # {camera_id: live MJPEG viewers}
+
+
+def add_viewer(camera_id, delta):
+    with clients_lock:
+        n = viewer_counts.get(camera_id, 0) + delta
+        if n > 0:
+            viewer_counts[camera_id] = n
+        else:
+            viewer_counts.pop(camera_id, None)
+
+
+def viewer_snapshot():
+    with clients_lock:
+        return dict(viewer_counts)
+
+
+def acquire_client_slot():
+    global active_clients
+    with clients_lock:
+        if active_clients >= WORKER_STREAM_CLIENTS:
+            return False
+        active_clients += 1
+        return True
+
+
+def release_client_slot():
+    global active_clients
+    with clients_lock:
+        active_clients -= 1
+
+
+class LimitedStream:
+    """
+    Response body that holds one client slot until the server closes it.
+    A plain generator's finally block would never run for a client that
+    disconnects before the first frame.
+    """
+
+    def __init__(self, gen):
+        self.gen = gen
+        self.closed = False
+
+    def __iter__(self):
+        return self.gen
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.gen.close()
+            release_client_slot()
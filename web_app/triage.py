@@ -0,0 +1,325 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+
+import cv2
+
+from detection.overlay import draw_boxes
+from frame_skip import advance
+from stream_encoder import encode_jpeg, resize_to_width
+
+# ============================================================
+# TRIAGE SCAN FOR UPLOADED VIDEOS
+# ------------------------------------------------------------
+# Answers "where in this recording is there smoke or fire?" without
+# analyzing every frame:
+#   1. coarse: one frame every SAMPLE_SECONDS (seeking past the rest),
+#      detected in batches of BATCH_SIZE
+#   2. refine: around every coarse hit (one sample period either side),
+#      one frame every REFINE_SECONDS
+#   3. hits closer than MERGE_SECONDS become one suspect segment, with
+#      a thumbnail of its most confident frame
+# Videos without a frame count are never seeked: each stage reopens the
+# file and grabs forward instead.
+# At the defaults a one-hour video is ~720 coarse samples plus the
+# refined windows.
+#
+# Jobs run one at a time in a background thread; results land in
+# static/triage/<job id>/ (timeline.json + thumbnails), next to a
+# status.json that lets any worker process answer for the job.
+# ============================================================
+
+TRIAGE_DIR = "static/triage"
+os.makedirs(TRIAGE_DIR, exist_ok=True)
+
+SAMPLE_SECONDS = float(os.environ.get("FIREGUARD_TRIAGE_SAMPLE_SECONDS", 5))
+REFINE_SECONDS = float(os.environ.get("FIREGUARD_TRIAGE_REFINE_SECONDS", 0.5))
+BATCH_SIZE = int(os.environ.get("FIREGUARD_TRIAGE_BATCH", 8))
+MERGE_SECONDS = 2 * REFINE_SECONDS
+THUMB_WIDTH = 320
+THUMB_QUALITY = 75
+
+TRIAGE_LABELS = ("fire", "smoke")
+JOB_ID_RE = re.compile(r"[0-9a-f]{12}")
+
+
+def _hit(boxes):
+    """(label, best confidence) of a frame's boxes, or None."""
+    found = [b for b in boxes if b[4] in TRIAGE_LABELS]
+    if not found:
+        return None
+    label = "fire" if any(b[4] == "fire" for b in found) else "smoke"
+    return label, max(b[5] for b in found)
+
+
+def _detect_hits(frames, detect_batch, batch_size=BATCH_SIZE):
+    """[(frame index, boxes)] for the (index, frame) pairs with fire or smoke, detected in batches."""
+    hits = []
+    pending = []
+
+    def flush():
+        if not pending:
+            return
+        for (index, _), boxes in zip(pending, detect_batch([f for _, f in pending])):
+            if _hit(boxes):
+                hits.append((index, boxes))
+        pending.clear()
+
+    for item in frames:
+        pending.append(item)
+        if len(pending) >= batch_size:
+            flush()
+    flush()
+    return hits
+
+
+def scan(cap, start_frame, end_frame, stride, detect_batch, batch_size=BATCH_SIZE, seekable=True):
+    """
+    Detect every `stride`-th frame in [start_frame, end_frame), or up to
+    the end of the video if end_frame is None. Returns ([(frame index,
+    boxes)] for the frames with fire or smoke, index of the last frame read
+    or None). Without seeking, cap must already be at start_frame.
+    """
+    last = None
+
+    def frames():
+        nonlocal last
+        if seekable:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        index = start_frame
+        while end_frame is None or index < end_frame:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            last = index
+            yield index, frame
+            if not advance(cap, stride - 1, seekable=seekable):
+                break
+            index += stride
+
+    return _detect_hits(frames(), detect_batch, batch_size), last
+
+
+def _frames_at(cap, indices, seekable=True):
+    """
+    Yield (index, frame) for the sorted frame indices. Without seeking,
+    cap must be at frame 0 and is grabbed forward from there.
+    """
+    pos = 0
+    for index in indices:
+        if seekable:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        elif not advance(cap, index - pos):
+            return
+        ok, frame = cap.read()
+        if not ok:
+            if seekable:
+                continue
+            return
+        pos = index + 1
+        yield index, frame
+
+
+def _reopen(cap, path):
+    cap.release()
+    return cv2.VideoCapture(path)
+
+
+def _windows(hit_frames, radius, total):
+    """Merged [start, end) frame ranges of +-radius around each hit."""
+    out = []
+    for index in sorted(hit_frames):
+        start, end = max(0, index - radius), min(total, index + radius + 1)
+        if out and start <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], end)
+        else:
+            out.append([start, end])
+    return out
+
+
+def _segments(hits, merge_frames):
+    segments = []
+    for index, boxes in sorted(hits, key=lambda h: h[0]):
+        label, conf = _hit(boxes)
+        seg = segments[-1] if segments else None
+        if seg is None or index - seg["end_frame"] > merge_frames:
+            seg = {"start_frame": index, "end_frame": index, "label": label,
+                   "max_conf": conf, "best_frame": index, "best_boxes": boxes, "hits": 0}
+            segments.append(seg)
+        seg["end_frame"] = index
+        seg["hits"] += 1
+        if label == "fire":
+            seg["label"] = "fire"
+        if conf > seg["max_conf"]:
+            seg["max_conf"], seg["best_frame"], seg["best_boxes"] = conf, index, boxes
+    return segments
+
+
+def _thumbnail(frame, boxes, path):
+    small = resize_to_width(frame, THUMB_WIDTH).copy()
+    draw_boxes(small, boxes, small.shape[1] / frame.shape[1])
+    jpeg = encode_jpeg(small, THUMB_QUALITY)
+    if jpeg is None:
+        return False
+    with open(path, "wb") as f:
+        f.write(jpeg)
+    return True
+
+
+def triage_video(path, detect_batch, out_dir, sample_seconds=SAMPLE_SECONDS,
+                 refine_seconds=REFINE_SECONDS, batch_size=BATCH_SIZE):
+    """Coarse scan, refine around hits, and return the timeline (also saved as timeline.json)."""
+    t0 = time.perf_counter()
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"cannot open {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    coarse_stride = max(1, round(sample_seconds * fps))
+    refine_stride = max(1, round(refine_seconds * fps))
+
+    seekable = total > 0
+    try:
+        if seekable:
+            coarse, last = scan(cap, 0, total, coarse_stride, detect_batch, batch_size)
+        else:
+            # no usable frame count (streamed webm/mkv, broken index): seeking
+            # cannot be trusted either, so grab through to the end and count
+            coarse, last = scan(cap, 0, None, coarse_stride, detect_batch, batch_size, seekable=False)
+            if last is not None:
+                total = max(last + 1, int(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+        if last is None:
+            # an empty result here would read as "no fire or smoke"
+            raise ValueError(f"no frames could be read from {os.path.basename(path)}")
+        t1 = time.perf_counter()
+
+        hits = list(coarse)
+        windows = _windows([i for i, _ in coarse], coarse_stride, total)
+        refined_samples = sum(len(range(start, end, refine_stride)) for start, end in windows)
+        if seekable:
+            for start, end in windows:
+                hits += scan(cap, start, end, refine_stride, detect_batch, batch_size)[0]
+        elif windows:
+            # one forward pass over all windows from a fresh capture
+            cap = _reopen(cap, path)
+            wanted = [i for start, end in windows for i in range(start, end, refine_stride)]
+            hits += _detect_hits(_frames_at(cap, wanted, seekable=False), detect_batch, batch_size)
+        # coarse and refined scans can land on the same frame
+        hits = list({i: boxes for i, boxes in hits}.items())
+        t2 = time.perf_counter()
+
+        os.makedirs(out_dir, exist_ok=True)
+        found = _segments(hits, round(MERGE_SECONDS * fps))
+        # best frames increase from segment to segment
+        by_frame = {seg["best_frame"]: n for n, seg in enumerate(found)}
+        if found and not seekable:
+            cap = _reopen(cap, path)
+        thumbs = set()
+        for index, frame in _frames_at(cap, list(by_frame), seekable):
+            n = by_frame[index]
+            if _thumbnail(frame, found[n]["best_boxes"], os.path.join(out_dir, f"segment_{n}.jpg")):
+                thumbs.add(n)
+
+        segments = []
+        for n, seg in enumerate(found):
+            segments.append({
+                "start_s": round(seg["start_frame"] / fps, 2),
+                "end_s": round((seg["end_frame"] + refine_stride) / fps, 2),
+                "label": seg["label"],
+                "max_conf": round(float(seg["max_conf"]), 3),
+                "peak_s": round(seg["best_frame"] / fps, 2),
+                "hits": seg["hits"],
+                "thumbnail": f"segment_{n}.jpg" if n in thumbs else None,
+            })
+    finally:
+        cap.release()
+
+    timeline = {
+        "video": os.path.basename(path),
+        "duration_s": round(total / fps, 2),
+        "fps": round(fps, 2),
+        "sample_seconds": sample_seconds,
+        "refine_seconds": refine_seconds,
+        "coarse_samples": -(-total // coarse_stride),
+        "refined_samples": refined_samples,
+        "timings_s": {"coarse": round(t1 - t0, 2), "refine": round(t2 - t1, 2),
+                      "total": round(time.perf_counter() - t0, 2)},
+        "segments": segments,
+    }
+    with open(os.path.join(out_dir, "timeline.json"), "w") as f:
+        json.dump(timeline, f, indent=2)
+    return timeline
+
+
+# ============================================================
+# BACKGROUND JOBS
+# ============================================================
+class TriageJobs:
+    def __init__(self, detect_batch, out_root=TRIAGE_DIR):
+        self.detect_batch = detect_batch
+        self.out_root = out_root
+        self.jobs = {}   # {job_id: {"state", "video", "submitted", "timeline", "error"}}
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        threading.Thread(target=self._worker, name="triage", daemon=True).start()
+
+    def submit(self, path, **options):
+        job_id = uuid.uuid4().hex[:12]
+        self._update(job_id, state="queued", video=os.path.basename(path),
+                     submitted=time.time(), timeline=None, error=None)
+        self.queue.put((job_id, path, options))
+        return job_id
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job:
+                return dict(job)
+        # submitted to another worker process (or before a restart)
+        return self._load(job_id)
+
+    def _update(self, job_id, **update):
+        with self.lock:
+            job = self.jobs.setdefault(job_id, {})
+            job.update(update)
+            status = {k: v for k, v in job.items() if k != "timeline"}
+        job_dir = os.path.join(self.out_root, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        tmp = os.path.join(job_dir, "status.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(status, f)
+        os.replace(tmp, os.path.join(job_dir, "status.json"))
+
+    def _load(self, job_id):
+        if not JOB_ID_RE.fullmatch(job_id):
+            return None
+        job_dir = os.path.join(self.out_root, job_id)
+        try:
+            with open(os.path.join(job_dir, "status.json")) as f:
+                job = dict(json.load(f), timeline=None)
+            if job["state"] == "done":
+                with open(os.path.join(job_dir, "timeline.json")) as f:
+                    job["timeline"] = json.load(f)
+        except (OSError, ValueError, KeyError):
+            return None
+        return job
+
+    def _worker(self):
+        while True:
+            job_id, path, options = self.queue.get()
+            try:
+                # a failed status write must not take the only worker down
+                self._update(job_id, state="running")
+                timeline = triage_video(path, self.detect_batch, os.path.join(self.out_root, job_id), **options)
+                update = {"state": "done", "timeline": timeline}
+            except Exception as e:
+                print(f"⚠️ Triage of {path} failed: {e}")
+                update = {"state": "failed", "error": str(e)}
+            try:
+                self._update(job_id, **update)
+            except OSError as e:
+                print(f"⚠️ Could not write triage status for {job_id}: {e}")
@@ -0,0 +1,142 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+# ============================================================
+# VIRTUAL CAMERAS (capacity testing)
+# ------------------------------------------------------------
+# camera_id "virtual:<name>[@fps]" opens a capture that behaves like a
+# live camera: frames appear at the target fps whether or not anyone
+# reads them and queue up in a receive buffer of VIRTUAL_BUFFER_FRAMES;
+# grab()/read() take the oldest queued frame (waiting for the next one
+# when the queue is empty), and frames pushed out of a full buffer are
+# counted as dropped. The source is FIREGUARD_VIRTUAL_SOURCE (a video
+# file, looped) or, if unset, generated frames with a moving warm blob.
+# ============================================================
+
+VIRTUAL_PREFIX = "virtual:"
+VIRTUAL_SOURCE = os.environ.get("FIREGUARD_VIRTUAL_SOURCE")
+VIRTUAL_SIZE = (1280, 720)
+DEFAULT_VIRTUAL_FPS = 15.0
+SYNTHETIC_FRAMES = 50
+VIRTUAL_BUFFER_FRAMES = 30
+
+
+def is_virtual(camera_id):
+    return str(camera_id).startswith(VIRTUAL_PREFIX)
+
+
+def _synthetic_frames(width, height, count=SYNTHETIC_FRAMES):
+    rng = np.random.default_rng(0)
+    base = cv2.GaussianBlur(rng.integers(40, 120, (height, width, 3), dtype=np.uint8), (9, 9), 0)
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        x = int(width * (0.2 + 0.6 * i / count))
+        cv2.circle(frame, (x, height // 2), height // 10, (0, 120, 255), -1)
+        frames.append(frame)
+    return frames
+
+
+class VirtualCapture:
+    """The subset of cv2.VideoCapture that camera_streams uses."""
+
+    def __init__(self, camera_id, source=VIRTUAL_SOURCE, size=VIRTUAL_SIZE):
+        name = str(camera_id)[len(VIRTUAL_PREFIX):]
+        fps = DEFAULT_VIRTUAL_FPS
+        if "@" in name:
+            name, _, rate = name.rpartition("@")
+            try:
+                fps = max(0.1, float(rate))
+            except ValueError:
+                pass
+        self.name = name
+        self.interval = 1.0 / fps
+
+        self.video = None
+        self.frames = None
+        if source:
+            self.video = cv2.VideoCapture(source)
+            if not self.video.isOpened():
+                self.video = None
+        if self.video is None:
+            self.frames = _synthetic_frames(*size)
+
+        self.started = time.monotonic()
+        self.index = -1
+        self.delivered = 0
+        self.dropped = 0
+        self.released = False
+
+    def isOpened(self):
+        return self.video is not None or self.frames is not None
+
+    def _advance_source(self):
+        # local refs: release() may run on another thread (watchdog takeover)
+        frames, video = self.frames, self.video
+        if frames is not None:
+            return True
+        if video is None:
+            return False
+        if video.grab():
+            return True
+        # loop the file
+        video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return video.grab()
+
+    def grab(self):
+        # like cv2.VideoCapture: reads after release() fail instead of raising
+        if self.released:
+            return False
+        self.index += 1
+        now = time.monotonic()
+        due_at = self.started + self.index * self.interval
+        if due_at > now:
+            # wait for the next frame, like a blocking camera read
+            time.sleep(due_at - now)
+        else:
+            # the receive buffer only holds the newest VIRTUAL_BUFFER_FRAMES
+            newest = int((now - self.started) / self.interval)
+            lost = newest - VIRTUAL_BUFFER_FRAMES + 1 - self.index
+            for _ in range(max(0, lost)):
+                self._advance_source()
+            if lost > 0:
+                self.dropped += lost
+                self.index += lost
+        return self._advance_source()
+
+    def retrieve(self):
+        frames, video = self.frames, self.video
+        if frames is not None:
+            frame = frames[self.index % len(frames)]
+        elif video is not None:
+            ok, frame = video.retrieve()
+            if not ok:
+                return False, None
+        else:
+            return False, None
+        self.delivered += 1
+        return True, frame
+
+    def read(self):
+        if self.released or not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return 1.0 / self.interval
+        if prop == cv2.CAP_PROP_BUFFERSIZE:
+            return VIRTUAL_BUFFER_FRAMES
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.released = True
+        if self.video is not None:
+            self.video.release()
+        self.video = self.frames = None